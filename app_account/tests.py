@@ -4,6 +4,7 @@
 
 from PIL import Image
 
+from rest_framework import status
 from rest_framework.test import (APIClient, APITestCase)
 
 from master_api.utils import (prettyPrint, prettyStr)
@@ -14,6 +15,7 @@
 
 import rstr
 import io
+import json
 
 CustomUser = get_user_model()
 NUM_USER = 10
@@ -121,3 +123,58 @@ def test_successful_deleted(self):
         )
         self.assertEqual(response.data, DELETE_RESPONSE['data'])
         response = self.test_list(False, NUM_USER - 1)
+
+    def test_stream_list(self):
+        response = self.client.get(self.url, data={'stream': 'true'})
+        self.assertEqual(response.status_code, LIST_RESPONSE['status'])
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/json')
+
+        data = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(
+            {res['uuid'] for res in data},
+            {str(user.uuid) for user in CustomUser.objects.all()}
+        )
+        self.assertEqual(data, self.test_list(False).data)
+
+
+class TestSelf(APITestCase):
+    url = reverse('app_account:get_self')
+    client = APIClient()
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email='user1@tfc.com',
+            password='iamuser1',
+            first_name='First',
+            last_name='Last',
+            mobile='0123456789',
+        )
+        data = {'email': 'user1@tfc.com', 'password': 'iamuser1'}
+        response = self.client.post(reverse('app_auth:login'), data=data)
+        access_token = response.data.get('token').get('access')
+        self.client.credentials(HTTP_AUTHORIZATION=f'JWT {access_token}')
+
+    def test_anon(self):
+        response = APIClient().get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_cached(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['uuid'], str(self.user.uuid))
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response.data['first_name'], 'First')
+
+        # Saving the user drops it from the cache
+        self.user.first_name = 'Changed'
+        self.user.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['first_name'], 'Changed')
+
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
@@ -1,51 +1,28 @@
-from annoying.functions import get_object_or_None
-
-from django.conf import settings
 from django.contrib.auth import get_user_model
 
-from rest_framework import (exceptions, status)
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from master_api.views import (
-    create_object, get_object, edit_object, delete_object
+    create_object, get_object, edit_object, delete_object, list_objects
 )
 from master_db.serializers import CustomUserSerializer
 
-import jwt
-
 CustomUser = get_user_model()
 
 
 class SelfView(APIView):
+    permission_classes = [IsAuthenticated]
+
     def get(self, request):
-        if not (authorization_header := request.headers.get('Authorization')):
-            return None
-        try:
-            # header = 'Token xxxxxxxxxxxxxxxxxxxxxxxx'
-            if not (access_token := authorization_header.split(' ')[1]):
-                raise exceptions.PermissionDenied('Not logged in.')
-
-            payload = jwt.decode(
-                access_token, settings.JWT_KEY, algorithms=['HS256']
-            )
-            if payload.get('typ') != 'access':
-                raise exceptions.ParseError('Invalid access token')
-        except IndexError:
-            raise exceptions.AuthenticationFailed('Token prefix missing')
-        except jwt.ExpiredSignatureError:
-            raise exceptions.AuthenticationFailed('Access token expired')
-
-        if (
-            (user := get_object_or_None(CustomUser, uuid=payload.get('uuid')))
-            is None
-        ):
-            raise exceptions.NotFound('User not found.')
-
-        if not user.is_active:
-            raise exceptions.NotFound('User inactive.')
-
-        return Response(CustomUserSerializer(user).data)
+        """
+            Return the user of the access token. The user is resolved by
+            CachedJWTAuthentication, so repeated calls are served from
+            the principal cache without querying the database.
+        """
+        return Response(CustomUserSerializer(request.user).data)
 
 
 class UserView(APIView):
@@ -53,8 +30,8 @@ def post(self, request):
         return create_object(CustomUser, data=request.data)
 
     def get(self, request):
-        return Response(
-            CustomUserSerializer(CustomUser.objects.all(), many=True).data
+        return list_objects(
+            CustomUser.objects.all(), request, ordering=('date_joined', 'id')
         )
 
     def patch(self, request):
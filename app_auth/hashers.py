@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    """
+        PBKDF2 with the iteration count taken from
+        PASSWORD_HASHER_ITERATIONS. Hashes made with another count are
+        upgraded on the next successful login.
+    """
+    @property
+    def iterations(self):
+        return getattr(
+            settings, 'PASSWORD_HASHER_ITERATIONS',
+            hashers.PBKDF2PasswordHasher.iterations
+        )
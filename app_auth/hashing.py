@@ -0,0 +1,160 @@
+from django.conf import settings
+from django.contrib.auth.hashers import (check_password, make_password)
+
+from rest_framework import exceptions
+
+from master_api.utils import summarize
+
+from collections import (Counter, deque)
+from concurrent.futures import (ThreadPoolExecutor, TimeoutError)
+
+import threading
+import time
+
+HASHING_WORKERS = getattr(settings, 'HASHING_WORKERS', 2)
+HASHING_QUEUE_SIZE = getattr(settings, 'HASHING_QUEUE_SIZE', 8)
+HASHING_PER_ACCOUNT = getattr(settings, 'HASHING_PER_ACCOUNT', 1)
+HASHING_PER_IP = getattr(settings, 'HASHING_PER_IP', 4)
+HASHING_TIMEOUT = getattr(settings, 'HASHING_TIMEOUT', 10)
+
+
+class HashingStats:
+    """
+        Counters and latency samples of the hashing pool. Latencies are
+        in milliseconds: wait is time spent queued, run is time spent
+        hashing.
+    """
+    def __init__(self, samples=1024):
+        self._lock = threading.Lock()
+        self._samples = samples
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counts = Counter()
+            self.wait = deque(maxlen=self._samples)
+            self.run = deque(maxlen=self._samples)
+
+    def incr(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+    def record(self, wait, run):
+        with self._lock:
+            self.counts['completed'] += 1
+            self.wait.append(wait * 1000)
+            self.run.append(run * 1000)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                **self.counts,
+                'wait_ms': summarize(self.wait),
+                'run_ms': summarize(self.run),
+            }
+
+
+class HashingPool:
+    """
+        Bounded thread pool for password hashing.
+
+        At most workers hashes run at once and at most queue_size more
+        wait for a worker; beyond that, and beyond per_account and
+        per_ip concurrent logins, requests are rejected right away
+        with 429 instead of tying up a request worker. Hashing never
+        runs on the request thread, so the number of CPU-bound hashes
+        is capped regardless of how many logins arrive.
+    """
+    def __init__(
+        self,
+        workers=HASHING_WORKERS,
+        queue_size=HASHING_QUEUE_SIZE,
+        per_account=HASHING_PER_ACCOUNT,
+        per_ip=HASHING_PER_IP,
+        timeout=HASHING_TIMEOUT,
+    ):
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix='hashing'
+        )
+        self.capacity = threading.BoundedSemaphore(workers + queue_size)
+        self.per_account = per_account
+        self.per_ip = per_ip
+        self.timeout = timeout
+        self.stats = HashingStats()
+        self._active = Counter()
+        self._lock = threading.Lock()
+
+    def acquire(self, keys):
+        """
+            Reserve a slot for each (key, limit) of keys, all or none
+        """
+        with self._lock:
+            if any(self._active[key] >= limit for key, limit in keys):
+                return False
+            for key, _ in keys:
+                self._active[key] += 1
+            return True
+
+    def release(self, keys):
+        with self._lock:
+            for key, _ in keys:
+                self._active[key] -= 1
+                if self._active[key] <= 0:
+                    del self._active[key]
+
+    def _check(self, password, encoded, queued):
+        started = time.monotonic()
+        upgraded = []
+        valid = check_password(
+            password,
+            encoded,
+            setter=lambda raw: upgraded.append(make_password(raw))
+        )
+        self.stats.record(started - queued, time.monotonic() - started)
+        return valid, upgraded[0] if upgraded else None
+
+    def check(self, password, encoded, account, ip):
+        """
+            Check password against encoded on the pool.
+
+            Return (valid, new_encoded), where new_encoded is the hash
+            to store if encoded used outdated hasher settings, else
+            None. Raise Throttled if a limit is reached.
+        """
+        keys = [(('account', account), self.per_account)]
+        if ip:
+            keys.append((('ip', ip), self.per_ip))
+
+        if not self.acquire(keys):
+            self.stats.incr('throttled')
+            raise exceptions.Throttled(
+                detail='Too many login attempts in progress.'
+            )
+        if not self.capacity.acquire(blocking=False):
+            self.release(keys)
+            self.stats.incr('rejected')
+            raise exceptions.Throttled(detail='Login service is busy.')
+
+        # Slots are held until the hash completes, even if the request
+        # stopped waiting for it
+        def done(future):
+            self.capacity.release()
+            self.release(keys)
+
+        try:
+            future = self.executor.submit(
+                self._check, password, encoded, time.monotonic()
+            )
+        except BaseException:
+            done(None)
+            raise
+        future.add_done_callback(done)
+
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            self.stats.incr('timeout')
+            raise exceptions.Throttled(detail='Login service is busy.')
+
+
+hashing_pool = HashingPool()
@@ -1,8 +1,14 @@
 from django.contrib.auth import get_user_model
+from django.test import override_settings
 from django.urls import reverse
 
 from rest_framework import status
 from rest_framework.test import (APIClient, APITestCase)
+from rest_framework_simplejwt.tokens import AccessToken
+
+from master_api.response_cache import generations
+
+from .hashing import hashing_pool
 
 CustomUser = get_user_model()
 
@@ -58,6 +64,66 @@ def test_success(self):
         self.assertIsNotNone(access_token)
         self.assertIsNotNone(response.data.get('token').get('refresh'))
 
+    @override_settings(PASSWORD_HASHER_ITERATIONS=1000)
+    def test_upgrade_hash(self):
+        data = {'email': 'user1@tfc.com', 'password': 'iamuser1'}
+        before = generations([CustomUser])
+        response = self.client.post(self.url, data=data)
+        user = CustomUser.objects.get(email='user1@tfc.com')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # Logins keep the cached responses showing users
+        self.assertEqual(generations([CustomUser]), before)
+        self.assertTrue(user.password.startswith('pbkdf2_sha256$1000$'))
+        self.assertTrue(user.check_password('iamuser1'))
+
+    def test_throttled(self):
+        user = CustomUser.objects.get(email='user1@tfc.com')
+        data = {'email': 'user1@tfc.com', 'password': 'iamuser1'}
+        keys = [(('account', user.pk), hashing_pool.per_account)]
+
+        # Another login of the same account is in progress
+        self.assertTrue(hashing_pool.acquire(keys))
+        try:
+            response = self.client.post(self.url, data=data)
+        finally:
+            hashing_pool.release(keys)
+        self.assertEqual(
+            response.status_code, status.HTTP_429_TOO_MANY_REQUESTS
+        )
+
+        completed = hashing_pool.stats.snapshot().get('completed', 0)
+        response = self.client.post(self.url, data=data)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            hashing_pool.stats.snapshot()['completed'], completed + 1
+        )
+
+    def test_stats(self):
+        admin = CustomUser.objects.create_user(
+            email='admin@tfc.com',
+            password='iamadmin',
+            mobile='0987654321',
+            is_staff=True
+        )
+        client = APIClient()
+        client.credentials(
+            HTTP_AUTHORIZATION=f'JWT {AccessToken.for_user(admin)}'
+        )
+        response = client.delete(reverse('stats'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        data = {'email': 'user1@tfc.com', 'password': 'iamuser1'}
+        response = self.client.post(self.url, data=data)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = client.get(reverse('stats'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        hashing = response.data['hashing']
+        self.assertEqual(hashing['completed'], 1)
+        self.assertGreater(hashing['run_ms']['max'], 0)
+        self.assertIsNotNone(hashing['wait_ms']['max'])
+
 
 class RefreshTests(APITestCase):
     url = reverse('app_auth:refresh')
@@ -2,29 +2,25 @@
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.contrib.auth.hashers import check_password
 from django.contrib.auth.models import update_last_login
 
 from rest_framework import (exceptions, status)
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
+from rest_framework.throttling import BaseThrottle
 from rest_framework.views import APIView
 
 from rest_framework_simplejwt.tokens import RefreshToken
 
-from master_db.serializers import EnhancedModelSerializer
+from master_api.authentication import get_principal
+
+from .hashing import hashing_pool
 
 import jwt
 
 CustomUser = get_user_model()
 
 
-class CustomUserSerializer(EnhancedModelSerializer):
-    class Meta:
-        model = CustomUser
-        fields = ['password']
-
-
 class AuthView(APIView):
     permission_classes = [AllowAny]
 
@@ -52,10 +48,19 @@ def post(self, request):
         if not (user.is_active):
             raise exceptions.NotFound('User inactive.')
 
-        ser_user = CustomUserSerializer(user).data
-        if not check_password(password, ser_user.get('password', None)):
+        valid, upgraded = hashing_pool.check(
+            password,
+            user.password,
+            account=user.pk,
+            ip=BaseThrottle().get_ident(request)
+        )
+        if not valid:
             raise exceptions.AuthenticationFailed('No matching credentials.')
 
+        if upgraded:
+            user.password = upgraded
+            user.save(update_fields=['password'])
+
         update_last_login(None, user)
 
         refresh_token = RefreshToken.for_user(user)
@@ -108,12 +113,9 @@ def post(self, request):
         except jwt.ExpiredSignatureError:
             raise exceptions.AuthenticationFailed('Refresh token expired.')
 
-        if (
-            (
-                user :=
-                get_object_or_None(CustomUser, uuid=payload.get('uuid', None))
-            ) is None
-        ):
+        try:
+            user = get_principal(payload.get('uuid', None))
+        except CustomUser.DoesNotExist:
             raise exceptions.NotFound('User not found')
 
         if not (user.is_active):
@@ -1,3 +1,113 @@
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
 from rest_framework.test import (APIClient, APITestCase)
 
-# Create your tests here.
+from master_api.utils import prettyStr
+from master_db.models import Calendar
+
+import datetime
+
+CustomUser = get_user_model()
+
+
+def aware(value):
+    # Same timezone as the from/to params
+    return timezone.make_aware(datetime.datetime.fromisoformat(value))
+
+
+def create_calendar(user, name, time_start, time_end):
+    return Calendar.objects.create(
+        user=user,
+        name=name,
+        time_start=aware(time_start),
+        time_end=aware(time_end)
+    )
+
+
+class FindCalendarTest(APITestCase):
+    url = reverse('app_calendar:reverse')
+    client = APIClient()
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email='user1@tfc.com',
+            password='iamuser1',
+            first_name='First',
+            last_name='Last',
+            mobile='0123456789',
+        )
+        data = {'email': 'user1@tfc.com', 'password': 'iamuser1'}
+        response = self.client.post(reverse('app_auth:login'), data=data)
+        access_token = response.data.get('token').get('access')
+        self.client.credentials(HTTP_AUTHORIZATION=f'JWT {access_token}')
+
+        self.calendars = [
+            create_calendar(
+                self.user, 'Old', '2020-01-01 08:00', '2020-01-01 09:00'
+            ),
+            create_calendar(
+                self.user, 'Mon', '2021-06-07 08:00', '2021-06-07 10:00'
+            ),
+            create_calendar(
+                self.user, 'Mon 2', '2021-06-07 09:00', '2021-06-07 11:00'
+            ),
+            create_calendar(
+                self.user, 'Mon 3', '2021-06-07 11:00', '2021-06-07 12:00'
+            ),
+            create_calendar(
+                self.user, 'Fri', '2021-06-11 23:00', '2021-06-12 01:00'
+            ),
+            create_calendar(
+                self.user, 'Next', '2021-06-14 08:00', '2021-06-14 09:00'
+            ),
+        ]
+
+    def get(self, data):
+        response = self.client.get(
+            self.url, data={
+                'user_uuid': self.user.uuid,
+                **data
+            }
+        )
+        self.assertEqual(
+            response.status_code, status.HTTP_200_OK, msg=response.data
+        )
+        return response.data
+
+    def test_range(self):
+        data = self.get({'from': '2021-06-07', 'to': '2021-06-12'})
+        self.assertEqual(
+            [calendar['name'] for calendar in data],
+            ['Mon', 'Mon 2', 'Mon 3', 'Fri'],
+        )
+
+        data = self.get({'from': '2021-06-12'})
+        self.assertEqual(
+            [calendar['name'] for calendar in data], ['Fri', 'Next']
+        )
+
+        response = self.client.get(self.url, data={'from': '2021-13-01'})
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_400_BAD_REQUEST,
+            msg=prettyStr(response.data)
+        )
+
+    def test_busy(self):
+        data = self.get(
+            {
+                'from': '2021-06-07',
+                'to': '2021-06-12',
+                'busy': 'true'
+            }
+        )
+        self.assertEqual(
+            [(busy['time_start'], busy['time_end']) for busy in data],
+            [
+                (aware('2021-06-07 08:00'), aware('2021-06-07 12:00')),
+                (aware('2021-06-11 23:00'), aware('2021-06-12 01:00')),
+            ],
+        )
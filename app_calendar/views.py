@@ -3,12 +3,11 @@
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from master_api.utils import (get_by_uuid)
+from master_api.utils import (convert_time_param, formdata_bool, get_by_uuid)
 from master_api.views import (
-    create_object, edit_object, delete_object, get_object
+    create_object, edit_object, delete_object, get_object, list_objects
 )
 from master_db.models import Calendar
-from master_db.serializers import CalendarSerializer
 
 CustomUser = get_user_model()
 
@@ -18,7 +17,7 @@ def post(self, request):
         return create_object(Calendar, data=request.data)
 
     def get(self, request):
-        return get_object(Calendar, data=request.GET)
+        return get_object(Calendar, data=request.GET, request=request)
 
     def patch(self, request):
         return edit_object(Calendar, data=request.data)
@@ -27,25 +26,65 @@ def delete(self, request):
         return delete_object(Calendar, data=request.data)
 
 
+def merge_intervals(intervals):
+    """
+        Collapse (time_start, time_end) pairs, sorted by time_start,
+        into disjoint busy intervals. Overlapping and back to back
+        intervals are merged.
+    """
+    merged = []
+    for time_start, time_end in intervals:
+        if merged and time_start <= merged[-1]['time_end']:
+            merged[-1]['time_end'] = max(merged[-1]['time_end'], time_end)
+        else:
+            merged.append({'time_start': time_start, 'time_end': time_end})
+    return merged
+
+
 class FindCalendarView(APIView):
     def get(self, request):
         """
-            Take in user_uuid (optional).
+            Take in user_uuid (optional), from (optional), to (optional),
+            busy (optional).
 
             If user_uuid is provided, result will be all calendars for that user.
 
             If none, result will be all Calendars in db.
+
+            from/to keep calendars overlapping the range, ordered by
+            time_start.
+
+            If busy is true, result will be the busy intervals of those
+            calendars instead, ie. overlapping calendars merged into
+            one {time_start, time_end}.
+
+            Pass cursor or page_size to get the result page by page.
         """
+        calendar = Calendar.objects.all()
 
         # user_uuid is provided
         user = request.GET.get('user_uuid')
         if user is not None:
             user = get_by_uuid(CustomUser, user)
-            return Response(
-                CalendarSerializer(user.calendar_set, many=True).data
+            calendar = user.calendar_set.all()
+
+        time_from = convert_time_param(request.GET, 'from')
+        time_to = convert_time_param(request.GET, 'to')
+        if time_to is not None:
+            calendar = calendar.filter(time_start__lt=time_to)
+        if time_from is not None:
+            calendar = calendar.filter(time_end__gt=time_from)
+
+        if formdata_bool(request.GET.get('busy')):
+            intervals = calendar.order_by('time_start').values_list(
+                'time_start', 'time_end'
             )
+            return Response(merge_intervals(intervals.iterator()))
 
-        # None are provided
-        return Response(
-            CalendarSerializer(Calendar.objects.all(), many=True).data
+        if time_from is None and time_to is None:
+            return list_objects(calendar, request)
+        return list_objects(
+            calendar.order_by('time_start', 'id'),
+            request,
+            ordering=('time_start', 'id')
         )
@@ -1,5 +1,7 @@
 from django.contrib.auth import get_user_model
 from django.contrib.auth.hashers import make_password
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from rest_framework import status
@@ -12,6 +14,8 @@
 )
 from master_db.models import (ClassMetadata, PHONE_REGEX)
 
+from uuid import uuid4
+
 import json
 import rstr
 
@@ -255,6 +259,60 @@ def test_list(self, printOut=True, length=None):
                 f"Note: All class's name NO. should be divisible by 3 in range from 0 to {NUM_CLASS - 1}"
             )
 
+    def test_list_student_counts(self):
+        url = reverse('app_class:reverse')
+        std = create_special_student()
+        for c in self.classes[:3]:
+            c.students.add(std)
+
+        def count_queries(data):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url, data=data)
+            self.assertEqual(
+                response.status_code,
+                LIST_RESPONSE['status'],
+                msg=prettyStr(response.data)
+            )
+            return response, len(queries)
+
+        # Authenticate once so the principal cache does not skew counts
+        self.client.get(url)
+        response, few = count_queries({'course_uuid': self.course.uuid})
+        for obj in response.data:
+            self.assertNotIn('students', obj)
+            expected = NUM_STUDENT_EACH + (
+                obj['name'] in ('Class-0', 'Class-1', 'Class-2')
+            )
+            self.assertEqual(obj['student_count'], expected)
+
+        # Counts are not restricted to the filtered student
+        response, student_few = count_queries({'student_uuid': std.uuid})
+        self.assertEqual(len(response.data), 3)
+        for obj in response.data:
+            self.assertEqual(obj['student_count'], NUM_STUDENT_EACH + 1)
+            self.assertEqual(obj['course']['uuid'], str(self.course.uuid))
+
+        for i in range(NUM_CLASS, 2 * NUM_CLASS):
+            create_class(i, self.course).students.add(std)
+        response, many = count_queries({'course_uuid': self.course.uuid})
+        self.assertEqual(len(response.data), 2 * NUM_CLASS)
+        self.assertEqual(few, many)
+        response, student_many = count_queries({'student_uuid': std.uuid})
+        self.assertEqual(len(response.data), NUM_CLASS + 3)
+        self.assertEqual(student_few, student_many)
+
+        # Sparse fieldsets keep the relations joined by the listing
+        response, sparse = count_queries(
+            {
+                'course_uuid': self.course.uuid,
+                'fields': 'name,teacher,student_count'
+            }
+        )
+        self.assertEqual(
+            set(response.data[0]), {'name', 'teacher', 'student_count'}
+        )
+        self.assertEqual(sparse, many)
+
 
 class ClassStudentTest(APITestCase):
     url = reverse('app_class:student_mgmt')
@@ -321,3 +379,55 @@ def test_successful_delStd(self):
             status.HTTP_200_OK,
             msg=prettyStr(response.data)
         )
+
+    def test_students_resolved_in_one_query(self):
+        url = reverse('app_class:class_mgmt')
+
+        def create(name, students):
+            data = {
+                'course': str(self.course.uuid),
+                'name': name,
+                'students': json.dumps([str(std.uuid) for std in students]),
+                'status': 'published',
+            }
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(url, data)
+            self.assertEqual(
+                response.status_code,
+                CREATE_RESPONSE['status'],
+                msg=prettyStr(response.data)
+            )
+            return len(queries)
+
+        # Authenticate once so the principal cache does not skew counts
+        self.client.get(url)
+        _, few = create_teacher_students(70, 2)
+        _, many = create_teacher_students(71, 20)
+        self.assertEqual(create('few', few), create('many', many))
+        self.assertEqual(
+            ClassMetadata.objects.get(name='many').students.count(), 20
+        )
+
+        # Missing and malformed uuids are reported
+        missing = str(uuid4())
+        response = self.client.post(
+            url, {
+                'course': str(self.course.uuid),
+                'name': 'missing',
+                'students': json.dumps([str(few[0].uuid), missing]),
+                'status': 'published',
+            }
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn(missing, str(response.data['students']))
+
+        response = self.client.post(
+            url, {
+                'course': str(self.course.uuid),
+                'name': 'malformed',
+                'students': '["not-a-uuid"]',
+                'status': 'published',
+            }
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('not-a-uuid', str(response.data['students']))
@@ -1,13 +1,18 @@
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
+from django.db.models import Count
 
-from rest_framework import (exceptions, status)
+from rest_framework import (exceptions, serializers, status)
 from rest_framework.response import Response
 from rest_framework.serializers import RelatedField
 from rest_framework.views import APIView
+from taggit.models import Tag
 
+from master_api.response_cache import cached_response
 from master_api.utils import get_by_uuid
-from master_api.views import get_object, create_object, delete_object, edit_object
+from master_api.views import (
+    get_object, create_object, delete_object, edit_object, list_objects
+)
 from master_db.models import CustomUser, ClassMetadata, Course
 from master_db.serializers import ClassMetadataSerializer, CourseSerializer
 
@@ -20,8 +25,9 @@ class ClassView(APIView):
     def post(self, request):
         return create_object(ClassMetadata, data=request.data)
 
+    @cached_response(ClassMetadata, Course, CustomUser)
     def get(self, request):
-        return get_object(ClassMetadata, data=request.GET)
+        return get_object(ClassMetadata, data=request.GET, request=request)
 
     def patch(self, request):
         return edit_object(ClassMetadata, data=request.data)
@@ -119,11 +125,36 @@ def to_representation(self, obj):
         return CourseSerializer(obj).ignore_fields('created', 'modified').data
 
 
-class SpecialClassSerializer(ClassMetadataSerializer):
+class ClassListSerializer(ClassMetadataSerializer):
+    student_count = serializers.IntegerField(read_only=True)
+
+    class Meta(ClassMetadataSerializer.Meta):
+        exclude = ('id', 'students')
+
+
+class SpecialClassSerializer(ClassListSerializer):
     course = CourseRelatedField(read_only=True)
 
 
+def list_classes(queryset, request, Serializer=ClassListSerializer):
+    """
+        List classes of queryset with their number of students instead
+        of the students, in a number of queries that does not depend on
+        the number of classes
+    """
+    # Filtering on students must happen in a subquery, or the count
+    # would reuse its join and only count the filtered student
+    queryset = ClassMetadata.objects.filter(pk__in=queryset.values('pk'))
+    queryset = queryset.select_related('course', 'teacher').annotate(
+        student_count=Count('students')
+    )
+    if Serializer is SpecialClassSerializer:
+        queryset = queryset.prefetch_related('course__tags')
+    return list_objects(queryset, request, Serializer=Serializer)
+
+
 class FindClassView(APIView):
+    @cached_response(ClassMetadata, Course, Tag, CustomUser)
     def get(self, request):
         """
             Take in course_uuid (optional),student_uuid (optional), teacher_uuid (optional).
@@ -140,6 +171,8 @@ def get(self, request):
 
             If none is provided return all classes in db with similar
             format of student_uuid.
+
+            Pass cursor or page_size to get the result page by page.
         """
         classMeta = ClassMetadata.objects.all()
 
@@ -156,9 +189,8 @@ def get(self, request):
             # Get student by uuid
             student = get_by_uuid(CustomUser, student_uuid)
             classMeta = student.student_classes.all()
-            return Response(
-                SpecialClassSerializer(classMeta,
-                                       many=True).ignore_field('students').data
+            return list_classes(
+                classMeta, request, Serializer=SpecialClassSerializer
             )
 
         # teacher_uuid is provided
@@ -168,7 +200,4 @@ def get(self, request):
             teacher = get_by_uuid(CustomUser, teacher_uuid)
             classMeta = teacher.teacher_classes.all()
 
-        data = ClassMetadataSerializer(classMeta,
-                                       many=True).ignore_field('students').data
-
-        return Response(data)
+        return list_classes(classMeta, request)
@@ -1,13 +1,19 @@
 from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from rest_framework.test import (APIClient, APITestCase)
 
+from master_api.response_cache import get_cache
 from master_api.utils import (prettyPrint, compare_dict)
 from master_api.views import (
     CREATE_RESPONSE, EDIT_RESPONSE, DELETE_RESPONSE, GET_RESPONSE, LIST_RESPONSE
 )
-from master_db.models import Course
+from master_db.models import (ClassMetadata, Course, TagUsage)
+from master_db.tags import reconcile_tag_usage
+
+from unittest import mock
 
 import json
 
@@ -225,3 +231,270 @@ def check_even_odd(data, even):
 
         response = self.client.get(url, data={'txt': 'od'})
         check_even_odd(response.data, False)
+
+    def test_autocomplete_tags(self):
+        url = reverse('app_course:find_tag')
+        odds = [f'odd {x}' for x in range(1, NUM_COURSE, 2)]
+
+        response = self.client.get(url, data={'txt': 'd'})
+        self.assertEqual(list(response.data), odds)
+
+        response = self.client.get(url, data={'txt': 'd', 'mode': 'prefix'})
+        self.assertEqual(list(response.data), [])
+
+        response = self.client.get(
+            url, data={
+                'txt': 'OD',
+                'mode': 'prefix',
+                'limit': 2
+            }
+        )
+        self.assertEqual(list(response.data), odds[:2])
+
+        # Tags created later are found too, ranked by usage
+        create_course('oddity', ['oddity'])
+        response = self.client.get(url, data={'txt': 'odd', 'mode': 'prefix'})
+        self.assertEqual(list(response.data), odds + ['oddity'])
+
+        response = self.client.get(url, data={'txt': 'odd', 'mode': 'infix'})
+        self.assertEqual(response.status_code, 400)
+
+        # Many matches are ranked by chunks, and only the best queried
+        data = {'txt': 'd', 'limit': 3}
+        expected = list(self.client.get(url, data=data).data)
+        get_cache().clear()
+        with mock.patch('master_db.tags.TRIE_CHUNK_SIZE', 2):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url, data=data)
+        self.assertEqual(list(response.data), expected)
+        # Three chunks of the six matches, then the tags returned
+        self.assertEqual(len(queries), 3 + 1)
+
+    def test_tag_usage(self):
+        url = reverse('app_course:get_tag')
+
+        def usage(data):
+            return {tag['name']: tag['num_times'] for tag in data}
+
+        self.courses[-1].tags.remove('even 0')
+        self.courses[-2].tags.clear()
+        self.courses[-3].delete()
+        self.client.get(url)  # Warm up the principal cache
+        with self.assertNumQueries(1):
+            response = self.client.get(url, data={'limit': 3})
+        self.assertEqual(
+            usage(response.data), {
+                'even 0': 7,
+                'odd 1': 7,
+                'even 2': 6
+            }
+        )
+
+        # Counters that drifted are fixed by reconciliation
+        TagUsage.objects.update(num_times=42)
+        self.assertEqual(reconcile_tag_usage(), NUM_COURSE)
+        response = self.client.get(url)
+        self.assertEqual(
+            usage(response.data),
+            dict(Course.tags.most_common().values_list('name', 'num_times'))
+        )
+
+    def test_find_courses(self):
+        url = reverse('app_course:reverse')
+
+        def durations(data):
+            return sorted(course['duration'] for course in data)
+
+        response = self.client.get(url, data={'tags': 'even 0, odd 1'})
+        self.assertEqual(durations(response.data), list(range(1, NUM_COURSE)))
+
+        response = self.client.get(
+            url, data={
+                'tags': 'odd 9,even 8',
+                'match': 'any'
+            }
+        )
+        self.assertEqual(durations(response.data), [8, 9])
+
+        response = self.client.get(
+            url, data={
+                'tags': 'even 2',
+                'duration_max': 4
+            }
+        )
+        self.assertEqual(durations(response.data), [2, 3, 4])
+
+        response = self.client.get(url, data={'duration': 3})
+        self.assertEqual(durations(response.data), [3])
+
+        student = CustomUser.objects.get(email='user1@tfc.com')
+        klass = ClassMetadata.objects.create(
+            course=self.courses[5], name='Class-5', status='Ongoing'
+        )
+        klass.students.add(student)
+        response = self.client.get(url, data={'student_uuid': student.uuid})
+        self.assertEqual(durations(response.data), [5])
+
+        response = self.client.get(url, data={'match': 'some'})
+        self.assertEqual(response.status_code, 400)
+
+        # One query for the courses and one for their tags
+        with self.assertNumQueries(2):
+            response = self.client.get(
+                url,
+                data={
+                    'tags': 'even 0,odd 3',
+                    'duration_min': 2,
+                    'page_size': 5
+                }
+            )
+        self.assertEqual(durations(response.data['results']), [3, 4, 5, 6, 7])
+        self.assertEqual(
+            set(response.data['results'][0]['tags']),
+            {'even 0', 'odd 1', 'even 2', 'odd 3'}
+        )
+
+    def test_conditional_get(self):
+        course = self.courses[0]
+
+        for url, data in (
+            (self.url, {
+                'uuid': course.uuid
+            }),
+            (reverse('app_course:reverse'), {
+                'tags': 'even 0'
+            }),
+        ):
+            response = self.client.get(url, data=data)
+            etag = response['ETag']
+            self.assertTrue(etag.startswith('W/'))
+            self.assertIn('Last-Modified', response)
+
+            response = self.client.get(url, data=data, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response['ETag'], etag)
+            response = self.client.get(
+                url,
+                data=data,
+                HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+            )
+            self.assertEqual(response.status_code, 304)
+
+            # Any edit changes the validators
+            course.desc = f'{course.desc} edited'
+            course.save()
+            response = self.client.get(url, data=data, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response['ETag'], etag)
+
+        # Removing a row from the result set too
+        response = self.client.get(url, data=data)
+        self.courses[-1].delete()
+        response = self.client.get(
+            url, data=data, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(response.status_code, 200)
+
+        # Pages have validators of their own, read from the fetched rows
+        # without any query of their own
+        get_cache().clear()
+        data = {'page_size': 2}
+        with self.assertNumQueries(2):
+            first = self.client.get(url, data=data)
+        second = self.client.get(
+            url, data={
+                **data, 'cursor': first.data['next']
+            }
+        )
+        self.assertNotEqual(first['ETag'], second['ETag'])
+        get_cache().clear()
+        # The page and its tags are fetched, but not serialized
+        with self.assertNumQueries(2):
+            response = self.client.get(
+                url, data=data, HTTP_IF_NONE_MATCH=first['ETag']
+            )
+        self.assertEqual(response.status_code, 304)
+
+        # Streamed lists only carry them for conditional requests
+        data = {'stream': 'true'}
+        response = self.client.get(url, data=data)
+        self.assertFalse(response.has_header('ETag'))
+        response = self.client.get(url, data=data, HTTP_IF_NONE_MATCH='W/"x"')
+        etag = response['ETag']
+        response = self.client.get(url, data=data, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_response_cache(self):
+        url = reverse('app_course:reverse')
+        data = {'tags': 'even 2'}
+        course = self.courses[2]
+
+        # Authenticate once so the principal cache does not skew counts
+        response = self.client.get(url, data=data)
+        with self.assertNumQueries(0):
+            cached = self.client.get(url, data=data)
+        self.assertEqual(cached.data, response.data)
+        self.assertEqual(cached['ETag'], response['ETag'])
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                url, data=data, HTTP_IF_NONE_MATCH=response['ETag']
+            )
+        self.assertEqual(response.status_code, 304)
+
+        # Saves and tag changes of any course invalidate the entry
+        course.tags.remove('even 2')
+        response = self.client.get(url, data=data)
+        self.assertEqual(len(response.data), NUM_COURSE - 3)
+
+        course.name = 'Renamed'
+        course.save()
+        response = self.client.get(self.url, data={'uuid': course.uuid})
+        self.assertEqual(response.data['name'], 'Renamed')
+        course.name = 'Renamed again'
+        course.save()
+        response = self.client.get(self.url, data={'uuid': course.uuid})
+        self.assertEqual(response.data['name'], 'Renamed again')
+
+    def test_sparse_fieldsets(self):
+        url = reverse('app_course:reverse')
+
+        def select(data, url=url):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url, data=data)
+            self.assertEqual(
+                response.status_code,
+                LIST_RESPONSE['status'],
+                msg=f"{response.data}"
+            )
+            courses = [
+                query['sql'] for query in queries
+                if query['sql'].startswith('SELECT "master_db_course"')
+            ]
+            self.assertEqual(len(courses), 1)
+            return response.data, courses[0].split(' FROM ')[0]
+
+        data, columns = select({'fields': 'uuid,name'})
+        self.assertEqual(len(data), NUM_COURSE)
+        self.assertEqual(set(data[0]), {'uuid', 'name'})
+        self.assertNotIn('"desc"', columns)
+        self.assertNotIn('"duration"', columns)
+
+        data, columns = select({'exclude': 'desc,tags', 'page_size': 3})
+        self.assertEqual(len(data['results']), 3)
+        self.assertNotIn('desc', data['results'][0])
+        self.assertNotIn('tags', data['results'][0])
+        self.assertIn('duration', data['results'][0])
+        self.assertNotIn('"desc"', columns)
+
+        course = self.courses[3]
+        data, columns = select(
+            {
+                'uuid': course.uuid,
+                'fields': 'duration'
+            }, self.url
+        )
+        self.assertEqual(data, {'duration': 3})
+        self.assertNotIn('"desc"', columns)
+
+        response = self.client.get(url, data={'fields': 'uuid,salary'})
+        self.assertEqual(response.status_code, 400)
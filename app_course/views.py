@@ -3,11 +3,18 @@
 from rest_framework import (exceptions, status)
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from taggit.models import Tag
 
-from master_db.models import Course
-from master_db.serializers import CourseSerializer
+from master_db.catalog import (ALL, MATCHES, find_courses)
+from master_db.tags import (
+    AUTOCOMPLETE_LIMIT, AUTOCOMPLETE_MAX_LIMIT, MODES, SUBSTRING, find_tags,
+    most_common_tags
+)
+from master_db.models import (ClassMetadata, Course, TagUsage)
+from master_api.response_cache import cached_response
+from master_api.utils import get_by_uuid
 from master_api.views import (
-    create_object, edit_object, get_object, delete_object
+    create_object, edit_object, get_object, delete_object, list_objects
 )
 
 CustomUser = get_user_model()
@@ -17,8 +24,9 @@ class CourseView(APIView):
     def post(self, request):
         return create_object(Course, data=request.data)
 
+    @cached_response(Course, Tag)
     def get(self, request):
-        return get_object(Course, data=request.GET)
+        return get_object(Course, data=request.GET, request=request)
 
     def patch(self, request):
         return edit_object(Course, data=request.data)
@@ -28,6 +36,7 @@ def delete(self, request):
 
 
 class TagView(APIView):
+    @cached_response(Course, Tag, TagUsage)
     def get(self, request):
         """
             Take in limit (optional)
@@ -35,51 +44,86 @@ def get(self, request):
             Get all tags in db sorted in most frequently used. If limit is specified, only return 'limit' number of tags.
         """
         limit = request.GET.get('limit')
-        if limit is None:
-            tags = Course.tags.most_common().values('name', 'num_times')
-        else:
-            tags = Course.tags.most_common()[:int(limit)].values(
-                'name', 'num_times'
-            )
+        if limit is not None:
+            try:
+                limit = max(int(limit), 0)
+            except ValueError:
+                raise exceptions.ParseError('limit must be an integer')
 
-        return Response(tags)
+        return Response(most_common_tags(limit))
 
 
 class FindTagView(APIView):
+    @cached_response(Course, Tag, TagUsage)
     def get(self, request):
         """
-            Take in txt.
+            Take in txt, mode (optional) and limit (optional).
 
-            Return all tags containing txt as substring. If txt is empty return empty list.
+            Return the names of tags containing txt as substring, or starting with txt if mode is 'prefix', case insensitively and most used first. At most 'limit' names are returned. If txt is empty return empty list.
         """
         txt = request.GET.get('txt')
         if txt is None or txt == '':
             return Response()
 
-        tag_names = Course.tags.filter(name__contains=txt).values_list('name', flat=True)
+        mode = request.GET.get('mode', SUBSTRING)
+        if mode not in MODES:
+            raise exceptions.ParseError(
+                f"mode must be one of {', '.join(MODES)}"
+            )
+        try:
+            limit = int(request.GET.get('limit', AUTOCOMPLETE_LIMIT))
+        except ValueError:
+            raise exceptions.ParseError('limit must be an integer')
+        limit = min(max(limit, 1), AUTOCOMPLETE_MAX_LIMIT)
+
+        tag_names = find_tags(txt, mode, limit).values_list('name', flat=True)
 
         return Response(tag_names)
 
 
 class FindCourseView(APIView):
+    @cached_response(Course, Tag, ClassMetadata, CustomUser)
     def get(self, request):
         """
-            Take in tags (optional).
+            Take in tags (optional), match (optional), duration (optional), duration_min (optional), duration_max (optional), student_uuid (optional).
 
-            If tags is provided, return all courses contain the tags, else return all
+            If tags is provided, return all courses that contain all the tags, or any of them if match is 'any', else return all.
+            duration filters on exact duration, duration_min and duration_max on a range.
+            If student_uuid is provided, only return courses of classes the student is enrolled in.
+
+            Pass cursor or page_size to get the result page by page.
         """
         tags = request.GET.get('tags')
+        if tags is not None:
+            tags = [tag.strip() for tag in tags.split(',') if tag.strip()]
 
-        if tags is None:
-            course = Course.objects.all()
-        else:
-            course = Course.objects.filter(
-                tags__name=tags.replace(' ', '').split(',')
+        match = request.GET.get('match', ALL)
+        if match not in MATCHES:
+            raise exceptions.ParseError(
+                f"match must be one of {', '.join(MATCHES)}"
             )
 
-        # student_uuid is provided
-        student_uuid = request.GET.get('student_uuid')
-        if student_uuid is not None:
-            course = Course.objects.filter()
+        durations = {}
+        for field in ('duration', 'duration_min', 'duration_max'):
+            if (value := request.GET.get(field)) is not None:
+                try:
+                    durations[field] = int(value)
+                except ValueError:
+                    raise exceptions.ParseError(f'{field} must be an integer')
+        duration_min = durations.get('duration', durations.get('duration_min'))
+        duration_max = durations.get('duration', durations.get('duration_max'))
 
-        return Response(CourseSerializer(course, many=True).data)
+        # student_uuid is provided
+        student = request.GET.get('student_uuid')
+        if student is not None:
+            student = get_by_uuid(CustomUser, student)
+
+        course = find_courses(
+            tags=tags,
+            match=match,
+            duration_min=duration_min,
+            duration_max=duration_max,
+            student=student
+        )
+
+        return list_objects(course, request)
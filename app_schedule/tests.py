@@ -1,4 +1,7 @@
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from rest_framework import status
@@ -11,7 +14,17 @@
 from master_api.views import (
     CREATE_RESPONSE, EDIT_RESPONSE, GET_RESPONSE, DELETE_RESPONSE, LIST_RESPONSE
 )
-from master_db.models import Schedule
+from master_db.models import (
+    ClassMetadata, RecurrenceRule, Schedule, Session, Timetable
+)
+from master_db.recurrence import (
+    occurrence_ref, parse_occurrence_ref, resolve_occurrence
+)
+
+import datetime
+import io
+
+from uuid import uuid4
 
 CustomUser = get_user_model()
 NUM_STUDENT_EACH = 10
@@ -221,3 +234,615 @@ def test_list(self, printOut=True, length=None):
         print(
             f"Note: All schedule's description NO. should be divisible by 3 in range from 0 to {NUM_SCHED - 1}"
         )
+
+    def test_timetable(self):
+        url = reverse('app_schedule:reverse')
+        std = create_special_student()
+
+        def get_timetable(data):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url, data=data)
+            self.assertEqual(
+                response.status_code,
+                LIST_RESPONSE['status'],
+                msg=prettyStr(response.data)
+            )
+            return response, len(queries)
+
+        # Authenticate once so the principal cache does not skew counts
+        self.client.get(url)
+        self.classes[0].students.add(std)
+        response, one_class = get_timetable({'student_uuid': std.uuid})
+        self.assertEqual(len(response.data), NUM_SCHED / 2)
+
+        self.classes[1].students.add(std)
+        response, two_classes = get_timetable({'student_uuid': std.uuid})
+        self.assertEqual(len(response.data), NUM_SCHED)
+        self.assertEqual(one_class, two_classes)
+
+        # Ordered by time_start
+        starts = [res['time_start'] for res in response.data]
+        self.assertEqual(starts, sorted(starts))
+
+        # Bounded by from/to
+        response, _ = get_timetable(
+            {
+                'student_uuid': std.uuid,
+                'from': '2003-01-01',
+                'to': '2006-01-01 00:00'
+            }
+        )
+        self.assertEqual(
+            [res['time_start'][:4] for res in response.data],
+            ['2003', '2004', '2005']
+        )
+
+        # Teacher timetable
+        response, _ = get_timetable(
+            {'teacher_uuid': self.classes[0].teacher.uuid}
+        )
+        self.assertEqual(len(response.data), NUM_SCHED / 2)
+
+        response = self.client.get(
+            url, data={
+                'student_uuid': std.uuid,
+                'from': 'yesterday'
+            }
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk(self):
+        url = reverse('bulk', kwargs={'model_name': 'schedule'})
+
+        # Create, every item is validated before anything is written
+        data = [
+            {
+                'classroom': str(self.classes[i % 2].uuid),
+                'time_start': f'1969-06-{i + 1:02d} 15:30',
+                'time_end': f'1969-06-{i + 1:02d} 17:30',
+                'desc': f'Bulk {i}'
+            } for i in range(5)
+        ]
+        response = self.client.post(
+            url, data=data[:2] + [{
+                'classroom': 'nope'
+            }], format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(list(response.data['errors'].keys()), [2])
+        self.assertEqual(Schedule.objects.count(), NUM_SCHED)
+
+        # As are bodies that are neither arrays nor objects
+        for body in ('x', 1, None):
+            response = self.client.post(url, data=body, format='json')
+            self.assertEqual(
+                response.status_code, status.HTTP_400_BAD_REQUEST
+            )
+
+        # Items that are not objects are errors of their own
+        response = self.client.post(
+            url, data=data[:1] + [1, 'x'], format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(list(response.data['errors'].keys()), [1, 2])
+        self.assertEqual(Schedule.objects.count(), NUM_SCHED)
+
+        # Items are checked against each other, not only the stored ones
+        response = self.client.post(url, data=[data[0], data[0]], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            response.data['errors'], {
+                0: {
+                    'conflicts': [{
+                        'index': '1'
+                    }]
+                },
+                1: {
+                    'conflicts': [{
+                        'index': '0'
+                    }]
+                }
+            }
+        )
+        self.assertEqual(Schedule.objects.count(), NUM_SCHED)
+
+        response = self.client.post(url, data=data, format='json')
+        self.assertEqual(
+            response.status_code,
+            CREATE_RESPONSE['status'],
+            msg=prettyStr(response.data)
+        )
+        created = response.data['created']
+        self.assertEqual(len(created), 5)
+        self.assertEqual(Schedule.objects.count(), NUM_SCHED + 5)
+
+        # Edit
+        data = [
+            {
+                'uuid': str(uuid),
+                'desc': f'Bulk edited {i}'
+            } for i, uuid in enumerate(created)
+        ]
+        response = self.client.patch(url, data=data, format='json')
+        self.assertEqual(
+            response.status_code,
+            EDIT_RESPONSE['status'],
+            msg=prettyStr(response.data)
+        )
+        for i, uuid in enumerate(created):
+            sched = Schedule.objects.get(uuid=uuid)
+            self.assertEqual(sched.desc, f'Bulk edited {i}')
+            self.assertNotEqual(sched.created, sched.modified)
+
+        # Delete, nothing is deleted if one uuid does not exist
+        response = self.client.delete(
+            url,
+            data=[str(created[0]), str(self.scheds[0].uuid)] + [str(uuid4())],
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(list(response.data['errors'].keys()), [2])
+        self.assertEqual(Schedule.objects.count(), NUM_SCHED + 5)
+
+        response = self.client.delete(
+            url, data=[str(uuid) for uuid in created], format='json'
+        )
+        self.assertEqual(
+            response.status_code,
+            DELETE_RESPONSE['status'],
+            msg=prettyStr(response.data)
+        )
+        self.assertEqual(Schedule.objects.count(), NUM_SCHED)
+
+        response = self.client.post(
+            reverse('bulk', kwargs={'model_name': 'nothing'}),
+            data=[],
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_precomputed_timetable(self):
+        url = reverse('app_schedule:timetable')
+        std = create_special_student()
+
+        def get_timetable(data=None):
+            response = self.client.get(
+                url, data={
+                    'student_uuid': std.uuid,
+                    **(data or {})
+                }
+            )
+            self.assertEqual(
+                response.status_code, LIST_RESPONSE['status'], response.data
+            )
+            return response.data
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(get_timetable(), [])
+
+        # Joining classes, from either side of the relation
+        self.classes[0].students.add(std)
+        std.student_classes.add(self.classes[1])
+        data = get_timetable()
+        self.assertEqual(len(data), NUM_SCHED)
+        self.assertEqual(
+            [row['schedule'] for row in data],
+            [str(sched.uuid) for sched in self.scheds],
+        )
+        self.assertIsNone(data[0]['session'])
+
+        # Sessions
+        session = Session.objects.create(
+            schedule=self.scheds[0], student=std, status=True, homework=9
+        )
+        data = get_timetable()[0]
+        self.assertEqual(data['session'], str(session.uuid))
+        self.assertEqual((data['status'], data['homework']), (True, 9))
+        session.delete()
+        self.assertIsNone(get_timetable()[0]['status'])
+
+        # Schedule times
+        self.scheds[1].time_start = convert_time('1999-01-01 08:00')
+        self.scheds[1].save()
+        self.assertEqual(
+            get_timetable()[0]['schedule'], str(self.scheds[1].uuid)
+        )
+
+        # Bounded by from/to on time_start
+        data = get_timetable({'from': '2002-01-01', 'to': '2005-01-01'})
+        self.assertEqual(
+            [row['schedule'] for row in data],
+            [str(sched.uuid) for sched in self.scheds[2:5]],
+        )
+
+        # Leaving classes
+        self.classes[1].students.remove(std)
+        self.assertEqual(len(get_timetable()), NUM_SCHED / 2)
+        std.student_classes.clear()
+        self.assertEqual(get_timetable(), [])
+
+        # Rebuilding from scratch gives the same rows
+        self.classes[0].students.add(std)
+        rows = set(Timetable.objects.values_list('student', 'schedule'))
+        Timetable.objects.all().delete()
+        call_command('rebuild_timetable', stdout=io.StringIO())
+        self.assertEqual(
+            set(Timetable.objects.values_list('student', 'schedule')), rows
+        )
+        self.assertEqual(len(get_timetable()), NUM_SCHED / 2)
+
+    def test_conflicts(self):
+        klass = self.classes[0]
+        sched = self.scheds[0]
+
+        def create(data):
+            return self.client.post(self.url, data)
+
+        # Same class, same teacher or a shared student
+        other = ClassMetadata.objects.create(
+            course=klass.course,
+            name='Other',
+            status='published',
+            teacher=klass.teacher
+        )
+        shared = ClassMetadata.objects.create(
+            course=klass.course, name='Shared', status='published'
+        )
+        shared.students.add(klass.students.first())
+        for classroom in (klass, other, shared):
+            response = create(
+                {
+                    'classroom': classroom.uuid,
+                    'time_start': '2000-06-09 16:00',
+                    'time_end': '2000-06-09 18:00',
+                }
+            )
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(
+                [conflict['uuid'] for conflict in response.data['conflicts']],
+                [str(sched.uuid)],
+            )
+
+        # Back to back, or in another class, is fine
+        response = create(
+            {
+                'classroom': klass.uuid,
+                'time_start': '2000-06-09 17:09',
+                'time_end': '2000-06-09 18:00',
+            }
+        )
+        self.assertEqual(
+            response.status_code,
+            CREATE_RESPONSE['status'],
+            msg=prettyStr(response.data)
+        )
+        response = create(
+            {
+                'classroom': self.classes[1].uuid,
+                'time_start': '2000-06-09 16:00',
+                'time_end': '2000-06-09 17:00',
+            }
+        )
+        self.assertEqual(
+            response.status_code,
+            CREATE_RESPONSE['status'],
+            msg=prettyStr(response.data)
+        )
+
+        # A schedule does not conflict with itself
+        response = self.client.patch(
+            self.url, {
+                'uuid': sched.uuid,
+                'time_start': '2000-06-09 14:00'
+            }
+        )
+        self.assertEqual(
+            response.status_code,
+            EDIT_RESPONSE['status'],
+            msg=prettyStr(response.data)
+        )
+
+        response = create(
+            {
+                'classroom': klass.uuid,
+                'time_start': '2010-06-09 16:00',
+                'time_end': '2010-06-09 15:00',
+            }
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('time_end', response.data)
+
+    def test_check_conflicts(self):
+        url = reverse('app_schedule:conflicts')
+        klass = self.classes[0]
+
+        def item(start, end, classroom=klass, **kwargs):
+            return {
+                'classroom': str(classroom.uuid),
+                'time_start': f'1999-01-01 {start}',
+                'time_end': f'1999-01-01 {end}',
+                **kwargs
+            }
+
+        data = [
+            item('08:00', '10:00'),
+            item('09:00', '11:00'),
+            item('11:00', '12:00'),
+            item('08:00', '12:00', classroom=self.classes[1]),
+            # Moves a stored schedule onto item 2
+            {
+                'uuid': str(self.scheds[0].uuid),
+                'time_start': '1999-01-01 11:30',
+                'time_end': '1999-01-01 12:30',
+            },
+            # Overlaps a stored schedule
+            {
+                'classroom': str(klass.uuid),
+                'time_start': '2002-06-09 16:00',
+                'time_end': '2002-06-09 18:00',
+            },
+        ]
+        response = self.client.post(url, data=data, format='json')
+        self.assertEqual(
+            response.status_code,
+            LIST_RESPONSE['status'],
+            msg=prettyStr(response.data)
+        )
+        conflicts = response.data['conflicts']
+        self.assertEqual(
+            conflicts, {
+                0: [{
+                    'index': 1
+                }],
+                1: [{
+                    'index': 0
+                }],
+                2: [{
+                    'index': 4
+                }],
+                4: [{
+                    'index': 2
+                }],
+                5: [{
+                    'schedule': conflicts[5][0]['schedule']
+                }],
+            }
+        )
+        self.assertEqual(
+            conflicts[5][0]['schedule']['uuid'], str(self.scheds[2].uuid)
+        )
+
+        response = self.client.post(
+            url, data=[item('10:00', '09:00')], format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(list(response.data['errors'].keys()), [0])
+
+    def test_generate_sessions(self):
+        klass = self.classes[0]
+        students = list(klass.students.all())
+
+        def create(time_start, time_end):
+            response = self.client.post(
+                self.url, {
+                    'classroom': klass.uuid,
+                    'time_start': time_start,
+                    'time_end': time_end,
+                    'generate_sessions': True,
+                }
+            )
+            self.assertEqual(
+                response.status_code,
+                CREATE_RESPONSE['status'],
+                msg=prettyStr(response.data)
+            )
+            return Schedule.objects.latest('created')
+
+        past = create('1990-06-09 15:00', '1990-06-09 17:00')
+        future = create('2990-06-09 15:00', '2990-06-09 17:00')
+        for sched in (past, future):
+            self.assertEqual(
+                set(sched.session_set.values_list('student', flat=True)),
+                {std.pk
+                 for std in students},
+            )
+        self.assertEqual(
+            Timetable.objects.filter(schedule=future,
+                                     session__isnull=False).count(),
+            NUM_STUDENT_EACH
+        )
+        # Schedules without the option are left alone
+        self.assertFalse(self.scheds[0].session_set.exists())
+
+        # Enrollment backfills and prunes sessions that have not started
+        std = create_special_student()
+        klass.students.add(std)
+        self.assertTrue(future.session_set.filter(student=std).exists())
+        self.assertFalse(past.session_set.filter(student=std).exists())
+
+        future.session_set.filter(student=students[0]).update(status=True)
+        klass.students.remove(std, students[0], students[1])
+        self.assertEqual(
+            set(future.session_set.values_list('student', flat=True)),
+            {std.pk
+             for std in students[2:]} | {students[0].pk},
+        )
+        self.assertEqual(past.session_set.count(), NUM_STUDENT_EACH)
+
+        std.student_classes.add(klass)
+        self.assertTrue(future.session_set.filter(student=std).exists())
+        std.student_classes.clear()
+        self.assertFalse(future.session_set.filter(student=std).exists())
+
+    def test_occurrence_ref(self):
+        # Rules may start at any microsecond
+        time_start = datetime.datetime(
+            2030, 9, 9, 8, 0, 0, 123456, tzinfo=datetime.timezone.utc
+        )
+        rule = RecurrenceRule.objects.create(
+            classroom=self.classes[0],
+            frequency=RecurrenceRule.DAILY,
+            time_start=time_start,
+            duration=datetime.timedelta(hours=1),
+        )
+        occurrence = time_start + datetime.timedelta(days=1)
+        sched = resolve_occurrence(occurrence_ref(rule, occurrence))
+        self.assertEqual(sched.time_start, occurrence)
+
+        before_epoch = datetime.datetime(
+            1969, 6, 1, 15, 30, 0, 5, tzinfo=datetime.timezone.utc
+        )
+        self.assertEqual(
+            parse_occurrence_ref(occurrence_ref(rule, before_epoch)),
+            (rule.uuid, before_epoch)
+        )
+        self.assertIsNone(parse_occurrence_ref(f'{rule.uuid}@1.-5'))
+
+    def test_recurrence(self):
+        klass = self.classes[0]
+        std = klass.students.first()
+
+        response = self.client.post(
+            reverse('app_schedule:recurrence_mgmt'), {
+                'classroom': klass.uuid,
+                'weekdays': 'tu, th',
+                'time_start': '2030-09-03 18:00',
+                'duration': '02:00:00',
+            }
+        )
+        self.assertEqual(
+            response.status_code,
+            CREATE_RESPONSE['status'],
+            msg=prettyStr(response.data)
+        )
+        rule = klass.recurrences.get()
+        self.assertEqual(rule.weekdays, 'TU,TH')
+
+        def get_week(**data):
+            response = self.client.get(
+                reverse('app_schedule:reverse'),
+                data={
+                    'from': '2030-09-09',
+                    'to': '2030-09-16',
+                    **data
+                }
+            )
+            self.assertEqual(
+                response.status_code, LIST_RESPONSE['status'], response.data
+            )
+            return response.data
+
+        week = get_week(class_uuid=klass.uuid)
+        self.assertEqual(len(week), 2)
+        self.assertEqual(week[0]['occurrence'], week[0]['time_start'])
+        self.assertEqual(get_week(student_uuid=std.uuid), week)
+        self.assertEqual(get_week(teacher_uuid=klass.teacher.uuid), week)
+        self.assertEqual(Schedule.objects.count(), NUM_SCHED)
+
+        # Nothing is materialized by a session that is not written
+        response = self.client.post(
+            reverse('app_session:session_mgmt'), {
+                'schedule': week[1]['uuid'],
+                'student': 'nope',
+            }
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(
+            reverse('bulk', kwargs={'model_name': 'session'}),
+            data=[
+                {
+                    'schedule': week[1]['uuid'],
+                    'student': str(std.uuid)
+                },
+                {
+                    'schedule': week[0]['uuid'],
+                    'student': 'nope'
+                },
+            ],
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Schedule.objects.count(), NUM_SCHED)
+
+        # A session materializes its occurrence
+        response = self.client.post(
+            reverse('app_session:session_mgmt'), {
+                'schedule': week[1]['uuid'],
+                'student': std.uuid,
+            }
+        )
+        self.assertEqual(
+            response.status_code,
+            CREATE_RESPONSE['status'],
+            msg=prettyStr(response.data)
+        )
+        sched = Schedule.objects.get(recurrence=rule)
+        self.assertEqual(sched.session_set.get().student, std)
+
+        materialized = get_week(class_uuid=klass.uuid)
+        self.assertEqual(len(materialized), 2)
+        self.assertEqual(materialized[0]['uuid'], week[0]['uuid'])
+        self.assertEqual(materialized[1]['uuid'], str(sched.uuid))
+
+        # Editing the rule moves every occurrence at once
+        response = self.client.patch(
+            reverse('app_schedule:recurrence_mgmt'), {
+                'uuid': rule.uuid,
+                'weekdays': 'MO,TU,TH',
+            }
+        )
+        self.assertEqual(
+            response.status_code,
+            EDIT_RESPONSE['status'],
+            msg=prettyStr(response.data)
+        )
+        self.assertEqual(len(get_week(class_uuid=klass.uuid)), 3)
+
+        response = self.client.post(
+            reverse('app_session:session_mgmt'), {
+                'schedule': f'{rule.uuid}@1',
+                'student': std.uuid,
+            }
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        # Bulk writes materialize occurrences in their transaction
+        virtual = [
+            sched for sched in get_week(class_uuid=klass.uuid)
+            if sched['uuid'].count('@') == 1
+        ]
+        response = self.client.post(
+            reverse('bulk', kwargs={'model_name': 'session'}),
+            data=[
+                {
+                    'schedule': sched['uuid'],
+                    'student': str(std.uuid)
+                } for sched in virtual
+            ],
+            format='json'
+        )
+        self.assertEqual(
+            response.status_code,
+            CREATE_RESPONSE['status'],
+            msg=prettyStr(response.data)
+        )
+        self.assertEqual(Schedule.objects.filter(recurrence=rule).count(), 3)
+
+        # Materialized occurrences cost no query of their own
+        def count_queries(**data):
+            with CaptureQueriesContext(connection) as queries:
+                week = get_week(class_uuid=klass.uuid, **data)
+            return len(queries), week
+
+        materialized, week = count_queries()
+        self.assertEqual(len(week), 3)
+        self.assertNotIn('@', ''.join(sched['uuid'] for sched in week))
+        virtual, week = count_queries(
+            **{
+                'from': '2030-10-07',
+                'to': '2030-10-14'
+            }
+        )
+        self.assertEqual(len(week), 3)
+        self.assertEqual(materialized, virtual)
@@ -1,9 +1,14 @@
 from django.urls import path
-from .views import (ScheduleView, FindScheduleView)
+from .views import (
+    ScheduleView, FindScheduleView, TimetableView, ConflictView, RecurrenceView
+)
 
 app_name = 'app_schedule'
 
 urlpatterns = [
     path('schedule', ScheduleView.as_view(), name='schedule_mgmt'),
     path('reverse', FindScheduleView.as_view(), name='reverse'),
+    path('timetable', TimetableView.as_view(), name='timetable'),
+    path('conflicts', ConflictView.as_view(), name='conflicts'),
+    path('recurrence', RecurrenceView.as_view(), name='recurrence_mgmt'),
 ]
@@ -1,24 +1,49 @@
 from django.contrib.auth import get_user_model
 
+from rest_framework import exceptions
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from master_api.utils import get_by_uuid
+from master_api.cache import normalize_uuid
+from master_api.utils import (
+    convert_primitive, convert_time_param, get_by_uuid
+)
 from master_api.views import (
-    create_object, edit_object, delete_object, get_object
+    create_object, edit_object, delete_object, get_object, get_bulk_payload,
+    list_objects
+)
+from master_db.conflicts import check_schedules
+from master_db.models import (
+    ClassMetadata, RecurrenceRule, Schedule, Timetable
 )
-from master_db.models import (ClassMetadata, Schedule)
-from master_db.serializers import ScheduleSerializer
+from master_db.recurrence import virtual_schedules
+from master_db.serializers import (ScheduleSerializer, TimetableSerializer)
+
+import itertools
 
 CustomUser = get_user_model()
 
 
+class RecurrenceView(APIView):
+    def post(self, request):
+        return create_object(RecurrenceRule, data=request.data)
+
+    def get(self, request):
+        return get_object(RecurrenceRule, data=request.GET, request=request)
+
+    def patch(self, request):
+        return edit_object(RecurrenceRule, data=request.data)
+
+    def delete(self, request):
+        return delete_object(RecurrenceRule, data=request.data)
+
+
 class ScheduleView(APIView):
     def post(self, request):
         return create_object(Schedule, data=request.data)
 
     def get(self, request):
-        return get_object(Schedule, data=request.GET)
+        return get_object(Schedule, data=request.GET, request=request)
 
     def patch(self, request):
         return edit_object(Schedule, data=request.data)
@@ -27,26 +52,87 @@ def delete(self, request):
         return delete_object(Schedule, data=request.data)
 
 
+# Relations rendered by ScheduleSerializer, the name of a recurrence
+# rule reads its class
+SCHEDULE_RELATED = ('classroom', 'recurrence__classroom')
+
+
+def list_timetable(queryset, request, rules=None):
+    """
+        List schedules of queryset ordered by time_start, restricted to
+        those overlapping the optional `from`/`to` range. Classrooms are
+        joined in, along with recurrence rules of materialized
+        occurrences, so the whole timetable costs a single query.
+
+        If rules (a RecurrenceRule queryset) is given along with both
+        from and to, the occurrences of those rules in the range are
+        expanded and listed with the stored schedules. Such a result is
+        a single list, pagination does not apply.
+    """
+    time_from = convert_time_param(request.GET, 'from')
+    time_to = convert_time_param(request.GET, 'to')
+
+    queryset = queryset.select_related(*SCHEDULE_RELATED)
+    if time_to is not None:
+        queryset = queryset.filter(time_start__lt=time_to)
+    if time_from is not None:
+        queryset = queryset.filter(time_end__gt=time_from)
+    queryset = queryset.order_by('time_start', 'id')
+
+    if rules is not None and time_from is not None and time_to is not None:
+        virtual = virtual_schedules(
+            rules.select_related('classroom'), time_from, time_to
+        )
+        schedules = sorted(
+            itertools.chain(queryset, virtual),
+            key=lambda obj: (obj.time_start, obj.pk is None)
+        )
+        return Response(ScheduleSerializer(schedules, many=True).data)
+
+    return list_objects(queryset, request, ordering=('time_start', 'id'))
+
+
 class FindScheduleView(APIView):
     def get(self, request):
         """
-            Take in class_uuid (optional), student_uuid (optional), teacher_uuid (optional).
+            Take in class_uuid (optional), student_uuid (optional), teacher_uuid (optional),
+            from (optional), to (optional).
 
             If class_uuid is provided, result will be all schedules for that class.
 
             If student_uuid is provided, result will be all schedules for all the classes that have that student
 
+            If teacher_uuid is provided, result will be all schedules for all the classes taught by that teacher
+
             If none, result will be all schedules in db.
 
             Priority: class_uuid > student_uuid > teacher_uuid
+
+            Student and teacher timetables are ordered by time_start and
+            can be bounded with from/to, keeping schedules that overlap
+            the range.
+
+            When both from and to are given, occurrences of the
+            recurrence rules of the classes are included. Occurrences
+            that are not materialized yet have `<rule uuid>@<timestamp>`
+            as uuid, which a session may use as its schedule.
+
+            Pass cursor or page_size to get the result page by page.
         """
 
         # class_uuid is provided
         classMeta = request.GET.get('class_uuid')
         if classMeta is not None:
             classMeta = get_by_uuid(ClassMetadata, classMeta)
-            return Response(
-                ScheduleSerializer(classMeta.schedule_set, many=True).data
+            if 'from' in request.GET or 'to' in request.GET:
+                return list_timetable(
+                    classMeta.schedule_set.all(),
+                    request,
+                    rules=classMeta.recurrences.all()
+                )
+            return list_objects(
+                classMeta.schedule_set.select_related(*SCHEDULE_RELATED),
+                request
             )
 
         # student_uuid is provided
@@ -55,33 +141,134 @@ def get(self, request):
             # Get student
             student = get_by_uuid(CustomUser, student)
 
-            # Get classes of student
-            classes = student.student_classes.all()
-
-            # Iterate through each class and get its schedules
-            data = []
-            for c in classes:
-                data.extend(ScheduleSerializer(c.schedule_set, many=True).data)
-
-            return Response(data)
+            # Schedules of every class that has the student
+            return list_timetable(
+                Schedule.objects.filter(classroom__students=student),
+                request,
+                rules=RecurrenceRule.objects.filter(
+                    classroom__students=student
+                )
+            )
 
         # teacher_uuid is provided
         teacher = request.GET.get('teacher_uuid')
         if not teacher is None:
-            # Get student
+            # Get teacher
             teacher = get_by_uuid(CustomUser, teacher)
 
-            # Get classes of teacher
-            classes = teacher.teacher_classes.all()
+            # Schedules of every class taught by the teacher
+            return list_timetable(
+                Schedule.objects.filter(classroom__teacher=teacher),
+                request,
+                rules=RecurrenceRule.objects.filter(classroom__teacher=teacher)
+            )
 
-            # Iterate through each class and get its schedules
-            data = []
-            for c in classes:
-                data.extend(ScheduleSerializer(c.schedule_set, many=True).data)
+        # None are provided
+        return list_objects(
+            Schedule.objects.select_related(*SCHEDULE_RELATED), request
+        )
 
-            return Response(data)
 
-        # None are provided
-        return Response(
-            ScheduleSerializer(Schedule.objects.all(), many=True).data
+class TimetableView(APIView):
+    def get(self, request):
+        """
+            Take in student_uuid, from (optional), to (optional).
+
+            Result will be the schedules of every class of the student,
+            with the status and homework of the student's sessions,
+            ordered by time_start. from/to bound time_start, so a week
+            is a single range scan of the precomputed timetable.
+
+            Pass cursor or page_size to get the result page by page.
+        """
+        student = request.GET.get('student_uuid')
+        if student is None:
+            raise exceptions.ParseError(
+                {'student_uuid': 'This field is required.'}
+            )
+        student = get_by_uuid(CustomUser, student)
+
+        time_from = convert_time_param(request.GET, 'from')
+        time_to = convert_time_param(request.GET, 'to')
+
+        timetable = Timetable.objects.filter(
+            student=student
+        ).select_related('schedule', 'classroom', 'session')
+        if time_from is not None:
+            timetable = timetable.filter(time_start__gte=time_from)
+        if time_to is not None:
+            timetable = timetable.filter(time_start__lt=time_to)
+
+        return list_objects(
+            timetable.order_by('time_start', 'id'),
+            request,
+            Serializer=TimetableSerializer,
+            ordering=('time_start', 'id')
         )
+
+
+class ConflictView(APIView):
+    def post(self, request):
+        """
+            Take in a json list of schedules (classroom, time_start,
+            time_end, and uuid for schedules being edited), ie. a whole
+            term, and check them against each other and against stored
+            schedules in one pass. Nothing is written.
+
+            Result is {'conflicts': {index: [conflict, ...]}} where each
+            conflict is either {'index': other item} or {'schedule':
+            stored schedule}. No conflicts gives an empty dict.
+        """
+        items = get_bulk_payload(request.data)
+
+        errors = {}
+        keys = []
+        for index, item in enumerate(items):
+            key = item.get('uuid') if isinstance(item, dict) else None
+            if key is not None and (key := normalize_uuid(key)) is None:
+                errors[index] = {'uuid': 'A valid uuid is required.'}
+            keys.append(key)
+        if errors:
+            raise exceptions.ParseError(convert_primitive({'errors': errors}))
+
+        instances = {
+            obj.uuid: obj
+            for obj in
+            Schedule.objects.filter(uuid__in=[key for key in keys if key])
+        }
+
+        validated = []
+        for index, (item, key) in enumerate(zip(items, keys)):
+            instance = instances.get(key)
+            if key is not None and instance is None:
+                errors[index] = {'uuid': 'Schedule does not exist'}
+                continue
+            data = {k: v for k, v in item.items() if k != 'uuid'}
+            serializer = ScheduleSerializer(
+                instance=instance,
+                data=data,
+                context={'check_conflicts': False}
+            )
+            if not serializer.is_valid():
+                errors[index] = serializer.errors
+                continue
+            validated.append(
+                {
+                    'classroom': getattr(instance, 'classroom', None),
+                    'time_start': getattr(instance, 'time_start', None),
+                    'time_end': getattr(instance, 'time_end', None),
+                    **serializer.validated_data,
+                    'instance': instance,
+                }
+            )
+        if errors:
+            raise exceptions.ParseError(convert_primitive({'errors': errors}))
+
+        conflicts = check_schedules(validated)
+        for found in conflicts.values():
+            for conflict in found:
+                if 'schedule' in conflict:
+                    conflict['schedule'] = ScheduleSerializer(
+                        conflict['schedule']
+                    ).data
+        return Response({'conflicts': conflicts})
@@ -1,4 +1,6 @@
 from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from rest_framework import status
@@ -163,3 +165,144 @@ def test_list(self, printOut=True, length=None):
             print("\n ============List All DB Visualizing============")
         else:
             return response
+
+    def test_keyset_pagination(self):
+        url = reverse('app_session:reverse')
+        page_size = 3
+
+        # Walk forward until there is no next cursor
+        uuids, pages, cursor = [], [], None
+        while True:
+            data = {'page_size': page_size}
+            if cursor is not None:
+                data['cursor'] = cursor
+            response = self.client.get(url, data=data)
+            self.assertEqual(
+                response.status_code,
+                LIST_RESPONSE['status'],
+                msg=prettyStr(response.data)
+            )
+            self.assertLessEqual(len(response.data['results']), page_size)
+            pages.append(response.data)
+            uuids.extend(res['uuid'] for res in response.data['results'])
+            if (cursor := response.data['next']) is None:
+                break
+
+        self.assertEqual(len(pages), -(-NUM_SESSION // page_size))
+        self.assertIsNone(pages[0]['previous'])
+        ordered = sorted(self.sessions, key=lambda s: (s.created, s.id))
+        self.assertEqual(uuids, [str(s.uuid) for s in ordered])
+
+        # Walk back one page from the last one
+        response = self.client.get(
+            url, data={
+                'page_size': page_size,
+                'cursor': pages[-1]['previous']
+            }
+        )
+        self.assertEqual(response.data['results'], pages[-2]['results'])
+
+        response = self.client.get(url, data={'cursor': 'garbage'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_attendance(self):
+        url = reverse('app_session:attendance')
+        students = [session.student for session in self.sessions]
+
+        def mark(students, **data):
+            payload = {
+                'schedule_uuid': str(self.sched.uuid),
+                'students': {str(std.uuid): data
+                             for std in students},
+            }
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.patch(url, payload, format='json')
+            return response, len(queries)
+
+        # Authenticate once so the principal cache does not skew counts
+        self.client.get(reverse('app_session:reverse'))
+        response, few = mark(students[:2], status=True, homework=10)
+        self.assertEqual(
+            response.status_code,
+            EDIT_RESPONSE['status'],
+            msg=prettyStr(response.data)
+        )
+        response, many = mark(students, status=False)
+        self.assertEqual(few, many)
+        self.assertEqual(set(response.data['results'].values()), {'Ok'})
+        self.assertEqual(
+            set(Session.objects.values_list('status', flat=True)), {False}
+        )
+        self.assertEqual(Session.objects.get(student=students[0]).homework, 10)
+
+        # Per-student results
+        stranger = create_sched(1).classroom.students.first()
+        response, _ = mark([students[0], stranger], homework=5)
+        self.assertEqual(
+            response.data['results'], {
+                str(students[0].uuid): 'Ok',
+                str(stranger.uuid): 'Session does not exist',
+            }
+        )
+
+        # Nothing is written if an entry is invalid
+        response = self.client.patch(
+            url, {
+                'schedule_uuid': str(self.sched.uuid),
+                'students':
+                    {
+                        str(students[0].uuid): {
+                            'homework': 1
+                        },
+                        str(students[1].uuid): {
+                            'homework': 'many'
+                        },
+                        'nope': {},
+                    },
+            },
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            set(response.data['errors'].keys()),
+            {str(students[1].uuid), 'nope'}
+        )
+        self.assertEqual(Session.objects.get(student=students[0]).homework, 5)
+
+        # Entries that are not objects are per-student errors
+        response = self.client.patch(
+            url, {
+                'schedule_uuid': str(self.sched.uuid),
+                'students': {
+                    str(students[0].uuid): 1
+                },
+            },
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn(str(students[0].uuid), response.data['errors'])
+
+        # As is the same student twice, whatever the case of its uuid
+        response = self.client.patch(
+            url, {
+                'schedule_uuid': str(self.sched.uuid),
+                'students': {
+                    str(students[0].uuid): {
+                        'homework': 1
+                    },
+                    str(students[0].uuid).upper(): {
+                        'homework': 2
+                    },
+                },
+            },
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            list(response.data['errors'].keys()),
+            [str(students[0].uuid).upper()]
+        )
+
+        # Payloads that are not objects are rejected
+        response = self.client.patch(url, [1, 2], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -1,9 +1,10 @@
 from django.urls import path
-from .views import (SessionView, FindSessionView)
+from .views import (SessionView, FindSessionView, AttendanceView)
 
 app_name = 'app_session'
 
 urlpatterns = [
     path('session', SessionView.as_view(), name='session_mgmt'),
     path('reverse', FindSessionView.as_view(), name='reverse'),
+    path('attendance', AttendanceView.as_view(), name='attendance'),
 ]
@@ -1,23 +1,31 @@
 from django.core.exceptions import ValidationError
+from django.db import transaction
 
 from rest_framework import (exceptions, status)
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from master_db.models import Session
-from master_db.serializers import SessionSerializer
-from master_api.utils import get_list_or_404
+from master_api.cache import normalize_uuid
+from master_api.utils import (convert_primitive, get_by_uuid)
+from master_db.models import (Schedule, Session)
+from master_db.serializers import AttendanceSerializer
+from master_db.signals import post_bulk_save
 from master_api.views import (
-    create_object, edit_object, delete_object, get_object
+    create_object, edit_object, delete_object, get_object, is_auto_now,
+    list_objects
 )
 
+from collections.abc import Mapping
+
+import json
+
 
 class SessionView(APIView):
     def post(self, request):
         return create_object(Session, data=request.data)
 
     def get(self, request):
-        return get_object(Session, data=request.GET)
+        return get_object(Session, data=request.GET, request=request)
 
     def delete(self, request):
         return delete_object(Session, data=request.data)
@@ -40,40 +48,122 @@ def get(self, request):
             If none is provided return all sessions in the db.
 
             Priority: class_uuid > schedule_uuid > student_uuid
+
+            Pass cursor or page_size to get the result page by page.
         """
         # class_name is provided
         session = request.GET.get('class_uuid')
         if session is not None:
             try:
-                session = get_list_or_404(
-                    Session, 'Class', schedule__classroom__uuid=session
+                session = Session.objects.filter(
+                    schedule__classroom__uuid=session
                 )
-                return Response(SessionSerializer(session, many=True).data)
             except ValidationError as message:
                 raise exceptions.ParseError({'detail': list(message)})
+            return list_objects(session, request, name_print='Class')
 
         # sched_id is provided, no need to show session field
         session = request.GET.get('schedule_uuid')
         if session is not None:
             try:
-                session = get_list_or_404(
-                    Session, 'Schedule', schedule__uuid=session
-                )
+                session = Session.objects.filter(schedule__uuid=session)
             except ValidationError as message:
                 raise exceptions.ParseError({'detail': list(message)})
-            return Response(SessionSerializer(session, many=True).data)
+            return list_objects(session, request, name_print='Schedule')
 
         # student_uuid is provided, no need to show student field
         session = request.GET.get('student_uuid')
         if session is not None:
             try:
-                session = get_list_or_404(
-                    Session, 'Student', student__uuid=session
-                )
+                session = Session.objects.filter(student__uuid=session)
             except ValidationError as message:
                 raise exceptions.ParseError({'detail': list(message)})
-            return Response(SessionSerializer(session, many=True).data)
+            return list_objects(session, request, name_print='Student')
+
+        return list_objects(Session.objects.all(), request)
+
 
-        return Response(
-            SessionSerializer(Session.objects.all(), many=True).data
+class AttendanceView(APIView):
+    def patch(self, request):
+        """
+            Take in schedule_uuid, students: a json object
+            {student_uuid: {status (optional), homework (optional)}}.
+
+            Mark the sessions of those students in the schedule with a
+            single bulk_update in one transaction. Result is the outcome
+            for each student: 'Ok' or why it was not marked. Nothing is
+            written if any entry is invalid.
+        """
+        if not isinstance(request.data, Mapping):
+            raise exceptions.ParseError(
+                {'detail': 'Payload must be a json object.'}
+            )
+        schedule = request.data.get('schedule_uuid')
+        if schedule is None:
+            raise exceptions.ParseError(
+                {'schedule_uuid': 'This field is required.'}
+            )
+        schedule = get_by_uuid(Schedule, schedule)
+
+        students = request.data.get('students')
+        if isinstance(students, str):
+            try:
+                students = json.loads(students)
+            except ValueError:
+                students = None
+        if not isinstance(students, dict):
+            raise exceptions.ParseError(
+                {'students': 'Must be a json object of student uuids.'}
+            )
+
+        errors, marks, seen = {}, {}, set()
+        for student, data in students.items():
+            if (key := normalize_uuid(student)) is None:
+                errors[student] = {'uuid': 'A valid uuid is required.'}
+                continue
+            # The same uuid spelled in another case
+            if key in seen:
+                errors[student] = {'uuid': 'Duplicated in payload.'}
+                continue
+            seen.add(key)
+            if not isinstance(data, dict):
+                errors[student] = {
+                    'detail': 'Must be a json object of status and homework.'
+                }
+                continue
+            serializer = AttendanceSerializer(data=data)
+            if serializer.is_valid():
+                marks[key] = serializer.validated_data
+            else:
+                errors[student] = serializer.errors
+        if errors:
+            raise exceptions.ParseError(convert_primitive({'errors': errors}))
+
+        sessions = Session.objects.filter(
+            schedule=schedule, student__uuid__in=marks.keys()
         )
+        sessions = list(sessions.select_related('student'))
+
+        results = {str(key): 'Session does not exist' for key in marks}
+        update_fields = set()
+        for session in sessions:
+            for name, value in marks[session.student.uuid].items():
+                setattr(session, name, value)
+                update_fields.add(name)
+            results[str(session.student.uuid)] = 'Ok'
+        # bulk_update does not call pre_save, refresh auto_now fields here
+        for field in filter(is_auto_now, Session._meta.concrete_fields):
+            for session in sessions:
+                setattr(session, field.attname, field.pre_save(session, False))
+            update_fields.add(field.name)
+
+        if sessions and update_fields:
+            with transaction.atomic():
+                Session.objects.bulk_update(sessions, update_fields)
+                post_bulk_save.send(
+                    sender=Session,
+                    instances=sessions,
+                    created=False,
+                    update_fields=update_fields
+                )
+        return Response({'results': results})
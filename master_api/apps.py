@@ -1,6 +1,43 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.backends.signals import connection_created
+from django.db.models.signals import (m2m_changed, post_delete, post_save)
+
+from importlib import import_module
 
 
 class ApiGatewayConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'master_api'
+
+    def ready(self):
+        from .authentication import (principal_changed, principal_m2m_changed)
+        from .instrumentation import install_wrapper
+
+        # Cached views track the models they are computed from when
+        # they are imported, which processes serving no request (cron
+        # jobs, shells) must do too
+        import_module(settings.ROOT_URLCONF)
+
+        connection_created.connect(
+            install_wrapper, dispatch_uid='instrumentation_wrapper'
+        )
+
+        CustomUser = get_user_model()
+        post_save.connect(
+            principal_changed,
+            sender=CustomUser,
+            dispatch_uid='principal_post_save'
+        )
+        post_delete.connect(
+            principal_changed,
+            sender=CustomUser,
+            dispatch_uid='principal_post_delete'
+        )
+        for field in ('groups', 'user_permissions'):
+            m2m_changed.connect(
+                principal_m2m_changed,
+                sender=getattr(CustomUser, field).through,
+                dispatch_uid=f'principal_{field}_changed'
+            )
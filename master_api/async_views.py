@@ -0,0 +1,114 @@
+"""
+    Async entry points of the read-heavy views, for ASGI deployments.
+
+    Django 3.2 has no async ORM interface and DRF views are synchronous,
+    so under ASGI every sync view runs on the single thread Django keeps
+    for thread-sensitive code. The views wrapped here run instead on a
+    pool of ASYNC_VIEW_WORKERS threads, each with its own database
+    connection, so that many requests are served at once while the
+    event loop stays free. At most ASYNC_VIEW_QUEUE_SIZE more requests
+    wait for a thread; the next ones get 503. Views that need neither
+    the database nor DRF (ping) are native coroutines.
+"""
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import (HttpResponse, JsonResponse)
+
+from concurrent.futures import ThreadPoolExecutor
+
+import asyncio
+import contextvars
+import functools
+import threading
+
+ASYNC_VIEW_WORKERS = getattr(settings, 'ASYNC_VIEW_WORKERS', 8)
+ASYNC_VIEW_QUEUE_SIZE = getattr(settings, 'ASYNC_VIEW_QUEUE_SIZE', 64)
+
+
+def materialize(response):
+    """
+        Plain response with the whole content of a streamed one. The ASGI
+        handler iterates streamed content on the event loop, where the
+        ORM cannot run, and after the connection of the pool thread is
+        closed: lists asked with stream=true are built in the pool.
+    """
+    materialized = HttpResponse(
+        b''.join(response.streaming_content), status=response.status_code
+    )
+    for header, value in response.items():
+        materialized[header] = value
+    return materialized
+
+
+class ViewPool:
+    """
+        Bounded pool of threads running sync views for async callers
+    """
+    def __init__(
+        self, workers=ASYNC_VIEW_WORKERS, queue_size=ASYNC_VIEW_QUEUE_SIZE
+    ):
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix='async-view'
+        )
+        self.slots = threading.BoundedSemaphore(workers + queue_size)
+
+    @staticmethod
+    def call(view, request, *args, **kwargs):
+        # Connections of pool threads are not seen by the request
+        # signals of the handler, which run on another thread
+        close_old_connections()
+        try:
+            response = view(request, *args, **kwargs)
+            if callable(getattr(response, 'render', None)):
+                response = response.render()
+            if response.streaming:
+                response = materialize(response)
+            return response
+        finally:
+            close_old_connections()
+
+    async def run(self, view, request, *args, **kwargs):
+        if not self.slots.acquire(blocking=False):
+            response = JsonResponse(
+                {'detail': 'Server busy, try again later.'}, status=503
+            )
+            response['Retry-After'] = '1'
+            return response
+        try:
+            loop = asyncio.get_running_loop()
+            # Run in the context of the caller, which holds per request
+            # state such as the database to read from (see routers)
+            context = contextvars.copy_context()
+            return await loop.run_in_executor(
+                self.executor,
+                functools.partial(
+                    context.run, self.call, view, request, *args, **kwargs
+                )
+            )
+        finally:
+            self.slots.release()
+
+
+view_pool = ViewPool()
+
+
+def async_view(view):
+    """
+        Coroutine view running view (a view function or an APIView
+        class) on view_pool
+    """
+    if isinstance(view, type):
+        view = view.as_view()
+
+    async def wrapper(request, *args, **kwargs):
+        return await view_pool.run(view, request, *args, **kwargs)
+
+    wrapper.csrf_exempt = getattr(view, 'csrf_exempt', False)
+    return wrapper
+
+
+async def ping(request):
+    return JsonResponse({'detail': 'pong'})
+
+
+ping.csrf_exempt = True
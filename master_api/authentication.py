@@ -0,0 +1,94 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import prefetch_related_objects
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import (
+    AuthenticationFailed, InvalidToken
+)
+from rest_framework_simplejwt.settings import api_settings
+
+from master_api.cache import (LRUCache, normalize_uuid)
+
+import copy
+
+PRINCIPAL_CACHE_SIZE = getattr(settings, 'PRINCIPAL_CACHE_SIZE', 1024)
+PRINCIPAL_CACHE_TTL = getattr(settings, 'PRINCIPAL_CACHE_TTL', 60)
+
+principal_cache = LRUCache(PRINCIPAL_CACHE_SIZE, ttl=PRINCIPAL_CACHE_TTL)
+
+
+def get_principal(user_uuid):
+    """
+        Get the user with user_uuid, with its groups and permissions
+        prefetched, from the principal cache or else the database.
+
+        Entries are dropped when the user is saved or deleted, or when
+        its groups or permissions change, and expire after
+        PRINCIPAL_CACHE_TTL seconds to bound staleness across processes.
+        Each call returns its own copy, so callers may modify it freely.
+
+        Raise CustomUser.DoesNotExist if there is no such user.
+    """
+    CustomUser = get_user_model()
+    if (key := normalize_uuid(user_uuid)) is None:
+        raise CustomUser.DoesNotExist
+
+    if (user := principal_cache.get(key)) is None:
+        user = CustomUser.objects.get(uuid=key)
+        prefetch_related_objects([user], 'groups', 'user_permissions')
+        principal_cache.set(key, user)
+    return copy_principal(user)
+
+
+def copy_principal(user):
+    """
+        Copy of a cached user sharing no cache with it: what a request
+        prefetches on its user must not leak into the next ones
+    """
+    principal = copy.copy(user)
+    principal._state = copy.copy(user._state)
+    principal._state.fields_cache = dict(user._state.fields_cache)
+    principal._prefetched_objects_cache = dict(user._prefetched_objects_cache)
+    return principal
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+        JWTAuthentication resolving the user of a token through the
+        principal cache, so authenticated requests make no user query
+    """
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(
+                _('Token contained no recognizable user identification')
+            )
+
+        try:
+            user = get_principal(user_id)
+        except self.user_model.DoesNotExist:
+            raise AuthenticationFailed(
+                _('User not found'), code='user_not_found'
+            )
+
+        if not user.is_active:
+            raise AuthenticationFailed(
+                _('User is inactive'), code='user_inactive'
+            )
+
+        return user
+
+
+def principal_changed(sender, instance, **kwargs):
+    principal_cache.delete(instance.uuid)
+
+
+def principal_m2m_changed(sender, instance, **kwargs):
+    if isinstance(instance, get_user_model()):
+        principal_cache.delete(instance.uuid)
+    else:
+        # Users were added to or removed from a group or permission
+        principal_cache.clear()
@@ -0,0 +1,66 @@
+from collections import OrderedDict
+
+import threading
+import time
+import uuid
+
+
+class LRUCache:
+    """
+        Bounded, thread-safe least-recently-used mapping. Entries are
+        evicted once maxsize is reached, oldest first, and after ttl
+        seconds if ttl is set.
+    """
+    def __init__(self, maxsize, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                expires, value = self._data[key]
+            except KeyError:
+                return default
+            if expires is not None and expires <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        expires = None if self.ttl is None else time.monotonic() + self.ttl
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+def normalize_uuid(value):
+    """
+        Return value as uuid.UUID, or None if it is not a valid uuid
+    """
+    if isinstance(value, uuid.UUID):
+        return value
+    if value is None or isinstance(value, bool):
+        return None
+    try:
+        return uuid.UUID(str(value))
+    except (AttributeError, TypeError, ValueError):
+        return None
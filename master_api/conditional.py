@@ -0,0 +1,114 @@
+"""
+    Conditional GET for the generic views.
+
+    The validators of a list are its row count and the greatest
+    `modified` of its rows, along with the query of the request, which
+    selects the page and the fields. Any create, edit or delete in the
+    list changes one of them. They are computed from the rows once
+    fetched, before anything is serialized, so they cost no query. Only
+    streamed lists, whose rows are never all fetched at once, need an
+    aggregate query, and only when the request is conditional. Changes
+    to related rows that do not touch `modified` are not seen, so the
+    ETags are weak.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import (Count, Max)
+from django.utils.cache import get_conditional_response
+from django.utils.http import (http_date, urlencode)
+
+import hashlib
+
+
+def has_modified(model):
+    try:
+        model._meta.get_field('modified')
+    except FieldDoesNotExist:
+        return False
+    return True
+
+
+def make_etag(*parts):
+    digest = hashlib.md5(':'.join(map(str, parts)).encode()).hexdigest()
+    return f'W/"{digest}"'
+
+
+CONDITIONAL_HEADERS = (
+    'HTTP_IF_MATCH', 'HTTP_IF_NONE_MATCH', 'HTTP_IF_MODIFIED_SINCE',
+    'HTTP_IF_UNMODIFIED_SINCE'
+)
+
+
+def is_conditional(request):
+    return any(header in request.META for header in CONDITIONAL_HEADERS)
+
+
+def request_query(request):
+    return urlencode(sorted(request.GET.lists()), doseq=True)
+
+
+def list_etag(model, count, last_modified, query):
+    stamp = None if last_modified is None else last_modified.isoformat()
+    return make_etag(model._meta.label, count, stamp, query)
+
+
+def queryset_validators(queryset, query=''):
+    """
+        (etag, last modified) of the rows of queryset, or (None, None) if
+        its model has no modified field. Costs an aggregate query.
+    """
+    model = queryset.model
+    if not has_modified(model):
+        return None, None
+    stats = queryset.order_by().aggregate(
+        last_modified=Max('modified'), count=Count('pk')
+    )
+    last_modified = stats['last_modified']
+    return list_etag(model, stats['count'], last_modified, query), last_modified
+
+
+def list_validators(model, objs, query=''):
+    """
+        (etag, last modified) of a fetched list of objects of model, or
+        (None, None) if model has no modified field
+    """
+    if not has_modified(model):
+        return None, None
+    last_modified = max((obj.modified for obj in objs), default=None)
+    return list_etag(model, len(objs), last_modified, query), last_modified
+
+
+def object_validators(obj):
+    """
+        (etag, last modified) of a single object
+    """
+    if not has_modified(type(obj)):
+        return None, None
+    etag = make_etag(obj._meta.label, obj.pk, obj.modified.isoformat())
+    return etag, obj.modified
+
+
+def set_validators(response, etag, last_modified):
+    if etag is not None:
+        response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    return response
+
+
+def conditional_response(request, etag, last_modified):
+    """
+        304 (or 412) response if the conditional headers of request are
+        satisfied by etag and last_modified, None otherwise
+    """
+    if etag is None and last_modified is None:
+        return None
+    timestamp = None
+    if last_modified is not None:
+        # HTTP dates have a one second resolution
+        timestamp = int(last_modified.timestamp())
+    response = get_conditional_response(
+        request, etag=etag, last_modified=timestamp
+    )
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
@@ -1,5 +1,9 @@
 from django_cron import CronJobBase, Schedule
 
+from master_api.response_cache import bump
+from master_db.models import TagUsage
+from master_db.tags import reconcile_tag_usage
+
 import datetime
 
 
@@ -21,3 +25,19 @@ class MyCronJob1(CronJobBase):
 
     def do(self):
         print(f'Unfuck {datetime.datetime.now()}')
+
+
+class ReconcileTagUsageJob(CronJobBase):
+    """
+        Recount TagUsage, in case a counter drifted (raw SQL, failed
+        signal receiver...)
+    """
+    RUN_EVERY_MINS = 60
+
+    schedule = Schedule(run_every_mins=RUN_EVERY_MINS)
+    code = 'master_db.reconcile_tag_usage'
+
+    def do(self):
+        count = reconcile_tag_usage()
+        bump(TagUsage)
+        return f'{count} tags in use'
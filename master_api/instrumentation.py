@@ -0,0 +1,298 @@
+"""
+    Per request instrumentation.
+
+    A share INSTRUMENTATION_SAMPLE_RATE of requests is profiled: their
+    SQL statements are counted and timed by an execute wrapper installed
+    on every connection as it opens, the time spent in serializer .data
+    is measured, and the INSTRUMENTATION_SLOW_QUERIES slowest statements
+    are kept along with the line of the project that ran them. Profiles
+    are aggregated per endpoint in request_stats, served by the stats
+    view, and summarized in a Server-Timing header if
+    INSTRUMENTATION_SERVER_TIMING is set.
+
+    The profile of the current request is found through a context
+    variable, which follows the request into the threads running its
+    sync parts under ASGI and into view pools. Requests that are not
+    sampled only cost a random draw, and a variable lookup per statement
+    and serialization. The middleware is sync and async capable.
+
+    Streamed responses are profiled until their content is exhausted,
+    but their Server-Timing header is sent before, so it only covers the
+    time to the first byte.
+"""
+from django.conf import settings
+
+from master_api.utils import summarize
+
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import asyncio
+import heapq
+import os
+import random
+import threading
+import time
+import traceback
+
+INSTRUMENTATION_SAMPLES = getattr(settings, 'INSTRUMENTATION_SAMPLES', 1024)
+
+PROJECT_DIR = str(settings.BASE_DIR) + os.sep
+
+_profile = ContextVar('request_profile', default=None)
+
+
+def statement_origin():
+    """
+        'file:line in function' of the innermost project frame of the
+        current stack, outside of this module and installed packages
+    """
+    for frame, lineno in traceback.walk_stack(None):
+        filename = frame.f_code.co_filename
+        if (
+            filename.startswith(PROJECT_DIR) and filename != __file__ and
+            'site-packages' not in filename
+        ):
+            path = filename[len(PROJECT_DIR):]
+            return f'{path}:{lineno} in {frame.f_code.co_name}'
+    return None
+
+
+class Profile:
+    """
+        Measures of a single request. Times are in seconds.
+    """
+    def __init__(self, slow_queries):
+        self.queries = 0
+        self.sql = 0.0
+        self.serialization = 0.0
+        self.size = 0
+        self.serializing = False
+        self.slow_queries = slow_queries
+        # Min-heap of (duration, order, sql, origin)
+        self.slowest = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.record_query(time.perf_counter() - start, sql)
+
+    def record_query(self, duration, sql):
+        self.queries += 1
+        self.sql += duration
+        if self.slow_queries <= 0:
+            return
+        # The stack is only walked for statements that are kept
+        if len(self.slowest) < self.slow_queries:
+            heapq.heappush(
+                self.slowest, (duration, self.queries, sql, statement_origin())
+            )
+        elif duration > self.slowest[0][0]:
+            heapq.heapreplace(
+                self.slowest, (duration, self.queries, sql, statement_origin())
+            )
+
+    def slowest_queries(self):
+        """
+            Kept statements, slowest first, with their duration in ms
+        """
+        return [
+            {
+                'ms': duration * 1000,
+                'sql': sql,
+                'origin': origin
+            }
+            for duration, _, sql, origin in sorted(self.slowest, reverse=True)
+        ]
+
+    @contextmanager
+    def active(self):
+        token = _profile.set(self)
+        try:
+            yield self
+        finally:
+            _profile.reset(token)
+
+
+def record_statement(execute, sql, params, many, context):
+    """
+        Execute wrapper recording the statement in the profile of the
+        current request, if any
+    """
+    if (profile := _profile.get()) is None:
+        return execute(sql, params, many, context)
+    return profile(execute, sql, params, many, context)
+
+
+def install_wrapper(sender, connection, **kwargs):
+    """
+        connection_created receiver. Wrappers are kept when a connection
+        is reopened.
+    """
+    if record_statement not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_statement)
+
+
+@contextmanager
+def timed_serialization():
+    """
+        Add the time spent in the block to the serialization time of the
+        current request, if it is profiled. Nested blocks are counted
+        once.
+    """
+    profile = _profile.get()
+    if profile is None or profile.serializing:
+        yield
+        return
+    profile.serializing = True
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.serialization += time.perf_counter() - start
+        profile.serializing = False
+
+
+class RequestStats:
+    """
+        Profiles aggregated per endpoint. Latencies are in milliseconds,
+        sizes in bytes; each endpoint keeps its last samples and its
+        slowest statements ever seen.
+    """
+    def __init__(self, samples=INSTRUMENTATION_SAMPLES):
+        self._lock = threading.Lock()
+        self._samples = samples
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.endpoints = {}
+
+    def record(self, endpoint, profile, duration, slow_queries):
+        with self._lock:
+            if (stats := self.endpoints.get(endpoint)) is None:
+                stats = self.endpoints[endpoint] = {
+                    'requests': 0,
+                    'queries': 0,
+                    'total_ms': deque(maxlen=self._samples),
+                    'sql_ms': deque(maxlen=self._samples),
+                    'serialization_ms': deque(maxlen=self._samples),
+                    'bytes': deque(maxlen=self._samples),
+                    'slowest': [],
+                }
+            stats['requests'] += 1
+            stats['queries'] += profile.queries
+            stats['total_ms'].append(duration * 1000)
+            stats['sql_ms'].append(profile.sql * 1000)
+            stats['serialization_ms'].append(profile.serialization * 1000)
+            stats['bytes'].append(profile.size)
+            slowest = stats['slowest'] + profile.slowest_queries()
+            slowest.sort(key=lambda query: query['ms'], reverse=True)
+            stats['slowest'] = slowest[:slow_queries]
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                endpoint: {
+                    'requests': stats['requests'],
+                    'queries_per_request': stats['queries'] / stats['requests'],
+                    'total_ms': summarize(stats['total_ms']),
+                    'sql_ms': summarize(stats['sql_ms']),
+                    'serialization_ms': summarize(stats['serialization_ms']),
+                    'bytes': summarize(stats['bytes']),
+                    'slowest': list(stats['slowest']),
+                }
+                for endpoint, stats in sorted(self.endpoints.items())
+            }
+
+
+request_stats = RequestStats()
+
+
+def server_timing(profile, duration):
+    return ', '.join(
+        (
+            f'db;dur={profile.sql * 1000:.1f};desc="{profile.queries} queries"',
+            f'serialize;dur={profile.serialization * 1000:.1f}',
+            f'total;dur={duration * 1000:.1f}',
+        )
+    )
+
+
+class InstrumentationMiddleware:
+    """
+        Profile a sample of the requests, see above
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'INSTRUMENTATION_SAMPLE_RATE', 0)
+        self.server_timing = getattr(
+            settings, 'INSTRUMENTATION_SERVER_TIMING', False
+        )
+        self.slow_queries = getattr(settings, 'INSTRUMENTATION_SLOW_QUERIES', 5)
+        if asyncio.iscoroutinefunction(get_response):
+            # Seen as a coroutine function by the handler, as
+            # MiddlewareMixin instances are
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.sampled():
+            return self.get_response(request)
+
+        profile = Profile(self.slow_queries)
+        start = time.perf_counter()
+        with profile.active():
+            response = self.get_response(request)
+        return self.finish(request, response, profile, start)
+
+    async def __acall__(self, request):
+        if not self.sampled():
+            return await self.get_response(request)
+
+        profile = Profile(self.slow_queries)
+        start = time.perf_counter()
+        with profile.active():
+            response = await self.get_response(request)
+        return self.finish(request, response, profile, start)
+
+    def sampled(self):
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def finish(self, request, response, profile, start):
+        duration = time.perf_counter() - start
+
+        if self.server_timing:
+            response['Server-Timing'] = server_timing(profile, duration)
+        endpoint = self.endpoint(request)
+        if response.streaming:
+            response.streaming_content = self.stream(
+                response.streaming_content, profile, start, endpoint
+            )
+        else:
+            profile.size = len(response.content)
+            self.record(endpoint, profile, duration)
+        return response
+
+    def stream(self, content, profile, start, endpoint):
+        with profile.active():
+            for chunk in content:
+                profile.size += len(chunk)
+                yield chunk
+        self.record(endpoint, profile, time.perf_counter() - start)
+
+    @staticmethod
+    def endpoint(request):
+        match = request.resolver_match
+        name = match.view_name if match is not None else 'unresolved'
+        return f'{request.method} {name}'
+
+    def record(self, endpoint, profile, duration):
+        request_stats.record(endpoint, profile, duration, self.slow_queries)
@@ -0,0 +1,146 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import (BaseCommand, CommandError)
+from django.test import (AsyncClient, Client)
+from django.urls import reverse
+
+from rest_framework_simplejwt.tokens import AccessToken
+
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import asyncio
+import threading
+import time
+
+CustomUser = get_user_model()
+
+# endpoint: (sync url name, async url name)
+ENDPOINTS = {
+    'ping': ('ping', 'async_ping'),
+    'me': ('app_account:get_self', 'async_get_self'),
+    'schedule': ('app_schedule:reverse', 'async_find_schedule'),
+    'session': ('app_session:reverse', 'async_find_session'),
+    'calendar': ('app_calendar:reverse', 'async_find_calendar'),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the throughput of a read endpoint at high concurrency: '
+        'the sync view on threads, as a threaded WSGI server runs it, the '
+        'sync view under ASGI, and its async variant under ASGI. Runs in '
+        'process against the configured database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'endpoint', choices=sorted(ENDPOINTS), help='Endpoint to call.'
+        )
+        parser.add_argument(
+            '--email',
+            help='Email of the user to authenticate as, for every '
+            'endpoint but ping.',
+        )
+        parser.add_argument(
+            '--query',
+            action='append',
+            default=[],
+            metavar='NAME=VALUE',
+            help='Query parameter of the requests, may be repeated.',
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=2000,
+            help='Number of requests per run.',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=64,
+            help='Number of requests in flight at a time.',
+        )
+
+    def handle(self, *args, **options):
+        endpoint = options['endpoint']
+        total, concurrency = options['requests'], options['concurrency']
+        query = dict(
+            param.split('=', 1) for param in options['query'] if '=' in param
+        )
+        authorization = None
+        if endpoint != 'ping':
+            if options['email'] is None:
+                raise CommandError(f'{endpoint} requires --email')
+            try:
+                user = CustomUser.objects.get(email=options['email'])
+            except CustomUser.DoesNotExist:
+                raise CommandError(f"No user {options['email']}")
+            authorization = f'JWT {AccessToken.for_user(user)}'
+
+        sync_url, async_url = (reverse(name) for name in ENDPOINTS[endpoint])
+
+        self.stdout.write(
+            f'{endpoint}: {total} requests, {concurrency} in flight'
+        )
+        # The async client takes headers without the HTTP_ prefix
+        for name, run, url, header in (
+            (
+                'wsgi, sync view on threads', self.run_threads, sync_url,
+                'HTTP_AUTHORIZATION'
+            ),
+            ('asgi, sync view', self.run_async, sync_url, 'authorization'),
+            ('asgi, async view', self.run_async, async_url, 'authorization'),
+        ):
+            headers = {} if authorization is None else {header: authorization}
+            start = time.perf_counter()
+            latencies, statuses = run(url, query, headers, total, concurrency)
+            elapsed = time.perf_counter() - start
+            self.report(name, total / elapsed, latencies, statuses)
+
+    @staticmethod
+    def run_threads(url, query, headers, total, concurrency):
+        local = threading.local()
+        statuses = Counter()
+
+        def call(_):
+            if not hasattr(local, 'client'):
+                local.client = Client()
+            start = time.perf_counter()
+            response = local.client.get(url, query, **headers)
+            statuses[response.status_code] += 1
+            return time.perf_counter() - start
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            latencies = list(executor.map(call, range(total)))
+        return latencies, statuses
+
+    @staticmethod
+    def run_async(url, query, headers, total, concurrency):
+        statuses = Counter()
+
+        async def main():
+            client = AsyncClient()
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def call():
+                async with semaphore:
+                    start = time.perf_counter()
+                    response = await client.get(url, query, **headers)
+                    statuses[response.status_code] += 1
+                    return time.perf_counter() - start
+
+            return await asyncio.gather(*(call() for _ in range(total)))
+
+        return asyncio.run(main()), statuses
+
+    def report(self, name, throughput, latencies, statuses):
+        ordered = sorted(latencies)
+        p50 = ordered[len(ordered) // 2] * 1000
+        p95 = ordered[min(len(ordered) - 1, len(ordered) * 95 // 100)] * 1000
+        codes = ', '.join(
+            f'{code}: {count}' for code, count in sorted(statuses.items())
+        )
+        self.stdout.write(
+            f'  {name:<28} {throughput:8.1f} req/s  p50 {p50:7.1f} ms  '
+            f'p95 {p95:7.1f} ms  ({codes})'
+        )
@@ -0,0 +1,73 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from master_db.models import (Calendar, CustomUser)
+from master_db.serializers import CalendarSerializer
+
+import timeit
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure the per-row cost of EnhancedModelSerializer, with and '
+        'without its per-class FieldPlan. Runs on in-memory objects, no '
+        'database access.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            type=int,
+            default=2000,
+            help='Number of rows serialized per run.',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Number of runs, the best one is reported.',
+        )
+
+    def handle(self, *args, **options):
+        rows, repeat = options['rows'], options['repeat']
+        user = CustomUser(first_name='Bench', last_name='User')
+        now = timezone.now()
+        objs = [
+            Calendar(
+                user=user,
+                name=f'Calendar {i}',
+                time_start=now,
+                time_end=now,
+                created=now,
+                modified=now,
+            ) for i in range(rows)
+        ]
+
+        def cold():
+            CalendarSerializer._plan = None
+
+        def single():
+            for obj in objs:
+                CalendarSerializer(obj).data
+
+        def single_cold():
+            for obj in objs:
+                cold()
+                CalendarSerializer(obj).data
+
+        def many():
+            CalendarSerializer(objs, many=True).data
+
+        def many_cold():
+            cold()
+            CalendarSerializer(objs, many=True).data
+
+        self.stdout.write(f'{rows} rows, best of {repeat} runs, per row:')
+        for name, func in (
+            ('one serializer per row, plan rebuilt', single_cold),
+            ('one serializer per row, cached plan', single),
+            ('many=True, plan rebuilt', many_cold),
+            ('many=True, cached plan', many),
+        ):
+            best = min(timeit.repeat(func, number=1, repeat=repeat))
+            self.stdout.write(f'  {name:<40} {best / rows * 1e6:8.1f} us')
@@ -0,0 +1,134 @@
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+from rest_framework.exceptions import ParseError
+from rest_framework.response import Response
+
+import base64
+import binascii
+import json
+
+
+class KeysetPagination:
+    """
+        Opt-in cursor pagination keyed on (created, id) by default.
+
+        Each page is a range scan starting right after the boundary row
+        of the previous page, so its cost does not grow with how deep
+        the client pages (unlike OFFSET). Cursors are opaque: they
+        encode the ordering values of the boundary row and a direction.
+
+        Pagination is enabled when the request carries `cursor` or
+        `page_size`.
+    """
+    ordering = ('created', 'id')
+    page_size = 50
+    max_page_size = 500
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+
+    def __init__(self, ordering=None):
+        if ordering is not None:
+            self.ordering = tuple(ordering)
+        self.next = self.previous = None
+
+    def is_requested(self, request):
+        params = request.query_params
+        return (
+            self.cursor_query_param in params or
+            self.page_size_query_param in params
+        )
+
+    def get_page_size(self, request):
+        value = request.query_params.get(self.page_size_query_param)
+        if value is None or value == '':
+            return self.page_size
+        try:
+            size = int(value)
+        except ValueError:
+            size = 0
+        if size < 1:
+            raise ParseError(
+                {self.page_size_query_param: 'Must be a positive integer.'}
+            )
+        return min(size, self.max_page_size)
+
+    def encode_cursor(self, model, obj, reverse):
+        values = [
+            model._meta.get_field(name).value_to_string(obj)
+            for name in self.ordering
+        ]
+        payload = json.dumps({'k': values, 'r': reverse}).encode()
+        return base64.urlsafe_b64encode(payload).decode()
+
+    def decode_cursor(self, model, request):
+        """
+            Return (keys, reverse) of the cursor in request, or
+            (None, False) for the first page
+        """
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            keys = [
+                model._meta.get_field(name).to_python(value)
+                for name, value in zip(self.ordering, payload['k'])
+            ]
+            if len(keys) != len(self.ordering):
+                raise ValueError
+            return keys, bool(payload['r'])
+        except (
+            binascii.Error, KeyError, TypeError, ValueError, ValidationError
+        ):
+            raise ParseError({self.cursor_query_param: 'Invalid cursor.'})
+
+    def keyset_filter(self, keys, reverse):
+        """
+            Rows strictly after keys in ordering (before if reverse).
+
+            Written as `a >= x AND (a > x OR b > y ...)` rather than a
+            plain OR chain so the leading column bounds the index scan.
+        """
+        lookup = 'lt' if reverse else 'gt'
+        first, first_key = self.ordering[0], keys[0]
+        after = Q()
+        for i, name in enumerate(self.ordering):
+            cond = Q(**{f'{name}__{lookup}': keys[i]})
+            for prior, key in zip(self.ordering[1:i], keys[1:i]):
+                cond &= Q(**{prior: key})
+            after |= cond
+        return Q(**{f'{first}__{lookup}e': first_key}) & after
+
+    def paginate_queryset(self, queryset, request):
+        model = queryset.model
+        size = self.get_page_size(request)
+        keys, reverse = self.decode_cursor(model, request)
+
+        queryset = queryset.order_by(
+            *(('-' if reverse else '') + name for name in self.ordering)
+        )
+        if keys is not None:
+            queryset = queryset.filter(self.keyset_filter(keys, reverse))
+
+        rows = list(queryset[:size + 1])
+        has_more = len(rows) > size
+        rows = rows[:size]
+        if reverse:
+            rows.reverse()
+
+        if rows:
+            if has_more or reverse:
+                self.next = self.encode_cursor(model, rows[-1], False)
+            if (has_more and reverse) or (keys is not None and not reverse):
+                self.previous = self.encode_cursor(model, rows[0], True)
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                'next': self.next,
+                'previous': self.previous,
+                'results': data,
+            }
+        )
@@ -0,0 +1,229 @@
+"""
+    Cache of read responses.
+
+    A cached response is keyed by the request path and query, and by the
+    current generation of every model it is computed from. Saving or
+    deleting a row of a model, or changing one of its many-to-many
+    relations, bumps the generation of that model: keys built from the
+    old generation are never read again and expire on their own, so
+    invalidation is a single increment whatever the number of entries.
+
+    Generations live in the cache itself, so workers sharing a cache
+    backend (RESPONSE_CACHE_ALIAS) also share invalidations. Only the
+    models passed to cached_response are tracked: a post_delete receiver
+    turns off fast deletes of its sender, which would make every
+    queryset.delete() of any model fetch its rows.
+
+    A replica may lag behind a change for up to REPLICA_STICKY_SECONDS,
+    so responses read from replicas are not cached during that time, lest
+    stale data be cached under the new generation.
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.query import QuerySet
+from django.db.models.signals import (m2m_changed, post_delete, post_save)
+from django.utils.cache import get_conditional_response
+from django.utils.http import (parse_http_date_safe, urlencode)
+from rest_framework import status
+from rest_framework.response import Response
+
+from master_db.signals import post_bulk_save
+
+from .routers import (get_sticky_seconds, reads_from_replica)
+
+import functools
+import hashlib
+import time
+
+RESPONSE_CACHE_ALIAS = getattr(settings, 'RESPONSE_CACHE_ALIAS', 'default')
+CACHED_HEADERS = ('ETag', 'Last-Modified')
+# Saved by every login, the password when its hash is upgraded
+LOGIN_FIELDS = frozenset(('last_login', 'password'))
+
+
+def get_cache():
+    return caches[RESPONSE_CACHE_ALIAS]
+
+
+def generation_key(model):
+    return f'generation:{model._meta.concrete_model._meta.label_lower}'
+
+
+def changed_key(model):
+    return f'changed:{model._meta.concrete_model._meta.label_lower}'
+
+
+def initial_generation():
+    # A generation evicted from the cache restarts above any value it
+    # may have had, so old entries cannot be read again
+    return time.time_ns() // 1000
+
+
+def generations(models):
+    """
+        Current generation of each of models, in order
+    """
+    cache = get_cache()
+    keys = [generation_key(model) for model in models]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            cache.add(key, initial_generation(), timeout=None)
+            found[key] = cache.get(key)
+    return [found[key] for key in keys]
+
+
+def bump(model):
+    cache = get_cache()
+    key = generation_key(model)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, initial_generation(), timeout=None)
+    if (seconds := get_sticky_seconds()) > 0:
+        cache.set(changed_key(model), True, timeout=seconds)
+
+
+def recently_changed(models):
+    """
+        Whether any of models changed in the last REPLICA_STICKY_SECONDS
+    """
+    return bool(get_cache().get_many([changed_key(model) for model in models]))
+
+
+class PendingBumps(set):
+    """
+        Models to bump again when the current transaction commits
+    """
+    def __call__(self):
+        for model in self:
+            bump(model)
+
+
+def bump_on_commit(model):
+    """
+        Bump the generation of model now, so the transaction reads its
+        own writes, and again once it commits: a reader in between may
+        have cached the rows of before the commit under the first new
+        generation. Each model is bumped once per commit, whatever the
+        number of rows written.
+    """
+    bump(model)
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        return
+    # Callbacks of rolled back savepoints are dropped, along with the
+    # models they would bump
+    for _, callback in connection.run_on_commit:
+        if isinstance(callback, PendingBumps):
+            callback.add(model)
+            return
+    transaction.on_commit(PendingBumps((model, )))
+
+
+tracked = set()
+
+
+def is_tracked(model):
+    return model._meta.concrete_model in tracked
+
+
+def track(model):
+    """
+        Bump the generation of model whenever one of its rows, or one of
+        its many-to-many relations, changes
+    """
+    model = model._meta.concrete_model
+    if model in tracked:
+        return
+    tracked.add(model)
+    uid = f'response_cache_{model._meta.label_lower}'
+    for signal in (post_save, post_delete, post_bulk_save):
+        signal.connect(model_changed, sender=model, dispatch_uid=uid)
+    relations = [field.remote_field for field in model._meta.many_to_many]
+    relations += [
+        relation
+        for relation in model._meta.related_objects if relation.many_to_many
+    ]
+    for relation in relations:
+        through = relation.through
+        m2m_changed.connect(
+            model_m2m_changed,
+            sender=through,
+            dispatch_uid=f'response_cache_{through._meta.label_lower}'
+        )
+
+
+def model_changed(sender, update_fields=None, **kwargs):
+    # Saves of LOGIN_FIELDS alone change no cached response
+    if is_tracked(sender) and not (
+        update_fields and LOGIN_FIELDS.issuperset(update_fields)
+    ):
+        bump_on_commit(sender)
+
+
+def model_m2m_changed(sender, instance, action, model, **kwargs):
+    if action.startswith('post_'):
+        for changed in (type(instance), model):
+            if is_tracked(changed):
+                bump_on_commit(changed)
+
+
+def response_key(request, models):
+    query = urlencode(sorted(request.GET.lists()), doseq=True)
+    path = hashlib.md5(f'{request.path}?{query}'.encode()).hexdigest()
+    stamp = '.'.join(map(str, generations(models)))
+    return f'response:{path}:{stamp}'
+
+
+def cached_response(*models):
+    """
+        Cache the 200 responses of a GET method of an APIView, as long as
+        no row of models changes. Permissions are checked before the
+        method runs, so they still apply to cached responses.
+    """
+    for model in models:
+        track(model)
+
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(view, request, *args, **kwargs):
+            cache = get_cache()
+            key = response_key(request, models)
+            if (cached := cache.get(key)) is not None:
+                data, headers = cached
+                last_modified = parse_http_date_safe(
+                    headers.get('Last-Modified', '')
+                )
+                response = get_conditional_response(
+                    request,
+                    etag=headers.get('ETag'),
+                    last_modified=last_modified
+                )
+                if response is None:
+                    response = Response(data)
+                for header, value in headers.items():
+                    response[header] = value
+                return response
+
+            response = method(view, request, *args, **kwargs)
+            # Streamed responses have no data to keep
+            data = getattr(response, 'data', None)
+            if (
+                response.status_code == status.HTTP_200_OK and
+                data is not None and
+                not (reads_from_replica() and recently_changed(models))
+            ):
+                if isinstance(data, QuerySet):
+                    data = list(data)
+                headers = {
+                    header: response[header]
+                    for header in CACHED_HEADERS if response.has_header(header)
+                }
+                cache.set(key, (data, headers))
+            return response
+
+        return wrapper
+
+    return decorator
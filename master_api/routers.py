@@ -0,0 +1,189 @@
+"""
+    Read replicas.
+
+    Writes always go to the primary (default). Reads go to one of the
+    DATABASE_REPLICAS only when the caller accepts replication lag:
+    during a GET, HEAD or OPTIONS request (see ReplicaMiddleware), or
+    inside replica_reads(). Reads fall back to the primary:
+    - for the rest of a request once it has written anything,
+    - for REPLICA_STICKY_SECONDS after a request of the same user wrote
+      anything, so users read their own writes,
+    - inside primary_reads().
+
+    Sticky users are kept in the default cache, which workers must share
+    for stickiness to hold across them. ReplicaMiddleware is sync and
+    async capable; on the async path the cache is only reached, from a
+    thread, for authenticated requests.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.exceptions import (
+    AuthenticationFailed, InvalidToken
+)
+from rest_framework_simplejwt.settings import api_settings
+
+from .authentication import CachedJWTAuthentication
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import asyncio
+import random
+
+# State of the current request: {'replica': may read from a replica,
+# 'wrote': has written to the primary}
+_reads = ContextVar('replica_reads', default=None)
+
+
+def get_replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+def get_sticky_seconds():
+    return getattr(settings, 'REPLICA_STICKY_SECONDS', 5)
+
+
+def choose_replica():
+    """
+        Alias of a random replica, or of the primary if there is none
+    """
+    if replicas := get_replicas():
+        return random.choice(replicas)
+    return DEFAULT_DB_ALIAS
+
+
+@contextmanager
+def reads(replica):
+    token = _reads.set({'replica': replica, 'wrote': False})
+    try:
+        yield _reads.get()
+    finally:
+        _reads.reset(token)
+
+
+def replica_reads():
+    """
+        Context manager sending reads to a replica, until something is
+        written within it
+    """
+    return reads(True)
+
+
+def primary_reads():
+    """
+        Context manager sending reads to the primary
+    """
+    return reads(False)
+
+
+def reads_from_replica():
+    """
+        Whether reads currently go to a replica
+    """
+    state = _reads.get()
+    return (
+        state is not None and state['replica'] and not state['wrote'] and
+        bool(get_replicas())
+    )
+
+
+def read_only(queryset):
+    """
+        queryset read from a replica, whatever the current request
+    """
+    return queryset.using(choose_replica())
+
+
+def sticky_key(user_id):
+    return f'replica_sticky:{user_id}'
+
+
+def is_sticky(user_id):
+    return user_id is not None and cache.get(sticky_key(user_id)) is not None
+
+
+def make_sticky(user_id):
+    if (seconds := get_sticky_seconds()) > 0:
+        cache.set(sticky_key(user_id), True, timeout=seconds)
+
+
+class ReplicaRouter:
+    """
+        Database router sending reads to replicas as described above
+    """
+    def db_for_read(self, model, **hints):
+        if reads_from_replica():
+            return choose_replica()
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        if (state := _reads.get()) is not None:
+            state['wrote'] = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Every database is the primary or one of its replicas, which
+        # hold the same rows
+        return True
+
+
+class ReplicaMiddleware:
+    """
+        Send the reads of safe-method requests to replicas, unless the
+        user of the request wrote in the last REPLICA_STICKY_SECONDS
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.authentication = CachedJWTAuthentication()
+        if asyncio.iscoroutinefunction(get_response):
+            # Seen as a coroutine function by the handler, as
+            # MiddlewareMixin instances are
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def get_user_id(self, request):
+        """
+            User id of the token of request, or None. The token is only
+            decoded, the user is not read.
+        """
+        header = self.authentication.get_header(request)
+        if header is None:
+            return None
+        # Malformed headers are left for DRF to reject with a 401
+        try:
+            raw_token = self.authentication.get_raw_token(header)
+            if raw_token is None:
+                return None
+            token = self.authentication.get_validated_token(raw_token)
+        except (AuthenticationFailed, InvalidToken):
+            return None
+        return token.get(api_settings.USER_ID_CLAIM)
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self):
+            return self.__acall__(request)
+        user_id = self.get_user_id(request)
+        replica = request.method in SAFE_METHODS and not is_sticky(user_id)
+        with reads(replica) as state:
+            response = self.get_response(request)
+        if state['wrote'] and user_id is not None:
+            make_sticky(user_id)
+        return response
+
+    async def __acall__(self, request):
+        user_id = self.get_user_id(request)
+        replica = request.method in SAFE_METHODS
+        if replica and user_id is not None:
+            sticky = sync_to_async(is_sticky, thread_sensitive=False)
+            replica = not await sticky(user_id)
+        with reads(replica) as state:
+            response = await self.get_response(request)
+        if state['wrote'] and user_id is not None:
+            await sync_to_async(make_sticky, thread_sensitive=False)(user_id)
+        return response
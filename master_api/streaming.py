@@ -0,0 +1,50 @@
+from django.conf import settings
+from django.db.models import prefetch_related_objects
+from django.http import StreamingHttpResponse
+
+from rest_framework.utils import encoders
+
+import itertools
+
+STREAM_CHUNK_SIZE = getattr(settings, 'STREAM_CHUNK_SIZE', 500)
+
+
+def iterate_chunks(queryset, chunk_size=STREAM_CHUNK_SIZE):
+    """
+        Yield lists of at most chunk_size objects of queryset, fetched
+        with .iterator() so only one chunk is held in memory at a time.
+        Prefetches of queryset are applied chunk by chunk, since
+        .iterator() ignores them.
+    """
+    lookups = queryset._prefetch_related_lookups
+    objs = queryset.iterator(chunk_size=chunk_size)
+    while chunk := list(itertools.islice(objs, chunk_size)):
+        if lookups:
+            prefetch_related_objects(chunk, *lookups)
+        yield chunk
+
+
+def stream_json_list(chunks, serialize):
+    """
+        Encode an iterable of chunks as one JSON array, one chunk of
+        elements at a time. serialize turns a chunk into a list of
+        primitives.
+    """
+    encode = encoders.JSONEncoder(
+        ensure_ascii=False, separators=(',', ':')
+    ).encode
+
+    yield '['
+    separator = ''
+    for chunk in chunks:
+        items = serialize(chunk)
+        if items:
+            yield separator + ','.join(encode(item) for item in items)
+            separator = ','
+    yield ']'
+
+
+class StreamingJSONResponse(StreamingHttpResponse):
+    def __init__(self, chunks, serialize, **kwargs):
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(stream_json_list(chunks, serialize), **kwargs)
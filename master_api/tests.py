@@ -1,6 +1,59 @@
-from django.urls import reverse
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import (connection, router, transaction)
+from django.db.models import prefetch_related_objects
+from django.db.models.signals import post_delete
+from django.core.handlers.asgi import ASGIHandler
+from django.http import JsonResponse
+from django.test import (AsyncClient, RequestFactory, override_settings)
+from django.urls import (path, reverse)
+from django.utils import timezone
+from django.utils.http import urlencode
 from rest_framework import status
-from rest_framework.test import (APIClient, APITestCase)
+from rest_framework.exceptions import (NotFound, ParseError)
+from rest_framework.test import (APIClient, APITestCase, APITransactionTestCase)
+from rest_framework_simplejwt.tokens import AccessToken
+
+from master_api.async_views import view_pool
+from master_api.authentication import (get_principal, principal_cache)
+from master_api.cache import LRUCache
+from master_api.instrumentation import (
+    InstrumentationMiddleware, request_stats
+)
+from master_api.response_cache import (
+    PendingBumps, generations, get_cache, is_tracked
+)
+from master_api.routers import (
+    ReplicaMiddleware, primary_reads, read_only, reads_from_replica,
+    replica_reads
+)
+from master_api.streaming import (iterate_chunks, stream_json_list)
+from master_api.utils import (get_by_uuid, get_list_by_uuid)
+from master_db.models import (ClassMetadata, Course, Schedule, Timetable)
+
+from unittest import mock
+
+import asyncio
+import datetime
+import functools
+import json
+import threading
+import time
+import unittest
+
+CustomUser = get_user_model()
+
+
+SLOW_VIEW_SECONDS = 0.3
+
+
+async def slow_view(request):
+    await asyncio.sleep(SLOW_VIEW_SECONDS)
+    return JsonResponse({'replica': reads_from_replica()})
+
+
+urlpatterns = [path('slow', slow_view)]
 
 
 class HeartbeatTests(APITestCase):
@@ -13,3 +66,436 @@ def test_main_ping(self):
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data, serializer)
+
+
+class UUIDLookupTests(APITestCase):
+    def setUp(self):
+        self.course = Course.objects.create(name='Course', duration=1)
+
+    def test_get_by_uuid(self):
+        self.assertEqual(get_by_uuid(Course, self.course.uuid), self.course)
+        self.assertEqual(
+            get_by_uuid(Course, str(self.course.uuid)), self.course
+        )
+        course_uuid = self.course.uuid
+        self.course.delete()
+        with self.assertRaises(NotFound):
+            get_by_uuid(Course, course_uuid)
+
+    def test_invalid_uuid(self):
+        with self.assertRaises(ParseError):
+            get_by_uuid(Course, 'not-a-uuid')
+
+    def test_get_list_by_uuid(self):
+        other = Course.objects.create(name='Other', duration=2)
+        objs = get_list_by_uuid(Course, [self.course.uuid, str(other.uuid)])
+        self.assertEqual(set(objs), {self.course, other})
+
+
+class LRUCacheTests(APITestCase):
+    def test_bounded(self):
+        cache = LRUCache(maxsize=2)
+        for i in range(3):
+            cache.set(i, i)
+        self.assertEqual(len(cache), 2)
+        self.assertNotIn(0, cache)
+
+
+class PrincipalCacheTests(APITestCase):
+    def test_copies(self):
+        principal_cache.clear()
+        user = CustomUser.objects.create_user(
+            email='user1@tfc.com', password='iamuser1'
+        )
+        first = get_principal(user.uuid)
+        with self.assertNumQueries(0):
+            list(first.groups.all())
+        # What a request prefetches stays with its copy
+        prefetch_related_objects([first], 'teacher_classes')
+        second = get_principal(user.uuid)
+        self.assertIsNot(second._state, first._state)
+        self.assertNotIn('teacher_classes', second._prefetched_objects_cache)
+        with self.assertNumQueries(0):
+            list(second.user_permissions.all())
+
+
+class StreamingTests(APITestCase):
+    def test_stream_chunks(self):
+        for i in range(7):
+            Course.objects.create(name=f'Course-{i}', duration=i)
+        queryset = Course.objects.order_by('id').prefetch_related('tags')
+
+        chunks = list(iterate_chunks(queryset, chunk_size=3))
+        self.assertEqual([len(chunk) for chunk in chunks], [3, 3, 1])
+
+        content = ''.join(
+            stream_json_list(chunks, lambda c: [o.name for o in c])
+        )
+        self.assertEqual(
+            json.loads(content), [f'Course-{i}' for i in range(7)]
+        )
+        self.assertEqual(''.join(stream_json_list([], list)), '[]')
+
+
+class AsyncViewTests(APITransactionTestCase):
+    # Async views run on pool threads with their own connections, which
+    # only see committed rows
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email='user1@tfc.com',
+            password='iamuser1',
+            first_name='First',
+            last_name='Last',
+            birth_date='2001-07-31',
+            mobile='0123456789',
+            male=True,
+            address='My lovely home'
+        )
+        course = Course.objects.create(name='Course', duration=1)
+        self.classroom = ClassMetadata.objects.create(
+            course=course, name='Class', status='Ongoing'
+        )
+        now = timezone.now()
+        for i in range(3):
+            Schedule.objects.create(
+                classroom=self.classroom,
+                time_start=now + datetime.timedelta(days=i),
+                time_end=now + datetime.timedelta(days=i, hours=2),
+            )
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'JWT {AccessToken.for_user(self.user)}'
+        )
+
+    def test_ping(self):
+        response = self.client.get(reverse('async_ping'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), {'detail': 'pong'})
+
+    def test_same_as_sync(self):
+        for sync, name, data in (
+            ('app_account:get_self', 'async_get_self', {}),
+            (
+                'app_schedule:reverse', 'async_find_schedule', {
+                    'class_uuid': self.classroom.uuid
+                }
+            ),
+        ):
+            expected = self.client.get(reverse(sync), data=data)
+            response = self.client.get(reverse(name), data=data)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.json(), expected.json())
+
+        response = APIClient().get(reverse('async_get_self'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_stream_under_asgi(self):
+        # Streamed lists are built in the pool: the ASGI handler would
+        # iterate them on the event loop, where the ORM cannot run
+        token = f'JWT {AccessToken.for_user(self.user)}'
+        query = urlencode({'class_uuid': self.classroom.uuid, 'stream': 'true'})
+        scope = {
+            'type': 'http',
+            'asgi': {
+                'version': '3.0'
+            },
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': reverse('async_find_schedule'),
+            'query_string': query.encode(),
+            'headers': [(b'authorization', token.encode())],
+            'server': ('testserver', 80),
+        }
+        messages = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            messages.append(message)
+
+        # One row per chunk, so rows are fetched while streaming
+        chunks = functools.partial(iterate_chunks, chunk_size=1)
+        with mock.patch('master_api.views.iterate_chunks', chunks):
+            async_to_sync(ASGIHandler().__call__)(scope, receive, send)
+        self.assertEqual(messages[0]['status'], status.HTTP_200_OK)
+        # The whole list in a single body
+        self.assertEqual(len(messages), 2)
+        content = messages[1]['body']
+        expected = self.client.get(
+            reverse('app_schedule:reverse'),
+            {'class_uuid': self.classroom.uuid}
+        )
+        self.assertEqual(json.loads(content), expected.json())
+
+    @override_settings(INSTRUMENTATION_SAMPLE_RATE=1)
+    def test_profiled(self):
+        # Statements run on pool threads count for the request
+        request_stats.reset()
+        principal_cache.clear()
+        response = self.client.get(reverse('async_get_self'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        stats = request_stats.snapshot()['GET async_get_self']
+        self.assertGreater(stats['queries_per_request'], 0)
+
+    def test_busy(self):
+        slots = view_pool.slots
+        view_pool.slots = threading.BoundedSemaphore(1)
+        view_pool.slots.acquire()
+        try:
+            response = self.client.get(reverse('async_get_self'))
+        finally:
+            view_pool.slots = slots
+        self.assertEqual(
+            response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+        self.assertEqual(response['Retry-After'], '1')
+
+
+@override_settings(DATABASE_REPLICAS=['replica'], REPLICA_STICKY_SECONDS=60)
+class ReplicaRouterTests(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email='user1@tfc.com', password='iamuser1'
+        )
+        self.token = f'JWT {AccessToken.for_user(self.user)}'
+
+    def test_routing(self):
+        self.assertEqual(router.db_for_read(Course), 'default')
+        with replica_reads():
+            self.assertEqual(router.db_for_read(Course), 'replica')
+            with primary_reads():
+                self.assertEqual(router.db_for_read(Course), 'default')
+            self.assertEqual(router.db_for_write(Course), 'default')
+            # Read your own writes for the rest of the block
+            self.assertEqual(router.db_for_read(Course), 'default')
+        self.assertEqual(read_only(Course.objects.all()).db, 'replica')
+
+    def test_middleware_sticky(self):
+        databases = []
+
+        def read(request):
+            databases.append(router.db_for_read(Course))
+            return None
+
+        def write(request):
+            router.db_for_write(Course)
+            return read(request)
+
+        factory = RequestFactory()
+        get = factory.get('/', HTTP_AUTHORIZATION=self.token)
+        post = factory.post('/', HTTP_AUTHORIZATION=self.token)
+        ReplicaMiddleware(read)(get)
+        ReplicaMiddleware(read)(post)
+        # Reading does not make the user sticky
+        ReplicaMiddleware(read)(get)
+        ReplicaMiddleware(write)(post)
+        ReplicaMiddleware(read)(get)
+        ReplicaMiddleware(read)(factory.get('/'))
+        self.assertEqual(
+            databases,
+            ['replica', 'default', 'replica', 'default', 'default', 'replica']
+        )
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_middleware_async(self):
+        # Through the whole MIDDLEWARE, async views are not serialized
+        # on a thread
+        async def get_all():
+            client = AsyncClient()
+            return await asyncio.gather(
+                *(
+                    client.get('/slow', authorization=self.token)
+                    for _ in range(4)
+                )
+            )
+
+        start = time.perf_counter()
+        responses = async_to_sync(get_all)()
+        self.assertLess(time.perf_counter() - start, 2 * SLOW_VIEW_SECONDS)
+        for response in responses:
+            self.assertEqual(response.json(), {'replica': True})
+
+        async def write(request):
+            router.db_for_write(Course)
+
+        post = RequestFactory().post('/', HTTP_AUTHORIZATION=self.token)
+        async_to_sync(ReplicaMiddleware(write))(post)
+        get = async_to_sync(AsyncClient().get)
+        response = get('/slow', authorization=self.token)
+        self.assertEqual(response.json(), {'replica': False})
+
+    def test_malformed_header(self):
+        # Left for DRF to reject, the request is anonymous here
+        for header in ('Bearer', 'Bearer a b', 'JWT garbage'):
+            response = self.client.get(
+                reverse('ping'), HTTP_AUTHORIZATION=header
+            )
+            self.assertEqual(
+                response.status_code, status.HTTP_401_UNAUTHORIZED
+            )
+
+
+@unittest.skipUnless(
+    'replica' in settings.DATABASES,
+    'needs a replica database, see tfc_backend.replica_test_settings'
+)
+@override_settings(DATABASE_REPLICAS=['replica'], REPLICA_STICKY_SECONDS=60)
+class ReplicaTests(APITestCase):
+    # The replica is a separate database that never receives the writes
+    # of the primary, so rows read from it tell where reads went
+    databases = '__all__'
+
+    def setUp(self):
+        get_cache().clear()
+        principal_cache.clear()
+        self.url = reverse('app_course:reverse')
+        for database in ('default', 'replica'):
+            user = CustomUser.objects.db_manager(database).create_user(
+                email='user1@tfc.com',
+                password='iamuser1',
+                uuid='8f0b6b8e-5a63-4d6e-9a52-5cbb8c8e9d11'
+            )
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'JWT {AccessToken.for_user(user)}'
+        )
+        Course.objects.create(name='Primary', duration=1)
+        Course.objects.using('replica').create(name='Replica', duration=1)
+
+    def names(self, client):
+        response = client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return {course['name'] for course in response.json()}
+
+    def test_read_your_writes(self):
+        self.assertEqual(self.names(self.client), {'Replica'})
+
+        data = {'name': 'Written', 'duration': 2}
+        response = self.client.post(reverse('app_course:course_mgmt'), data)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        self.assertEqual(self.names(self.client), {'Primary', 'Written'})
+        # Other users still read from the replica
+        get_cache().clear()
+        self.assertEqual(self.names(APIClient()), {'Replica'})
+
+
+class ResponseCacheTests(APITransactionTestCase):
+    # Commits are real here
+    def setUp(self):
+        get_cache().clear()
+
+    def test_bump_on_commit(self):
+        with transaction.atomic():
+            for i in range(3):
+                Course.objects.create(name=f'Course-{i}', duration=i)
+            Course.objects.all().delete()
+            written = generations([Course])
+            # Course is bumped once more on commit, whatever the rows
+            pending = [
+                callback for _, callback in connection.run_on_commit
+                if isinstance(callback, PendingBumps)
+            ]
+            self.assertEqual(pending, [{Course}])
+        # Dropping what was cached from another transaction in between
+        self.assertNotEqual(generations([Course]), written)
+
+    def test_tracked(self):
+        # Only models of cached responses
+        self.assertTrue(is_tracked(Course))
+        self.assertFalse(is_tracked(Timetable))
+        # Which keep fast deletes
+        self.assertFalse(post_delete.has_listeners(Timetable))
+
+
+class InstrumentationTests(APITestCase):
+    def setUp(self):
+        request_stats.reset()
+        get_cache().clear()
+        for i in range(3):
+            Course.objects.create(name=f'Course-{i}', duration=i)
+        self.url = reverse('app_course:reverse')
+        admin = CustomUser.objects.create_user(
+            email='admin@tfc.com',
+            password='iamadmin',
+            mobile='0987654321',
+            is_staff=True
+        )
+        self.token = f'JWT {AccessToken.for_user(admin)}'
+
+    def get_client(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=self.token)
+        return client
+
+    def test_off(self):
+        response = self.get_client().get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.has_header('Server-Timing'))
+        response = async_to_sync(AsyncClient().get)(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.has_header('Server-Timing'))
+        self.assertEqual(request_stats.snapshot(), {})
+
+    @override_settings(
+        INSTRUMENTATION_SAMPLE_RATE=1,
+        INSTRUMENTATION_SERVER_TIMING=True,
+        INSTRUMENTATION_SLOW_QUERIES=2
+    )
+    def test_profiled(self):
+        client = self.get_client()
+        response = client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        size = len(response.content)
+        timing = response['Server-Timing']
+        for metric in ('db;dur=', 'serialize;dur=', 'total;dur='):
+            self.assertIn(metric, timing)
+
+        response = client.get(reverse('stats'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        stats = response.data['endpoints']['GET app_course:reverse']
+        self.assertEqual(stats['requests'], 1)
+        self.assertGreater(stats['queries_per_request'], 0)
+        self.assertGreater(stats['serialization_ms']['max'], 0)
+        self.assertEqual(stats['bytes']['max'], size)
+        self.assertEqual(len(stats['slowest']), 2)
+        for query in stats['slowest']:
+            self.assertTrue(query['sql'])
+            self.assertRegex(query['origin'], r'\.py:\d+ in ')
+            self.assertNotIn('instrumentation', query['origin'])
+
+        response = client.delete(reverse('stats'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('GET app_course:reverse', request_stats.snapshot())
+
+    @override_settings(
+        INSTRUMENTATION_SAMPLE_RATE=1, INSTRUMENTATION_SERVER_TIMING=True
+    )
+    def test_profiled_async(self):
+        async def get_response(request):
+            return None
+
+        # Not adapted to run on a thread under ASGI
+        self.assertTrue(
+            asyncio.iscoroutinefunction(InstrumentationMiddleware(get_response))
+        )
+        # The sync view runs on another thread than the middleware
+        response = async_to_sync(AsyncClient().get)(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('db;dur=', response['Server-Timing'])
+        stats = request_stats.snapshot()['GET app_course:reverse']
+        self.assertEqual(stats['requests'], 1)
+        self.assertGreater(stats['queries_per_request'], 0)
+        self.assertGreater(stats['serialization_ms']['max'], 0)
+
+    def test_stats_admin_only(self):
+        user = CustomUser.objects.create_user(
+            email='user1@tfc.com', password='iamuser1', mobile='0123456789'
+        )
+        client = APIClient()
+        client.credentials(
+            HTTP_AUTHORIZATION=f'JWT {AccessToken.for_user(user)}'
+        )
+        response = client.get(reverse('stats'))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
@@ -1,8 +1,16 @@
 from django.urls import (include, path)
 from . import views
+from .async_views import (async_view, ping as async_ping)
+
+from app_account.views import SelfView
+from app_calendar.views import FindCalendarView
+from app_schedule.views import FindScheduleView
+from app_session.views import FindSessionView
 
 urlpatterns = [
     path('ping', views.ping, name='ping'),
+    path('stats', views.stats, name='stats'),
+    path('bulk/<str:model_name>', views.BulkView.as_view(), name='bulk'),
     path('account/', include('app_account.urls')),
     path('session/', include('app_session.urls')),
     path('auth/', include('app_auth.urls')),
@@ -12,4 +20,23 @@
     path('log/', include('app_log.urls')),
     path('role/', include('app_role.urls')),
     path('schedule/', include('app_schedule.urls')),
+
+    # Same views, served without blocking the event loop under ASGI
+    path('async/ping', async_ping, name='async_ping'),
+    path('async/account/me', async_view(SelfView), name='async_get_self'),
+    path(
+        'async/schedule/reverse',
+        async_view(FindScheduleView),
+        name='async_find_schedule'
+    ),
+    path(
+        'async/session/reverse',
+        async_view(FindSessionView),
+        name='async_find_session'
+    ),
+    path(
+        'async/calendar/reverse',
+        async_view(FindCalendarView),
+        name='async_find_calendar'
+    ),
 ]
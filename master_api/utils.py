@@ -1,5 +1,7 @@
 from django.core.exceptions import ValidationError
 from django.shortcuts import _get_queryset
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 
 from rest_framework.exceptions import NotFound, ParseError
 
@@ -19,6 +21,29 @@ def convert_time(s, format_time='%Y-%m-%d %H:%M'):
     return datetime.datetime.strptime(s, format_time).astimezone()
 
 
+def convert_time_param(params, name):
+    """
+        Parse an optional datetime query param, either in convert_time
+        format or ISO 8601. Naive values are in the current timezone.
+    """
+    value = params.get(name)
+    if value is None or value == '':
+        return None
+    try:
+        time = parse_datetime(value)
+        if time is None and (date := parse_date(value)) is not None:
+            time = datetime.datetime.combine(date, datetime.time())
+    except ValueError:
+        time = None
+    if time is None:
+        raise ParseError(
+            {name: 'Datetime must be in YYYY-MM-DD[ HH:MM[:ss]][TZ] format'}
+        )
+    if timezone.is_naive(time):
+        time = timezone.make_aware(time)
+    return time
+
+
 def validate_uuid4(value):
     if value is not None and not isinstance(value, uuid.UUID):
         input_form = 'int' if isinstance(value, int) else 'hex'
@@ -74,24 +99,35 @@ def get_object_or_404(klass, name_print=None, *args, **kwargs):
 
 def get_by_uuid(klass, uuid):
     """
-    Get object by uuid using get_object_or_404 with additional 
-    error handling (invalid uuid)
+    Get object by uuid with additional error handling (invalid uuid).
     """
+    queryset = _get_queryset(klass)
     try:
-        return get_object_or_404(klass, uuid=uuid)
+        return queryset.get(uuid=uuid)
+    except queryset.model.DoesNotExist:
+        raise NotFound(f'{queryset.model.__name__} does not exist')
     except ValidationError as message:
         raise ParseError({'detail': list(message)})
 
 
-def get_list_by_uuid(klass, uuid):
+def get_list_by_uuid(klass, uuids, name_print=None):
     """
-    Get list of objects by uuid using get_object_or_404 with
-    additional error handling (invalid uuid)
+    Get list of objects by a uuid or a list of uuids, with additional
+    error handling (invalid uuid).
+    Raise NotFound if none of them exists.
     """
+    queryset = _get_queryset(klass)
+    if name_print is None:
+        name_print = queryset.model.__name__
+    if isinstance(uuids, (str, uuid.UUID)):
+        uuids = [uuids]
     try:
-        return get_list_or_404(klass, uuid=uuid)
+        obj_list = list(queryset.filter(uuid__in=list(uuids)))
     except ValidationError as message:
         raise ParseError({'detail': list(message)})
+    if not obj_list:
+        raise NotFound(f'{name_print} does not exist')
+    return obj_list
 
 
 def get_list_or_404(klass, name_print, *args, **kwargs):
@@ -219,3 +255,19 @@ def reverse_bracket(bracket):
 
 def prettyPrint(text):
     print(prettyStr(text))
+
+
+def summarize(samples):
+    """
+        p50, p95 and max of a collection of numbers, or None each if it
+        is empty
+    """
+    if not samples:
+        return {'p50': None, 'p95': None, 'max': None}
+    ordered = sorted(samples)
+    return {
+        'p50': ordered[len(ordered) // 2],
+        'p95': ordered[min(len(ordered) - 1,
+                           len(ordered) * 95 // 100)],
+        'max': ordered[-1],
+    }
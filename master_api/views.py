@@ -1,12 +1,32 @@
 from django.contrib.auth import get_user_model
+from django.db import (IntegrityError, transaction)
 
+from model_utils.fields import AutoLastModifiedField
 from rest_framework import (exceptions, status)
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import AllowAny
+from rest_framework.permissions import (AllowAny, IsAdminUser)
 from rest_framework.response import Response
+from rest_framework.views import APIView
+from taggit.managers import TaggableManager
 
-from master_api.utils import (get_by_uuid, convert_primitive)
+from app_auth.hashing import hashing_pool
+from master_api.cache import normalize_uuid
+from master_api.conditional import (
+    conditional_response, has_modified, is_conditional, list_validators,
+    object_validators, queryset_validators, request_query, set_validators
+)
+from master_api.instrumentation import request_stats
+from master_api.pagination import KeysetPagination
+from master_api.streaming import (StreamingJSONResponse, iterate_chunks)
+from master_api.utils import (
+    get_by_uuid, convert_json_list, convert_primitive, formdata_bool
+)
 from master_db import (models, serializers)
+from master_db.signals import post_bulk_save
+
+from collections.abc import Mapping
+
+import itertools
 
 CustomUser = get_user_model()
 
@@ -15,6 +35,8 @@
     models.ClassMetadata: serializers.ClassMetadataSerializer,
     models.Schedule: serializers.ScheduleSerializer,
     models.Session: serializers.SessionSerializer,
+    models.Calendar: serializers.CalendarSerializer,
+    models.RecurrenceRule: serializers.RecurrenceRuleSerializer,
     CustomUser: serializers.CustomUserSerializer,
 }
 
@@ -31,6 +53,9 @@
 
 LIST_RESPONSE = {'status': status.HTTP_200_OK}
 
+# Serializer context of the items of bulk writes
+BULK_CONTEXT = {'bulk': True}
+
 
 def create_object(model, **kwargs):
     try:
@@ -62,7 +87,59 @@ def edit_object(model, **kwargs):
         raise exceptions.ParseError(convert_primitive(serializer.errors))
 
 
+def sparse_fieldset(params):
+    """
+        Field names of the comma separated `fields` and `exclude`
+        params, None for a missing param
+    """
+    def names(param):
+        if (value := params.get(param)) is None:
+            return None
+        return [name.strip() for name in value.split(',') if name.strip()]
+
+    return names('fields'), names('exclude')
+
+
+def select_fields(serializer, fields, exclude):
+    try:
+        return serializer.select_fields(fields, exclude)
+    except KeyError as message:
+        raise exceptions.ParseError({'fields': message.args[0]})
+
+
+def project(queryset, serializer, fields, exclude, keep=()):
+    """
+        Only load the columns read by the output fields of serializer,
+        as restricted by fields/exclude, and join in the relations they
+        follow. Columns in keep are always loaded.
+    """
+    if fields is None and not exclude:
+        return queryset
+    columns, relations = serializer.projection()
+    if relations:
+        queryset = queryset.select_related(*relations)
+    # Relations joined by the caller cannot be deferred
+    joined = queryset.query.select_related
+    joined = list(joined) if isinstance(joined, dict) else []
+    if fields is not None:
+        return queryset.only(*columns, *joined, *keep)
+    deferred, _ = serializer.projection(exclude)
+    return queryset.defer(
+        *(name for name in deferred if name not in joined and name not in keep)
+    )
+
+
 def get_object(model, **kwargs):
+    """
+        Serialize the object of model whose uuid is data['uuid'].
+
+        Only the fields listed in data['fields'], or all but those in
+        data['exclude'], are loaded and serialized.
+
+        The response carries an ETag and Last-Modified of the object. If
+        request is given and its conditional headers match them, 304 is
+        returned without serializing.
+    """
     try:
         data = kwargs.pop('data')
     except KeyError:
@@ -72,7 +149,102 @@ def get_object(model, **kwargs):
     except KeyError:
         raise exceptions.ParseError({'uuid': 'This field is required.'})
     Serializer = SERIALIZERS[model]
-    return Response(Serializer(get_by_uuid(model, uuid)).data)
+    fields, exclude = sparse_fieldset(data)
+
+    def make_serializer(obj=None):
+        return select_fields(Serializer(obj), fields, exclude)
+
+    keep = ('uuid', 'modified') if has_modified(model) else ('uuid', )
+    queryset = project(
+        model.objects.all(), make_serializer(), fields, exclude, keep
+    )
+    obj = get_by_uuid(queryset, uuid)
+    validators = object_validators(obj)
+    request = kwargs.pop('request', None)
+    if request is not None:
+        if (response := conditional_response(request, *validators)) is not None:
+            return response
+    return set_validators(Response(make_serializer(obj).data), *validators)
+
+
+def list_objects(
+    queryset,
+    request,
+    Serializer=None,
+    name_print=None,
+    ordering=None,
+    ignore=()
+):
+    """
+        Serialize every object of queryset as a list.
+
+        If the request asks for it (`cursor` or `page_size`), only one
+        keyset page is returned along with the next/previous cursors.
+        Otherwise, with `stream=true` the list is streamed chunk by
+        chunk instead of being built in memory.
+        If name_print is given, NotFound is raised for an empty result.
+
+        `fields` and `exclude` params restrict the output fields, and the
+        columns loaded along with them.
+
+        The response carries an ETag and Last-Modified of the rows
+        returned (the page, if paginated), and is a 304 without any
+        serialization if the conditional headers of the request match
+        them. Streamed lists only carry them for conditional requests.
+    """
+    model = queryset.model
+    if Serializer is None:
+        Serializer = SERIALIZERS[model]
+    query = request_query(request)
+
+    fields, exclude = sparse_fieldset(request.query_params)
+
+    def make_serializer(objs=None):
+        serializer = Serializer(objs, many=True).ignore_fields(*ignore)
+        return select_fields(serializer, fields, exclude)
+
+    def serialize(objs):
+        return make_serializer(objs).data
+
+    paginator = KeysetPagination(ordering)
+    paginated = paginator.is_requested(request)
+    keep = paginator.ordering if paginated else ()
+    if has_modified(model):
+        keep = (*keep, 'modified')
+    queryset = project(queryset, make_serializer(), fields, exclude, keep)
+    if paginated:
+        objs = paginator.paginate_queryset(queryset, request)
+        # The cursors are part of the page
+        query = f'{query}:{paginator.next}:{paginator.previous}'
+    elif formdata_bool(request.query_params.get('stream')):
+        validators = None, None
+        if is_conditional(request):
+            validators = queryset_validators(queryset, query)
+            response = conditional_response(request, *validators)
+            if response is not None:
+                return response
+        chunks = iterate_chunks(queryset)
+        if (first := next(chunks, None)) is None and name_print is not None:
+            raise exceptions.NotFound(f'{name_print} does not exist')
+        if first is not None:
+            chunks = itertools.chain([first], chunks)
+        response = StreamingJSONResponse(chunks, serialize)
+        return set_validators(response, *validators)
+    else:
+        objs = list(queryset)
+
+    if name_print is not None and not objs:
+        raise exceptions.NotFound(f'{name_print} does not exist')
+    validators = list_validators(model, objs, query)
+    if (response := conditional_response(request, *validators)) is not None:
+        return response
+
+    data = serialize(objs)
+    if paginated:
+        response = paginator.get_paginated_response(data)
+    else:
+        response = Response(data)
+    return set_validators(response, *validators)
 
 
 def delete_object(model, **kwargs):
@@ -88,7 +260,291 @@ def delete_object(model, **kwargs):
     return Response(**DELETE_RESPONSE)
 
 
+def get_bulk_payload(data):
+    """
+        Return the list of items of a bulk request, sent either as a
+        json array body or as a json list in the `data` field
+    """
+    if isinstance(data, list):
+        return data
+    items = data.get('data') if isinstance(data, Mapping) else None
+    if isinstance(items, str):
+        items = convert_json_list(items)
+    if not isinstance(items, list):
+        raise exceptions.ParseError(
+            {'data': 'Payload must be a json list of objects.'}
+        )
+    return items
+
+
+def split_many_related(model, data):
+    """
+        Split validated data into concrete field values and many
+        related values, which can only be set once the row exists
+    """
+    fields, many = {}, {}
+    for name, value in data.items():
+        field = model._meta.get_field(name)
+        (many if field.many_to_many else fields)[name] = value
+    return fields, many
+
+
+def set_many_related(model, instance, many):
+    for name, values in many.items():
+        manager = getattr(instance, name)
+        if isinstance(model._meta.get_field(name), TaggableManager):
+            manager.set(*values)
+        else:
+            manager.set(values)
+
+
+def is_auto_now(field):
+    if isinstance(field, AutoLastModifiedField):
+        return True
+    return getattr(field, 'auto_now', False)
+
+
+def validate_bulk(Serializer, items):
+    """
+        Errors by index of the checks a serializer makes on a whole bulk
+        write (validate_bulk), once every item is valid on its own
+    """
+    if (validate := getattr(Serializer, 'validate_bulk', None)) is None:
+        return {}
+    return validate(items)
+
+
+def save_bulk(model, write):
+    """
+        Run write in one transaction, reporting integrity errors
+    """
+    try:
+        with transaction.atomic():
+            return write()
+    except IntegrityError as message:
+        raise exceptions.ParseError({'detail': str(message)})
+
+
+def bulk_create_objects(model, **kwargs):
+    """
+        Validate every item of the payload first, then insert all of
+        them with one bulk_create in a single transaction.
+        Errors are reported by item index and nothing is written.
+    """
+    try:
+        items = get_bulk_payload(kwargs.pop('data'))
+    except KeyError:
+        raise KeyError('Payload cannot be empty')
+    Serializer = SERIALIZERS[model]
+
+    validated, errors = [], {}
+    for index, item in enumerate(items):
+        serializer = Serializer(data=item, context=BULK_CONTEXT)
+        if serializer.is_valid():
+            validated.append(
+                split_many_related(model, serializer.validated_data)
+            )
+        else:
+            errors[index] = serializer.errors
+    if not errors:
+        errors = validate_bulk(
+            Serializer, [(None, fields) for fields, _ in validated]
+        )
+    if errors:
+        raise exceptions.ParseError(convert_primitive({'errors': errors}))
+
+    # Related rows the serializer resolved without writing them, such as
+    # occurrences of recurrence rules, are saved with the items
+    save_pending = getattr(Serializer, 'save_pending', None)
+
+    def write():
+        if save_pending is not None:
+            for fields, _ in validated:
+                save_pending(fields)
+        instances = model.objects.bulk_create(
+            [model(**fields) for fields, _ in validated]
+        )
+        if any(many for _, many in validated):
+            # Not every backend returns pks from bulk_create
+            uuids = [obj.uuid for obj in instances]
+            pks = dict(
+                model.objects.filter(uuid__in=uuids).values_list('uuid', 'pk')
+            )
+            for obj, (_, many) in zip(instances, validated):
+                obj.pk = pks[obj.uuid]
+                set_many_related(model, obj, many)
+        post_bulk_save.send(
+            sender=model, instances=instances, created=True, update_fields=None
+        )
+        return instances
+
+    instances = save_bulk(model, write)
+    return Response(
+        data={'created': [obj.uuid for obj in instances]},
+        status=CREATE_RESPONSE['status']
+    )
+
+
+def bulk_edit_objects(model, **kwargs):
+    """
+        Validate every item of the payload (each with its uuid) first,
+        then write all of them with one bulk_update in a single
+        transaction.
+        Errors are reported by item index and nothing is written.
+    """
+    try:
+        items = get_bulk_payload(kwargs.pop('data'))
+    except KeyError:
+        raise KeyError('Payload cannot be empty')
+    Serializer = SERIALIZERS[model]
+
+    errors, keys = {}, []
+    for index, item in enumerate(items):
+        key = None
+        if isinstance(item, dict):
+            key = normalize_uuid(item.get('uuid'))
+        if key is None:
+            errors[index] = {'uuid': 'A valid uuid is required.'}
+        elif key in keys:
+            errors[index] = {'uuid': 'Duplicated in payload.'}
+        keys.append(key)
+    if errors:
+        raise exceptions.ParseError(convert_primitive({'errors': errors}))
+
+    instances = {obj.uuid: obj for obj in model.objects.filter(uuid__in=keys)}
+    validated = []
+    for index, (item, key) in enumerate(zip(items, keys)):
+        if (instance := instances.get(key)) is None:
+            errors[index] = {'uuid': f'{model.__name__} does not exist'}
+            continue
+        data = {k: v for k, v in item.items() if k != 'uuid'}
+        serializer = Serializer(
+            instance=instance, data=data, context=BULK_CONTEXT
+        )
+        if serializer.is_valid():
+            fields, many = split_many_related(model, serializer.validated_data)
+            validated.append((instance, fields, many))
+        else:
+            errors[index] = serializer.errors
+    if not errors:
+        errors = validate_bulk(
+            Serializer,
+            [(instance, fields) for instance, fields, _ in validated]
+        )
+    if errors:
+        raise exceptions.ParseError(convert_primitive({'errors': errors}))
+
+    update_fields = set()
+    for instance, fields, _ in validated:
+        for name, value in fields.items():
+            setattr(instance, name, value)
+        update_fields.update(fields)
+    # bulk_update does not call pre_save, refresh auto_now fields here
+    for field in filter(is_auto_now, model._meta.concrete_fields):
+        for instance, _, _ in validated:
+            value = field.pre_save(instance, False)
+            setattr(instance, field.attname, value)
+        update_fields.add(field.name)
+
+    def write():
+        objs = [instance for instance, _, _ in validated]
+        model.objects.bulk_update(objs, update_fields)
+        for instance, _, many in validated:
+            set_many_related(model, instance, many)
+        post_bulk_save.send(
+            sender=model,
+            instances=objs,
+            created=False,
+            update_fields=update_fields
+        )
+
+    save_bulk(model, write)
+    return Response(**EDIT_RESPONSE)
+
+
+def bulk_delete_objects(model, **kwargs):
+    """
+        Delete every object whose uuid is in the payload, in a single
+        transaction. If any uuid is invalid or does not exist, errors
+        are reported by item index and nothing is deleted.
+    """
+    try:
+        items = get_bulk_payload(kwargs.pop('data'))
+    except KeyError:
+        raise KeyError('Payload cannot be empty')
+
+    errors, keys = {}, []
+    for index, item in enumerate(items):
+        value = item.get('uuid') if isinstance(item, dict) else item
+        if (key := normalize_uuid(value)) is None:
+            errors[index] = {'uuid': 'A valid uuid is required.'}
+        keys.append(key)
+    if errors:
+        raise exceptions.ParseError(convert_primitive({'errors': errors}))
+
+    def write():
+        queryset = model.objects.filter(uuid__in=keys)
+        found = set(queryset.values_list('uuid', flat=True))
+        for index, key in enumerate(keys):
+            if key not in found:
+                errors[index] = {'uuid': f'{model.__name__} does not exist'}
+        if errors:
+            raise exceptions.NotFound(convert_primitive({'errors': errors}))
+        queryset.delete()
+
+    save_bulk(model, write)
+    return Response(**DELETE_RESPONSE)
+
+
+BULK_MODELS = {model._meta.model_name: model for model in SERIALIZERS}
+
+
+class BulkView(APIView):
+    """
+        Bulk create (POST), edit (PATCH) and delete (DELETE) for any
+        model of SERIALIZERS, named by its lowercase model name,
+        ie. bulk/schedule
+    """
+    def get_model(self, model_name):
+        try:
+            return BULK_MODELS[model_name]
+        except KeyError:
+            raise exceptions.NotFound(f'Unknown model `{model_name}`')
+
+    def post(self, request, model_name):
+        return bulk_create_objects(
+            self.get_model(model_name), data=request.data
+        )
+
+    def patch(self, request, model_name):
+        return bulk_edit_objects(self.get_model(model_name), data=request.data)
+
+    def delete(self, request, model_name):
+        return bulk_delete_objects(
+            self.get_model(model_name), data=request.data
+        )
+
+
 @api_view(['POST', 'GET', 'PATCH', 'DELETE'])
 @permission_classes([AllowAny])
 def ping(request):
     return Response(data={'detail': 'pong'}, status=status.HTTP_200_OK)
+
+
+@api_view(['GET', 'DELETE'])
+@permission_classes([IsAdminUser])
+def stats(request):
+    """
+        Get the request profiles of this process aggregated per endpoint,
+        and the latencies of its password hashing pool, or reset them
+        with DELETE
+    """
+    if request.method == 'DELETE':
+        request_stats.reset()
+        hashing_pool.stats.reset()
+        return Response(**DELETE_RESPONSE)
+    data = {
+        'endpoints': request_stats.snapshot(),
+        'hashing': hashing_pool.stats.snapshot(),
+    }
+    return Response(data=data, status=status.HTTP_200_OK)
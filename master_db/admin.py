@@ -4,7 +4,7 @@
 from .forms import CustomUserCreationForm, CustomUserChangeForm
 from .models import (
     Branch, Calendar, Setting, CustomUser, Course, ClassMetadata, Schedule,
-    Session, Log
+    Session, Log, RecurrenceRule, TagUsage, Timetable
 )
 
 
@@ -94,6 +94,9 @@ class CustomUserAdmin(UserAdmin):
 admin.site.register(CustomUser, CustomUserAdmin)
 admin.site.register(Course)
 admin.site.register(ClassMetadata)
+admin.site.register(RecurrenceRule)
 admin.site.register(Schedule)
 admin.site.register(Session)
 admin.site.register(Log)
+admin.site.register(Timetable)
+admin.site.register(TagUsage)
@@ -1,7 +1,75 @@
 from django.apps import AppConfig
+from django.db.models.signals import (
+    m2m_changed, post_delete, post_save, pre_delete
+)
 
 
 class DatabaseAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'master_db'
     verbose_name = 'User Database'
+
+    def ready(self):
+        from taggit.models import Tag
+
+        from . import (session_generation, tags, timetable)
+        from .models import (ClassMetadata, Course, Schedule, Session)
+        from .signals import post_bulk_save
+
+        post_save.connect(
+            timetable.schedule_saved,
+            sender=Schedule,
+            dispatch_uid='timetable_schedule_saved'
+        )
+        post_save.connect(
+            timetable.session_saved,
+            sender=Session,
+            dispatch_uid='timetable_session_saved'
+        )
+        post_delete.connect(
+            timetable.session_deleted,
+            sender=Session,
+            dispatch_uid='timetable_session_deleted'
+        )
+        post_bulk_save.connect(
+            timetable.bulk_saved, dispatch_uid='timetable_bulk_saved'
+        )
+        m2m_changed.connect(
+            timetable.students_changed,
+            sender=ClassMetadata.students.through,
+            dispatch_uid='timetable_students_changed'
+        )
+
+        # Sessions are generated after the timetable is refreshed and
+        # update it through post_bulk_save
+        post_save.connect(
+            session_generation.schedule_saved,
+            sender=Schedule,
+            dispatch_uid='session_generation_schedule_saved'
+        )
+        post_bulk_save.connect(
+            session_generation.bulk_saved,
+            dispatch_uid='session_generation_bulk_saved'
+        )
+        m2m_changed.connect(
+            session_generation.students_changed,
+            sender=ClassMetadata.students.through,
+            dispatch_uid='session_generation_students_changed'
+        )
+
+        post_save.connect(
+            tags.tag_changed, sender=Tag, dispatch_uid='tags_tag_saved'
+        )
+        post_delete.connect(
+            tags.tag_changed, sender=Tag, dispatch_uid='tags_tag_deleted'
+        )
+        m2m_changed.connect(
+            tags.course_tags_changed,
+            sender=Course.tags.through,
+            dispatch_uid='tags_course_tags_changed'
+        )
+        pre_delete.connect(
+            tags.course_deleted,
+            sender=Course,
+            dispatch_uid='tags_course_deleted'
+        )
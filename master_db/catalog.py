@@ -0,0 +1,56 @@
+"""
+    Course catalog queries.
+
+    Every filter is a subquery of a single SELECT of courses, so a page
+    of the catalog costs one query plus the prefetch of its tags,
+    whatever the filters.
+"""
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import Count
+
+from .models import (ClassMetadata, Course)
+
+ALL = 'all'
+ANY = 'any'
+MATCHES = (ALL, ANY)
+
+
+def tagged_with(names, match=ALL):
+    """
+        Ids of courses tagged with all (match all) or any (match any)
+        of names. Matching all is a GROUP BY course HAVING a count of
+        distinct tags equal to the number of names.
+    """
+    names = set(names)
+    TaggedItem = Course.tags.through
+    items = TaggedItem.objects.filter(
+        content_type=ContentType.objects.get_for_model(Course),
+        tag__name__in=names,
+    )
+    if match == ALL:
+        items = items.values('object_id').annotate(
+            num_tags=Count('tag', distinct=True)
+        ).filter(num_tags=len(names))
+    return items.values('object_id')
+
+
+def find_courses(
+    tags=None, match=ALL, duration_min=None, duration_max=None, student=None
+):
+    """
+        Courses tagged with tags (see tagged_with), whose duration is
+        within [duration_min, duration_max] and, if student is given,
+        that have a class the student is enrolled in. Tags of the
+        courses are prefetched.
+    """
+    courses = Course.objects.all()
+    if tags:
+        courses = courses.filter(pk__in=tagged_with(tags, match))
+    if duration_min is not None:
+        courses = courses.filter(duration__gte=duration_min)
+    if duration_max is not None:
+        courses = courses.filter(duration__lte=duration_max)
+    if student is not None:
+        enrolled = ClassMetadata.objects.filter(students=student)
+        courses = courses.filter(pk__in=enrolled.values('course'))
+    return courses.prefetch_related('tags')
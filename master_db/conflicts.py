@@ -0,0 +1,187 @@
+"""
+    Double-booking detection for schedules.
+
+    Two schedules conflict when their [time_start, time_end) intervals
+    overlap and they share a resource: their class, its teacher or one
+    of its students.
+"""
+from django.db import connections
+from django.db.models import (BooleanField, DateTimeField, F, Func, Q, Value)
+
+from .models import (ClassMetadata, Schedule)
+
+from collections import namedtuple
+
+import heapq
+
+ClassStudents = ClassMetadata.students.through
+
+Interval = namedtuple('Interval', ['key', 'start', 'end', 'resources'])
+
+
+class RangeOverlaps(Func):
+    """
+        tstzrange(time_start, time_end) && tstzrange(start, end), the form
+        served by the GiST index of Schedule on Postgres
+    """
+    output_field = BooleanField()
+
+    def as_sql(self, compiler, connection):
+        sql, params = [], []
+        for expression in self.get_source_expressions():
+            part_sql, part_params = compiler.compile(expression)
+            sql.append(part_sql)
+            params.extend(part_params)
+        return 'tstzrange(%s, %s) && tstzrange(%s, %s)' % tuple(sql), params
+
+
+def overlapping(queryset, start, end):
+    """
+        Filter schedules of queryset overlapping [start, end)
+    """
+    if connections[queryset.db].vendor == 'postgresql':
+        return queryset.filter(
+            RangeOverlaps(
+                F('time_start'),
+                F('time_end'),
+                Value(start, output_field=DateTimeField()),
+                Value(end, output_field=DateTimeField()),
+            )
+        )
+    return queryset.filter(time_start__lt=end, time_end__gt=start)
+
+
+def class_resources(classroom_ids):
+    """
+        Map each class id of classroom_ids to the set of resources it
+        books: ('class', id), ('teacher', id) and ('student', id)
+    """
+    resources = {pk: {('class', pk)} for pk in classroom_ids}
+    teachers = ClassMetadata.objects.filter(pk__in=resources.keys())
+    for pk, teacher in teachers.values_list('pk', 'teacher_id'):
+        if teacher is not None:
+            resources[pk].add(('teacher', teacher))
+    members = ClassStudents.objects.filter(
+        classmetadata_id__in=resources.keys()
+    )
+    for pk, student in members.values_list('classmetadata_id', 'customuser_id'):
+        resources[pk].add(('student', student))
+    return resources
+
+
+def booking_filter(resources):
+    """
+        Q matching schedules that book any of resources
+    """
+    ids = {'class': set(), 'teacher': set(), 'student': set()}
+    for kind, pk in resources:
+        ids[kind].add(pk)
+    return (
+        Q(classroom__in=ids['class']) |
+        Q(classroom__teacher__in=ids['teacher']) |
+        Q(classroom__students__in=ids['student'])
+    )
+
+
+def find_conflicts(classroom, start, end, exclude=None):
+    """
+        Schedules overlapping [start, end) that share the class, the
+        teacher or a student with classroom. exclude is the schedule
+        being edited, if any.
+    """
+    resources = class_resources([classroom.pk])[classroom.pk]
+    queryset = overlapping(Schedule.objects.all(), start, end)
+    queryset = queryset.filter(booking_filter(resources))
+    if exclude is not None and exclude.pk is not None:
+        queryset = queryset.exclude(pk=exclude.pk)
+    return Schedule.objects.filter(
+        pk__in=queryset.values('pk')
+    ).select_related('classroom').order_by('time_start', 'id')
+
+
+def sweep_conflicts(intervals):
+    """
+        Yield every pair of intervals that overlap and share a resource.
+
+        Intervals are swept by start time while the active ones are
+        indexed by resource, so only intervals that can conflict are
+        ever compared: O((n + k) log n) for n intervals and k pairs.
+    """
+    ordered = sorted(
+        enumerate(intervals), key=lambda item: (item[1].start, item[0])
+    )
+    ending = []
+    active = {}
+    for index, interval in ordered:
+        while ending and ending[0][0] <= interval.start:
+            _, done = heapq.heappop(ending)
+            for resource in intervals[done].resources:
+                active[resource].discard(done)
+
+        others = set()
+        for resource in interval.resources:
+            others |= active.setdefault(resource, set())
+        for other in sorted(others):
+            yield intervals[other], interval
+
+        heapq.heappush(ending, (interval.end, index))
+        for resource in interval.resources:
+            active[resource].add(index)
+
+
+def check_schedules(items):
+    """
+        Check a whole set of schedules at once, against each other and
+        against the schedules already stored.
+
+        items is a list of dicts with classroom, time_start, time_end
+        and, for schedules being edited, instance. Return a dict of
+        item index to the list of conflicts of that item, each either
+        {'index': other item} or {'schedule': stored Schedule}.
+    """
+    if not items:
+        return {}
+
+    resources = class_resources({item['classroom'].pk for item in items})
+    intervals = [
+        Interval(
+            index, item['time_start'], item['time_end'],
+            resources[item['classroom'].pk]
+        ) for index, item in enumerate(items)
+    ]
+
+    # Stored schedules in the span of the set that book the same
+    # resources, minus those being replaced by items
+    edited = {
+        item['instance'].pk
+        for item in items if item.get('instance') is not None
+    }
+    booked = set().union(*(interval.resources for interval in intervals))
+    stored = overlapping(
+        Schedule.objects.all(),
+        min(interval.start for interval in intervals),
+        max(interval.end for interval in intervals),
+    ).filter(booking_filter(booked)).exclude(pk__in=edited)
+    stored = Schedule.objects.filter(pk__in=stored.values('pk'))
+    stored = list(stored.select_related('classroom'))
+
+    stored_resources = class_resources({obj.classroom_id for obj in stored})
+    intervals += [
+        Interval(
+            obj, obj.time_start, obj.time_end,
+            stored_resources[obj.classroom_id]
+        ) for obj in stored
+    ]
+
+    conflicts = {}
+
+    def describe(key):
+        if isinstance(key, Schedule):
+            return {'schedule': key}
+        return {'index': key}
+
+    for first, second in sweep_conflicts(intervals):
+        for this, other in ((first, second), (second, first)):
+            if not isinstance(this.key, Schedule):
+                conflicts.setdefault(this.key, []).append(describe(other.key))
+    return dict(sorted(conflicts.items()))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from master_db.timetable import (REBUILD_CHUNK_SIZE, rebuild_timetable)
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute the timetable of every student from classes, schedules '
+        'and sessions.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=REBUILD_CHUNK_SIZE,
+            help='Number of schedules processed at a time.',
+        )
+
+    def handle(self, *args, **options):
+        count = rebuild_timetable(options['chunk_size'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Rebuilt timetable with {count} rows.')
+        )
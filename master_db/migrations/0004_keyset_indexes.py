@@ -0,0 +1,37 @@
+# Generated by Django 3.2.6 on 2026-10-18 18:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('master_db', '0003_unique_uuid'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='calendar',
+            index=models.Index(fields=['created', 'id'], name='master_db_c_created_988279_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='classmetadata',
+            index=models.Index(fields=['created', 'id'], name='master_db_c_created_e1fa89_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['created', 'id'], name='master_db_c_created_782757_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['date_joined', 'id'], name='master_db_c_date_jo_fb1960_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='schedule',
+            index=models.Index(fields=['created', 'id'], name='master_db_s_created_4c0eaf_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='session',
+            index=models.Index(fields=['created', 'id'], name='master_db_s_created_600552_idx'),
+        ),
+    ]
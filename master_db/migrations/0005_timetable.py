@@ -0,0 +1,41 @@
+# Generated by Django 3.2.6 on 2026-10-18 18:25
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('master_db', '0004_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Timetable',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('time_start', models.DateTimeField()),
+                ('time_end', models.DateTimeField()),
+                ('homework', models.SmallIntegerField(blank=True, null=True)),
+                ('status', models.BooleanField(blank=True, null=True)),
+                ('classroom', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='master_db.classmetadata')),
+                ('schedule', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='master_db.schedule')),
+                ('session', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='master_db.session')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timetable', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'timetable entry',
+                'verbose_name_plural': 'timetable entries',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='timetable',
+            index=models.Index(fields=['student', 'time_start'], name='master_db_t_student_6ae434_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='timetable',
+            constraint=models.UniqueConstraint(fields=('student', 'schedule'), name='unique_timetable'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+from django.db import migrations
+
+INDEX_NAME = 'master_db_schedule_range_gist'
+
+
+def create_range_index(apps, schema_editor):
+    # Range overlap (&&) lookups of master_db.conflicts use this index.
+    # Other backends rely on the (time_start, time_end) btree index.
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS {INDEX_NAME} ON master_db_schedule '
+        'USING gist (tstzrange(time_start, time_end))'
+    )
+
+
+def drop_range_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f'DROP INDEX IF EXISTS {INDEX_NAME}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('master_db', '0005_timetable'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_range_index, drop_range_index),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.6 on 2026-10-18 18:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('master_db', '0006_schedule_range_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='schedule',
+            name='generate_sessions',
+            field=models.BooleanField(default=False),
+        ),
+    ]
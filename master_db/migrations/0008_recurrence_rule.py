@@ -0,0 +1,62 @@
+# Generated by Django 3.2.6 on 2026-10-18 18:34
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import model_utils.fields
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('master_db', '0007_schedule_generate_sessions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecurrenceRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', model_utils.fields.AutoCreatedField(default=django.utils.timezone.now, editable=False, verbose_name='created')),
+                ('modified', model_utils.fields.AutoLastModifiedField(default=django.utils.timezone.now, editable=False, verbose_name='modified')),
+                ('uuid', models.UUIDField(blank=True, default=uuid.uuid4, editable=False, unique=True)),
+                ('desc', models.TextField(blank=True, null=True)),
+                ('frequency', models.TextField(choices=[('daily', 'Daily'), ('weekly', 'Weekly')], default='weekly')),
+                ('interval', models.PositiveSmallIntegerField(default=1)),
+                ('weekdays', models.TextField(blank=True, default='')),
+                ('time_start', models.DateTimeField()),
+                ('duration', models.DurationField()),
+                ('until', models.DateTimeField(blank=True, null=True)),
+                ('count', models.PositiveIntegerField(blank=True, null=True)),
+                ('exdates', models.JSONField(blank=True, default=list)),
+            ],
+            options={
+                'verbose_name': 'recurrence rule',
+                'verbose_name_plural': 'recurrence rules',
+            },
+        ),
+        migrations.AddField(
+            model_name='schedule',
+            name='occurrence',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='recurrencerule',
+            name='classroom',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recurrences', to='master_db.classmetadata'),
+        ),
+        migrations.AddField(
+            model_name='schedule',
+            name='recurrence',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='schedules', to='master_db.recurrencerule'),
+        ),
+        migrations.AddConstraint(
+            model_name='schedule',
+            constraint=models.UniqueConstraint(fields=('recurrence', 'occurrence'), name='unique_occurrence'),
+        ),
+        migrations.AddIndex(
+            model_name='recurrencerule',
+            index=models.Index(fields=['created', 'id'], name='master_db_r_created_ffe928_idx'),
+        ),
+    ]
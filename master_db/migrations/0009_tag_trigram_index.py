@@ -0,0 +1,33 @@
+from django.db import migrations
+
+INDEX_NAME = 'taggit_tag_name_trgm'
+
+
+def create_trigram_index(apps, schema_editor):
+    # ILIKE lookups of master_db.tags use this index. Other backends
+    # match tags against an in-process trie instead.
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS {INDEX_NAME} ON taggit_tag '
+        'USING gin (UPPER(name::text) gin_trgm_ops)'
+    )
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f'DROP INDEX IF EXISTS {INDEX_NAME}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('master_db', '0008_recurrence_rule'),
+        ('taggit', '0003_taggeditem_add_unique_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
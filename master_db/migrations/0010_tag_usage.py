@@ -0,0 +1,45 @@
+# Generated by Django 3.2.6 on 2026-10-18 18:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def count_tag_usage(apps, schema_editor):
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    TaggedItem = apps.get_model('taggit', 'TaggedItem')
+    TagUsage = apps.get_model('master_db', 'TagUsage')
+    course = ContentType.objects.filter(app_label='master_db', model='course')
+    items = TaggedItem.objects.filter(content_type__in=course)
+    counts = items.values('tag').annotate(num_times=models.Count('id'))
+    TagUsage.objects.bulk_create(
+        TagUsage(tag_id=row['tag'], num_times=row['num_times'])
+        for row in counts
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('taggit', '0003_taggeditem_add_unique_index'),
+        ('master_db', '0009_tag_trigram_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TagUsage',
+            fields=[
+                ('tag', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='usage', serialize=False, to='taggit.tag')),
+                ('num_times', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'tag usage',
+                'verbose_name_plural': 'tag usages',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='tagusage',
+            index=models.Index(fields=['-num_times', 'tag'], name='master_db_t_num_tim_47c9ed_idx'),
+        ),
+        migrations.RunPython(count_tag_usage, migrations.RunPython.noop),
+    ]
@@ -4,6 +4,7 @@
 
 from model_utils.models import TimeStampedModel
 from taggit.managers import TaggableManager
+from taggit.models import Tag
 
 from .managers import CustomUserManager
 
@@ -15,7 +16,9 @@
 
 
 class TemplateModel(TimeStampedModel):
-    uuid = models.UUIDField(default=uuid.uuid4, editable=False, blank=True)
+    uuid = models.UUIDField(
+        default=uuid.uuid4, editable=False, blank=True, unique=True
+    )
     desc = models.TextField(null=True, blank=True)
 
     class Meta:
@@ -56,7 +59,9 @@ def upload_avatar(instance, filename):
 
 class CustomUser(AbstractUser):
     username = None
-    uuid = models.UUIDField(default=uuid.uuid4, editable=False, blank=True)
+    uuid = models.UUIDField(
+        default=uuid.uuid4, editable=False, blank=True, unique=True
+    )
     email = models.EmailField(unique=True)
 
     birth_date = models.DateField(null=True, blank=True)
@@ -94,6 +99,7 @@ class Meta:
             models.Index(fields=[
                 'male',
             ]),
+            models.Index(fields=['date_joined', 'id']),
         ]
 
     def __str__(self):
@@ -109,9 +115,12 @@ class Course(TemplateModel):
     class Meta:
         verbose_name = 'course'
         verbose_name_plural = 'courses'
-        indexes = [models.Index(fields=[
-            'duration',
-        ])]
+        indexes = [
+            models.Index(fields=[
+                'duration',
+            ]),
+            models.Index(fields=['created', 'id']),
+        ]
 
     def __str__(self):
         return f'{self.name}'
@@ -143,12 +152,49 @@ class Meta:
             models.Index(fields=[
                 'status',
             ]),
+            models.Index(fields=['created', 'id']),
         ]
 
     def __str__(self):
         return f'{self.name}'
 
 
+# Weekly or daily pattern of a class, expanded into schedules on demand
+# by master_db.recurrence
+class RecurrenceRule(TemplateModel):
+    DAILY = 'daily'
+    WEEKLY = 'weekly'
+    FREQUENCIES = [(DAILY, 'Daily'), (WEEKLY, 'Weekly')]
+
+    classroom = models.ForeignKey(
+        ClassMetadata,
+        related_name='recurrences',
+        on_delete=models.CASCADE,
+    )
+    frequency = models.TextField(choices=FREQUENCIES, default=WEEKLY)
+    interval = models.PositiveSmallIntegerField(default=1)
+    # Comma separated RRULE BYDAY codes (MO,TU,...), default to the day of
+    # time_start
+    weekdays = models.TextField(blank=True, default='')
+    # Start of the first occurrence, the time of day of every occurrence
+    time_start = models.DateTimeField()
+    duration = models.DurationField()
+    until = models.DateTimeField(null=True, blank=True)
+    count = models.PositiveIntegerField(null=True, blank=True)
+    # Start of occurrences that do not take place, in ISO format
+    exdates = models.JSONField(default=list, blank=True)
+
+    class Meta:
+        verbose_name = 'recurrence rule'
+        verbose_name_plural = 'recurrence rules'
+        indexes = [
+            models.Index(fields=['created', 'id']),
+        ]
+
+    def __str__(self):
+        return f'{self.classroom}, {self.frequency}'
+
+
 # Schedule for students
 class Schedule(TemplateModel):
     classroom = models.ForeignKey(
@@ -157,11 +203,32 @@ class Schedule(TemplateModel):
     )
     time_start = models.DateTimeField()
     time_end = models.DateTimeField()
+    # Keep a session for every student of the class, see
+    # master_db.session_generation
+    generate_sessions = models.BooleanField(default=False)
+    # Set when the schedule is the materialized occurrence of a rule
+    # starting at occurrence
+    recurrence = models.ForeignKey(
+        RecurrenceRule,
+        related_name='schedules',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+    )
+    occurrence = models.DateTimeField(null=True, blank=True)
 
     class Meta:
         verbose_name = 'schedule'
         verbose_name_plural = 'schedules'
-        indexes = [models.Index(fields=['time_start', 'time_end'])]
+        indexes = [
+            models.Index(fields=['time_start', 'time_end']),
+            models.Index(fields=['created', 'id']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recurrence', 'occurrence'], name='unique_occurrence'
+            )
+        ]
 
     def __str__(self):
         return (
@@ -191,7 +258,8 @@ class Meta:
             models.Index(fields=['student', 'status']),
             models.Index(fields=[
                 'schedule',
-            ])
+            ]),
+            models.Index(fields=['created', 'id']),
         ]
         constraints = [
             models.UniqueConstraint(
@@ -203,6 +271,61 @@ def __str__(self):
         return f'{str(self.student)} in {str(self.schedule)}'
 
 
+class TagUsage(models.Model):
+    tag = models.OneToOneField(
+        Tag,
+        primary_key=True,
+        related_name='usage',
+        on_delete=models.CASCADE,
+    )
+    # Number of courses tagged with tag
+    num_times = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'tag usage'
+        verbose_name_plural = 'tag usages'
+        indexes = [
+            models.Index(fields=['-num_times', 'tag']),
+        ]
+
+    def __str__(self):
+        return f'{str(self.tag)}: {self.num_times}'
+
+
+# Timetable of students, denormalized from ClassMetadata.students, Schedule
+# and Session. Maintained by master_db.timetable, do not write directly.
+class Timetable(models.Model):
+    student = models.ForeignKey(
+        CustomUser,
+        related_name='timetable',
+        on_delete=models.CASCADE,
+    )
+    schedule = models.ForeignKey(Schedule, on_delete=models.CASCADE)
+    classroom = models.ForeignKey(ClassMetadata, on_delete=models.CASCADE)
+    session = models.ForeignKey(
+        Session, on_delete=models.SET_NULL, null=True, blank=True
+    )
+    time_start = models.DateTimeField()
+    time_end = models.DateTimeField()
+    homework = models.SmallIntegerField(null=True, blank=True)
+    status = models.BooleanField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'timetable entry'
+        verbose_name_plural = 'timetable entries'
+        indexes = [
+            models.Index(fields=['student', 'time_start']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['student', 'schedule'], name='unique_timetable'
+            )
+        ]
+
+    def __str__(self):
+        return f'{str(self.student)} in {str(self.schedule)}'
+
+
 # Calendar for staff only
 class Calendar(TemplateModel):
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
@@ -211,7 +334,10 @@ class Calendar(TemplateModel):
     time_end = models.DateTimeField()
 
     class Meta:
-        indexes = [models.Index(fields=['time_start', 'time_end'])]
+        indexes = [
+            models.Index(fields=['time_start', 'time_end']),
+            models.Index(fields=['created', 'id']),
+        ]
 
     def __str__(self):
         return f'{self.name}'
@@ -231,6 +357,5 @@ class Log(TemplateModel):
 
     Either use custom function or manager
     """
-
     def __str__(self):
         return self.desc
@@ -0,0 +1,222 @@
+"""
+    Lazy expansion of recurrence rules.
+
+    Occurrences of a rule are computed for a requested window and never
+    stored, so editing a rule changes every occurrence at once. An
+    occurrence is referred to as `<rule uuid>@<unix time of its start>`,
+    with its microseconds if any (`<seconds>.<microseconds>`), until
+    something needs a row for it, ie. a session; it is then
+    materialized as a Schedule with recurrence and occurrence set, which
+    stands in for it from then on.
+"""
+from django.db import (IntegrityError, transaction)
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import (RecurrenceRule, Schedule)
+
+import datetime
+import uuid
+
+WEEKDAYS = ('MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU')
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def parse_weekdays(value):
+    """
+        Return the sorted weekday numbers (Monday is 0) of comma
+        separated BYDAY codes. Raise ValueError for an unknown code.
+    """
+    codes = [code.strip().upper() for code in value.split(',') if code.strip()]
+    return sorted({WEEKDAYS.index(code) for code in codes})
+
+
+def parse_exdates(values):
+    exdates = set()
+    for value in values:
+        if (time := parse_datetime(value)) is not None:
+            if timezone.is_naive(time):
+                time = timezone.make_aware(time)
+            exdates.add(time)
+    return exdates
+
+
+def iter_dates(rule, after=None):
+    """
+        Yield (index, local date) of every occurrence of rule in order,
+        without end. Without a count, dates before after are skipped in
+        constant time.
+    """
+    base = timezone.localtime(rule.time_start).date()
+    step = max(rule.interval, 1)
+    skip = after is not None and rule.count is None and after > base
+
+    if rule.frequency == RecurrenceRule.DAILY:
+        k = (after - base).days // step if skip else 0
+        while True:
+            yield k, base + datetime.timedelta(days=k * step)
+            k += 1
+
+    days = parse_weekdays(rule.weekdays) or [base.weekday()]
+    monday = base - datetime.timedelta(days=base.weekday())
+    k = (after - monday).days // (7 * step) if skip else 0
+    index = 0
+    if k:
+        # Days of the first week before base have no occurrence
+        index = k * len(days) - sum(day < base.weekday() for day in days)
+    while True:
+        week = monday + datetime.timedelta(weeks=k * step)
+        for day in days:
+            date = week + datetime.timedelta(days=day)
+            if date >= base:
+                yield index, date
+                index += 1
+        k += 1
+
+
+def occurrences(rule, start, end):
+    """
+        Yield (time_start, time_end) of every occurrence of rule that
+        overlaps [start, end), skipping exdates
+    """
+    first = timezone.localtime(rule.time_start)
+    exdates = parse_exdates(rule.exdates)
+    after = timezone.localtime(start - rule.duration).date()
+
+    for index, date in iter_dates(rule, after):
+        if rule.count is not None and index >= rule.count:
+            return
+        time_start = timezone.make_aware(
+            datetime.datetime.combine(date, first.time())
+        )
+        if time_start >= end:
+            return
+        if rule.until is not None and time_start > rule.until:
+            return
+        time_end = time_start + rule.duration
+        if time_end > start and time_start not in exdates:
+            yield time_start, time_end
+
+
+def occurrence_ref(rule, time_start):
+    # Exact, unlike the float of timestamp()
+    delta = time_start - EPOCH
+    seconds = delta.days * 86400 + delta.seconds
+    if delta.microseconds:
+        return f'{rule.uuid}@{seconds}.{delta.microseconds:06d}'
+    return f'{rule.uuid}@{seconds}'
+
+
+def parse_occurrence_ref(value):
+    """
+        Return (rule uuid, occurrence start) of an occurrence reference,
+        or None if value is not one
+    """
+    if not isinstance(value, str) or value.count('@') != 1:
+        return None
+    rule, time = value.split('@')
+    seconds, _, microseconds = time.partition('.')
+    if microseconds and not (microseconds.isdigit() and len(microseconds) == 6):
+        return None
+    try:
+        time_start = EPOCH + datetime.timedelta(
+            seconds=int(seconds), microseconds=int(microseconds or 0)
+        )
+        return uuid.UUID(rule), time_start
+    except (OverflowError, ValueError):
+        return None
+
+
+def virtual_schedules(rules, start, end):
+    """
+        Unsaved schedules for the occurrences of rules overlapping
+        [start, end) that are not materialized yet. Their uuid is their
+        occurrence reference.
+    """
+    virtual = []
+    for rule in rules:
+        for time_start, time_end in occurrences(rule, start, end):
+            virtual.append(
+                Schedule(
+                    uuid=occurrence_ref(rule, time_start),
+                    classroom=rule.classroom,
+                    time_start=time_start,
+                    time_end=time_end,
+                    recurrence=rule,
+                    occurrence=time_start,
+                    created=rule.created,
+                    modified=rule.modified,
+                    desc=rule.desc,
+                )
+            )
+    if virtual:
+        materialized = set(
+            Schedule.objects.filter(
+                recurrence__in=[obj.recurrence for obj in virtual],
+                occurrence__in=[obj.occurrence for obj in virtual],
+            ).values_list('recurrence', 'occurrence')
+        )
+        virtual = [
+            obj for obj in virtual
+            if (obj.recurrence.pk, obj.occurrence) not in materialized
+        ]
+    return virtual
+
+
+def resolve_occurrence(value):
+    """
+        Return the schedule of an occurrence reference without writing
+        anything: the stored one if it is materialized already, else an
+        unsaved one for save_occurrence. Raise Schedule.DoesNotExist if
+        the rule does not exist or has no such occurrence.
+    """
+    if (parsed := parse_occurrence_ref(value)) is None:
+        raise Schedule.DoesNotExist
+    rule_uuid, time_start = parsed
+    try:
+        rule = RecurrenceRule.objects.select_related('classroom').get(
+            uuid=rule_uuid
+        )
+    except RecurrenceRule.DoesNotExist:
+        raise Schedule.DoesNotExist
+
+    try:
+        return Schedule.objects.get(recurrence=rule, occurrence=time_start)
+    except Schedule.DoesNotExist:
+        pass
+
+    window = occurrences(
+        rule, time_start, time_start + datetime.timedelta(microseconds=1)
+    )
+    for occurrence_start, occurrence_end in window:
+        if occurrence_start == time_start:
+            break
+    else:
+        raise Schedule.DoesNotExist
+
+    return Schedule(
+        classroom=rule.classroom,
+        time_start=occurrence_start,
+        time_end=occurrence_end,
+        recurrence=rule,
+        occurrence=occurrence_start,
+        desc=rule.desc,
+    )
+
+
+def save_occurrence(schedule):
+    """
+        Materialize a schedule returned by resolve_occurrence, if it is
+        not stored yet, and return the stored schedule
+    """
+    if schedule.pk is not None:
+        return schedule
+    try:
+        with transaction.atomic():
+            schedule.save(force_insert=True)
+            return schedule
+    except IntegrityError:
+        # Materialized concurrently
+        return Schedule.objects.get(
+            recurrence=schedule.recurrence, occurrence=schedule.occurrence
+        )
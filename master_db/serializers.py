@@ -8,9 +8,16 @@
 
 from master_db.models import (
     Branch, Calendar, CustomUser, Setting, Course, ClassMetadata, Schedule,
-    Session, Log
+    Session, Log, Timetable, RecurrenceRule
 )
 from master_db import models
+from master_db.conflicts import (check_schedules, find_conflicts)
+from master_db.recurrence import (
+    WEEKDAYS, parse_occurrence_ref, parse_weekdays, resolve_occurrence,
+    save_occurrence
+)
+from master_api.cache import normalize_uuid
+from master_api.instrumentation import timed_serialization
 from master_api.utils import validate_uuid4, prettyPrint
 
 # For custom classes
@@ -19,13 +26,19 @@
 from taggit_serializer.serializers import (
     TaggitSerializer, TagListSerializerField
 )
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django.utils.translation import gettext_lazy as _
-from django.core.exceptions import ObjectDoesNotExist, ValidationError
+from django.core.exceptions import (
+    FieldDoesNotExist, ObjectDoesNotExist, ValidationError
+)
+from django.db import transaction
 
 from rest_framework.fields import empty, get_error_detail, set_value
 from rest_framework.settings import api_settings
 from rest_framework.exceptions import ValidationError as DRFValidationError
 
+import copy
 import json
 
 MANY_RELATION_KWARGS = (
@@ -96,31 +109,47 @@ class UUIDManyRelatedField(serializers.ManyRelatedField):
             _('All list items must be of string type.'),
         'invalid_uuid':
             _('“{value}” is not a valid UUID.'),
+        'does_not_exist':
+            _('Invalid uuid {uuid_value} - object does not exist.'),
     }
 
     def to_internal_value(self, value):
+        """
+            Resolve the whole list of uuids with a single query, keeping
+            the order of the list and dropping duplicates
+        """
         if not value:
-            value = "[]"
-        elif isinstance(value, list) and len(value) == 1:
-            # ! Naive resolve
+            value = []
+        elif isinstance(value, list) and len(value) == 1 and isinstance(
+            value[0], str
+        ) and value[0].lstrip().startswith('['):
             # When passing data=request.data param comes in
             # list with a single string(data sent).
             # May be due to OrderedDict
             value = value[0]
-        try:
-            value = json.loads(value)
-        except ValueError:
-            self.fail(
-                'invalid_json', name=self.child_relation.__class__.__name__
-            )
+        if isinstance(value, str):
+            try:
+                value = json.loads(value)
+            except ValueError:
+                self.fail(
+                    'invalid_json', name=self.child_relation.__class__.__name__
+                )
 
         if not isinstance(value, list):
             self.fail('not_a_list', input_type=type(value).__name__)
+        if not all(isinstance(s, str) for s in value):
+            self.fail('not_a_str')
+        if invalid := [s for s in value if normalize_uuid(s) is None]:
+            self.fail('invalid_uuid', value=invalid)
 
-        for s in value:
-            if not validate_uuid4(s):
-                self.fail('invalid_uuid', value=value)
-            yield self.child_relation.to_internal_value(s)
+        keys = list(dict.fromkeys(map(normalize_uuid, value)))
+        if not keys:
+            return []
+        queryset = self.child_relation.get_queryset()
+        objs = {obj.uuid: obj for obj in queryset.filter(uuid__in=keys)}
+        if missing := [str(key) for key in keys if key not in objs]:
+            self.fail('does_not_exist', uuid_value=missing)
+        return [objs[key] for key in keys]
 
 
 """
@@ -131,6 +160,8 @@ def to_internal_value(self, value):
         + ignore in class Meta: ignore fields when calling .data.
         + ignore_field: dynamically add fields to ignore.
         + clear_ignore: reset ignore to its original state.
+        + FieldPlan: fields and Meta sets are computed once per
+        serializer class, readable/writable fields once per instance.
         + list_serializer_class: Automatically set to
         EnhancedListSerializer for further customization.
         + Update ignore required fields: Updating models now does
@@ -142,6 +173,22 @@ def to_internal_value(self, value):
 """
 
 
+class OccurrenceRelatedField(UUIDRelatedField):
+    """
+        Schedule given by uuid, or by the occurrence reference of a
+        recurrence rule. Validation writes nothing: an occurrence that is
+        not materialized yet is an unsaved schedule, saved along with
+        the object that refers to it (see save_occurrence).
+    """
+    def to_internal_value(self, data):
+        if parse_occurrence_ref(data) is None:
+            return super().to_internal_value(data)
+        try:
+            return resolve_occurrence(data)
+        except ObjectDoesNotExist:
+            self.fail('does_not_exist', uuid_value=data)
+
+
 class EnhancedListSerializer(serializers.ListSerializer):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -152,22 +199,52 @@ def __init__(self, *args, **kwargs):
             )
 
     def ignore_fields(self, *fields):
-        self.child.ignore_fields(fields)
+        self.child.ignore_fields(*fields)
         return self
 
     def ignore_field(self, field):
         self.child.ignore_field(field)
         return self
 
+    def select_fields(self, fields=None, exclude=None):
+        self.child.select_fields(fields, exclude)
+        return self
+
+    def projection(self, names=None):
+        return self.child.projection(names)
+
     def clear_ignore(self):
         self.child.clear_ignore()
 
+    @property
+    def data(self):
+        with timed_serialization():
+            return super().data
+
+
+class FieldPlan:
+    """
+        Everything about a serializer class that does not change between
+        instances, computed once per class: the non_updatable and
+        ignore sets of its Meta, and its unbound fields, which are
+        copied for each instance instead of being rebuilt from the
+        model.
+    """
+    def __init__(self, serializer_class):
+        meta = serializer_class.Meta
+        self.non_updatable = frozenset(getattr(meta, 'non_updatable', ()))
+        self.ignore = frozenset(getattr(meta, 'ignore', ()))
+        self.fields = None
+
 
 class EnhancedModelSerializer(serializers.ModelSerializer):
     serializer_related_field = UUIDRelatedField
 
-    def __new__(cls, *args, **kwargs):
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
         meta = getattr(cls, 'Meta', None)
+        if meta is None:
+            return
         if not hasattr(meta, 'list_serializer_class'):
             setattr(meta, 'list_serializer_class', EnhancedListSerializer)
         elif not issubclass(meta.list_serializer_class, EnhancedListSerializer):
@@ -176,18 +253,28 @@ def __new__(cls, *args, **kwargs):
                 "EnhancedListSerializer or its subclass"
             )
 
-        return super().__new__(cls, *args, **kwargs)
+    @classmethod
+    def get_plan(cls):
+        """
+            FieldPlan of this exact class, built on first use
+        """
+        if (plan := cls.__dict__.get('_plan')) is None:
+            plan = FieldPlan(cls)
+            cls._plan = plan
+        return plan
 
     def __init__(self, instance=None, data=empty, **kwargs):
         super().__init__(instance, data, **kwargs)
-        self.updatable = dict.fromkeys(
-            self.Meta.non_updatable, False
-        ) if hasattr(self.Meta, 'non_updatable') else {}
-        self._ignore = self.Meta.ignore if hasattr(self.Meta,
-                                                   'ignore') else tuple()
-        self.ignore = {}
-        for field in self._ignore:
-            self.ignore_field(field)
+        self.plan = self.get_plan()
+        # Ignored on top of Meta.ignore by ignore_field, per instance
+        self._ignore = set()
+        self._readable = self._writable = None
+
+    def get_fields(self):
+        plan = self.plan
+        if plan.fields is None:
+            plan.fields = super().get_fields()
+        return copy.deepcopy(plan.fields)
 
     def to_internal_value(self, data):
         """
@@ -197,7 +284,7 @@ def to_internal_value(self, data):
             message = self.error_messages['invalid'].format(
                 datatype=type(data).__name__
             )
-            raise ValidationError(
+            raise DRFValidationError(
                 {api_settings.NON_FIELD_ERRORS_KEY: [message]}, code='invalid'
             )
 
@@ -239,20 +326,27 @@ def to_internal_value(self, data):
 
     @property
     def _writable_fields(self):
-        for name, field in self.fields.items():
-            if self.instance:
-                model_editable = self.updatable.get(name, True)
-            else:
-                model_editable = True
-            if not field.read_only and model_editable:
-                yield field
+        if self._writable is None:
+            skip = self.plan.non_updatable if self.instance else ()
+            self._writable = [
+                field for name, field in self.fields.items()
+                if not field.read_only and name not in skip
+            ]
+        return self._writable
 
     @property
     def _readable_fields(self):
-        for name, field in self.fields.items():
-            ignore = self.ignore.get(name, False)
-            if not field.write_only and not ignore:
-                yield field
+        if self._readable is None:
+            ignore = self.ignore
+            self._readable = [
+                field for name, field in self.fields.items()
+                if not field.write_only and name not in ignore
+            ]
+        return self._readable
+
+    @property
+    def ignore(self):
+        return self.plan.ignore.union(self._ignore)
 
     def ignore_fields(self, *fields):
         """
@@ -271,23 +365,76 @@ def ignore_field(self, field):
                 f"There is no `{field}` field in {self.__class__.__name__} "
                 "to ignore"
             )
-        if field in self.ignore.keys():
+        if field in self.ignore:
             return self
         else:
-            self.ignore[field] = True
+            self._ignore.add(field)
         # Reset .data calling when ignore is modified
+        self._readable = None
         if hasattr(self, '_data'):
             delattr(self, '_data')
 
         return self
 
+    def select_fields(self, fields=None, exclude=None):
+        """
+            Only output fields (if given), minus exclude, on top of what
+            is already ignored
+        """
+        names = set(fields or ()).union(exclude or ())
+        if (unknown := names.difference(self.fields)):
+            raise KeyError(
+                f"There is no `{', '.join(sorted(unknown))}` field in "
+                f"{self.__class__.__name__}"
+            )
+        if fields is not None:
+            self.ignore_fields(
+                *(name for name in self.fields if not name in fields)
+            )
+        if exclude:
+            self.ignore_fields(*exclude)
+        return self
+
+    def projection(self, names=None):
+        """
+            (columns, relations) behind the output fields, or behind
+            fields in names if given: the concrete model fields they
+            read, to pass to .only()/.defer(), and among those the
+            forward relations, to pass to .select_related()
+        """
+        model = self.Meta.model
+        if names is None:
+            fields = self._readable_fields
+        else:
+            fields = [self.fields[name] for name in names]
+        columns, relations = [], []
+        for field in fields:
+            if not field.source_attrs:
+                continue
+            try:
+                model_field = model._meta.get_field(field.source_attrs[0])
+            except FieldDoesNotExist:
+                continue
+            if not model_field.concrete or model_field.many_to_many:
+                continue
+            columns.append(model_field.name)
+            if model_field.is_relation:
+                relations.append(model_field.name)
+        return columns, relations
+
     def clear_ignore(self):
         """
             Reset ignore to the first ignored in class Meta
         """
         if hasattr(self, '_data'):
             delattr(self, '_data')
-        self.ignore = dict.fromkeys(self._ignore, True)
+        self._readable = None
+        self._ignore.clear()
+
+    @property
+    def data(self):
+        with timed_serialization():
+            return super().data
 
 
 class BranchSerializer(EnhancedModelSerializer):
@@ -367,18 +514,162 @@ class Meta:
         exclude = ('id', )
 
 
+class RecurrenceRuleSerializer(EnhancedModelSerializer):
+    class Meta:
+        model = RecurrenceRule
+        exclude = ('id', )
+
+    def validate_weekdays(self, value):
+        try:
+            days = parse_weekdays(value)
+        except ValueError:
+            raise DRFValidationError(
+                f'Must be comma separated days among {",".join(WEEKDAYS)}.'
+            )
+        return ','.join(WEEKDAYS[day] for day in days)
+
+    def validate_interval(self, value):
+        if value < 1:
+            raise DRFValidationError('Must be at least 1.')
+        return value
+
+    def validate_duration(self, value):
+        if value.total_seconds() <= 0:
+            raise DRFValidationError('Must be positive.')
+        return value
+
+    def validate_exdates(self, value):
+        if isinstance(value, str):
+            try:
+                value = json.loads(value)
+            except ValueError:
+                value = None
+        if not isinstance(value, list):
+            raise DRFValidationError('Must be a json list of datetimes.')
+        exdates = []
+        for item in value:
+            time = parse_datetime(item) if isinstance(item, str) else None
+            if time is None:
+                raise DRFValidationError(f'Invalid datetime `{item}`.')
+            if timezone.is_naive(time):
+                time = timezone.make_aware(time)
+            exdates.append(time.isoformat())
+        return exdates
+
+
 class ScheduleSerializer(EnhancedModelSerializer):
+    """
+        Schedules may not double-book their class, its teacher or its
+        students. Pass check_conflicts=False in context to skip the
+        check, ie. when the caller checks a whole set at once. Bulk
+        writes (bulk=True in context) are checked as a set by
+        validate_bulk.
+    """
     class Meta:
         model = Schedule
         exclude = ('id', )
+        read_only_fields = ('recurrence', 'occurrence')
+
+    def validate(self, attrs):
+        def current(name):
+            return attrs.get(name, getattr(self.instance, name, None))
+
+        classroom = current('classroom')
+        time_start, time_end = current('time_start'), current('time_end')
+        if time_start is None or time_end is None:
+            return attrs
+        if time_end <= time_start:
+            raise DRFValidationError(
+                {'time_end': 'Must be later than time_start.'}
+            )
+
+        check = self.context.get('check_conflicts', True)
+        if classroom is not None and check and not self.context.get('bulk'):
+            conflicts = find_conflicts(
+                classroom, time_start, time_end, exclude=self.instance
+            )
+            if conflicts:
+                raise DRFValidationError(
+                    {
+                        'conflicts':
+                            ScheduleSerializer(conflicts, many=True).data
+                    }
+                )
+        return attrs
+
+    @classmethod
+    def validate_bulk(cls, items):
+        """
+            Errors by index of the (instance, validated data) items of a
+            bulk write that double-book a resource, against each other
+            or against the stored schedules
+        """
+        names = ('classroom', 'time_start', 'time_end')
+        checked, indexes = [], []
+        for index, (instance, data) in enumerate(items):
+            item = {
+                name: data.get(name, getattr(instance, name, None))
+                for name in names
+            }
+            if None not in item.values():
+                checked.append({**item, 'instance': instance})
+                indexes.append(index)
+
+        def describe(conflict):
+            if 'index' in conflict:
+                return {'index': indexes[conflict['index']]}
+            return {'schedule': cls(conflict['schedule']).data}
+
+        return {
+            indexes[index]: {
+                'conflicts': [describe(conflict) for conflict in found]
+            }
+            for index, found in check_schedules(checked).items()
+        }
 
 
 class SessionSerializer(EnhancedModelSerializer):
+    schedule = OccurrenceRelatedField(queryset=Schedule.objects.all())
+
     class Meta:
         model = Session
         exclude = ('id', )
         non_updatable = ('schedule', 'student')
 
+    @classmethod
+    def save_pending(cls, data):
+        """
+            Materialize the occurrence of validated data, if it is not
+            stored yet. Call it in the transaction writing the session.
+        """
+        if (schedule := data.get('schedule')) is not None:
+            data['schedule'] = save_occurrence(schedule)
+        return data
+
+    def create(self, validated_data):
+        with transaction.atomic():
+            return super().create(self.save_pending(validated_data))
+
+
+class TimetableSerializer(EnhancedModelSerializer):
+    schedule = serializers.UUIDField(source='schedule.uuid', read_only=True)
+    session = serializers.UUIDField(
+        source='session.uuid', read_only=True, allow_null=True
+    )
+
+    class Meta:
+        model = Timetable
+        exclude = ('id', 'student')
+
+
+class AttendanceSerializer(EnhancedModelSerializer):
+    """
+        Status and homework of one session, for bulk marking
+    """
+    class Meta:
+        model = Session
+        fields = ('status', 'homework')
+
 
 class LogSerializer(EnhancedModelSerializer):
     class Meta:
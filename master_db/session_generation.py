@@ -0,0 +1,111 @@
+"""
+    Sessions of schedules with generate_sessions set.
+
+    Such a schedule gets a session for every student of its class when
+    it is saved. Later enrollment changes of the class backfill or prune
+    the sessions of its schedules that have not started yet. Pruning
+    keeps sessions that already have a status or homework.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from .models import (ClassMetadata, Schedule, Session)
+from .signals import post_bulk_save
+
+ClassStudents = ClassMetadata.students.through
+
+
+def generate_sessions(schedules, student_ids=None):
+    """
+        Create the missing sessions of schedules for the students of
+        their class, restricted to student_ids if given, with a single
+        bulk_create
+    """
+    schedules = list(schedules)
+    if not schedules:
+        return []
+
+    classrooms = [obj.classroom_id for obj in schedules]
+    members = ClassStudents.objects.filter(classmetadata_id__in=classrooms)
+    if student_ids is not None:
+        members = members.filter(customuser_id__in=student_ids)
+    students = {}
+    for classroom, student in members.values_list(
+        'classmetadata_id', 'customuser_id'
+    ):
+        students.setdefault(classroom, []).append(student)
+
+    sessions = [
+        Session(schedule_id=obj.pk, student_id=student) for obj in schedules
+        for student in students.get(obj.classroom_id, ())
+    ]
+    if not sessions:
+        return []
+    with transaction.atomic():
+        # Sessions that already exist are skipped by unique_session
+        Session.objects.bulk_create(sessions, ignore_conflicts=True)
+        post_bulk_save.send(
+            sender=Session,
+            instances=sessions,
+            created=True,
+            update_fields=None
+        )
+    return sessions
+
+
+def prune_sessions(schedules, student_ids=None):
+    """
+        Delete the sessions of schedules, restricted to student_ids if
+        given. Sessions with a status or homework are kept.
+    """
+    sessions = Session.objects.filter(
+        schedule__in=schedules, status__isnull=True, homework__isnull=True
+    )
+    if student_ids is not None:
+        sessions = sessions.filter(student_id__in=student_ids)
+    sessions.delete()
+
+
+def upcoming(**kwargs):
+    """
+        Schedules with generate_sessions set that have not started yet
+    """
+    return Schedule.objects.filter(
+        generate_sessions=True, time_start__gt=timezone.now(), **kwargs
+    )
+
+
+def schedule_saved(sender, instance, raw=False, **kwargs):
+    if not raw and instance.generate_sessions:
+        generate_sessions([instance])
+
+
+def bulk_saved(sender, instances, **kwargs):
+    if sender is Schedule:
+        generate_sessions(obj for obj in instances if obj.generate_sessions)
+
+
+def students_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+        m2m_changed of ClassMetadata.students, from either side:
+        instance is a class (reverse=False) or a student (reverse=True)
+    """
+    if action == 'post_clear':
+        if reverse:
+            prune_sessions(upcoming(), [instance.pk])
+        else:
+            prune_sessions(upcoming(classroom=instance))
+        return
+    if action not in ('post_add', 'post_remove') or not pk_set:
+        return
+
+    if reverse:
+        classrooms, students = pk_set, [instance.pk]
+    else:
+        classrooms, students = [instance.pk], pk_set
+
+    schedules = upcoming(classroom_id__in=classrooms)
+    if action == 'post_add':
+        generate_sessions(schedules, students)
+    else:
+        prune_sessions(schedules, students)
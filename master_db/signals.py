@@ -0,0 +1,5 @@
+from django.dispatch import Signal
+
+# Sent by the bulk CRUD layer after bulk_create/bulk_update, which skip
+# post_save. Arguments: sender (model), instances, created, update_fields
+post_bulk_save = Signal()
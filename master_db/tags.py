@@ -0,0 +1,214 @@
+"""
+    Tag autocomplete.
+
+    On Postgres, tag names are matched with ILIKE, served by the trigram
+    (pg_trgm) index of taggit_tag created in migration 0009. Other
+    backends match against an in-process trie of tag names, rebuilt on
+    the next lookup after a Tag changes. Either way the matches are
+    ranked by how many courses use them.
+
+    That number is kept in TagUsage, updated from the m2m_changed signals
+    of Course.tags and from Course deletion, so that ranking is an index
+    ordered read. reconcile_tag_usage() recounts it from scratch.
+"""
+from django.conf import settings
+from django.db import (connections, transaction)
+from django.db.models import (F, Value)
+from django.db.models.functions import Greatest
+from taggit.models import Tag
+
+from .models import (Course, TagUsage)
+
+import threading
+import time
+
+AUTOCOMPLETE_LIMIT = getattr(settings, 'TAG_AUTOCOMPLETE_LIMIT', 20)
+AUTOCOMPLETE_MAX_LIMIT = getattr(settings, 'TAG_AUTOCOMPLETE_MAX_LIMIT', 100)
+# Other workers only learn about tag changes through this
+TRIE_TTL = getattr(settings, 'TAG_TRIE_TTL', 60)
+# Trie matches ranked per query, below the bound-variable limit of SQLite
+TRIE_CHUNK_SIZE = getattr(settings, 'TAG_TRIE_CHUNK_SIZE', 500)
+
+PREFIX = 'prefix'
+SUBSTRING = 'substring'
+MODES = (PREFIX, SUBSTRING)
+
+
+class _Node:
+    __slots__ = ('children', 'ids', 'starts')
+
+    def __init__(self):
+        self.children = {}
+        # Tags having the path to this node as a substring
+        self.ids = set()
+        # Tags having the path to this node as a prefix
+        self.starts = set()
+
+
+class TagTrie:
+    """
+        Trie of every suffix of every (case folded) tag name, so that
+        both prefix and substring lookups walk len(txt) nodes only.
+        Each node holds the ids of the tags matching its path.
+    """
+    def __init__(self, tags=()):
+        self.root = _Node()
+        for pk, name in tags:
+            self.add(pk, name)
+
+    def add(self, pk, name):
+        key = name.casefold()
+        for offset in range(len(key)):
+            node = self.root
+            for char in key[offset:]:
+                node = node.children.setdefault(char, _Node())
+                node.ids.add(pk)
+                if offset == 0:
+                    node.starts.add(pk)
+
+    def search(self, txt, mode=SUBSTRING):
+        node = self.root
+        for char in txt.casefold():
+            node = node.children.get(char)
+            if node is None:
+                return set()
+        return set(node.starts if mode == PREFIX else node.ids)
+
+
+class TrieIndex:
+    """
+        Process-local TagTrie, rebuilt lazily once invalidated or older
+        than ttl seconds
+    """
+    def __init__(self, ttl=TRIE_TTL):
+        self.ttl = ttl
+        self._trie = None
+        self._built = 0
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        self._trie = None
+
+    def get(self):
+        trie = self._trie
+        if trie is not None and time.monotonic() - self._built < self.ttl:
+            return trie
+        with self._lock:
+            if self._trie is not trie and self._trie is not None:
+                # Rebuilt by another thread meanwhile
+                return self._trie
+            trie = TagTrie(Tag.objects.values_list('pk', 'name'))
+            self._trie, self._built = trie, time.monotonic()
+            return trie
+
+
+trie_index = TrieIndex()
+
+
+def rank_matches(txt, mode, limit):
+    """
+        Ids of the tags of the trie matching txt, at most limit of the
+        most used ones if there are more than TRIE_CHUNK_SIZE. A short
+        txt may match every tag: the top of each chunk is read, and the
+        best of them kept.
+    """
+    ids = sorted(trie_index.get().search(txt, mode))
+    if len(ids) <= TRIE_CHUNK_SIZE:
+        return ids
+    usage = TagUsage.objects.filter(num_times__gt=0)
+    usage = usage.order_by('-num_times', 'tag__name')
+    best = []
+    for start in range(0, len(ids), TRIE_CHUNK_SIZE):
+        chunk = ids[start:start + TRIE_CHUNK_SIZE]
+        rows = usage.filter(tag_id__in=chunk)
+        best += rows.values_list('num_times', 'tag__name', 'tag_id')[:limit]
+    best.sort(key=lambda row: (-row[0], row[1]))
+    return [pk for _, _, pk in best[:limit]]
+
+
+def find_tags(txt, mode=SUBSTRING, limit=AUTOCOMPLETE_LIMIT):
+    """
+        Course tags whose name starts with (mode prefix) or contains
+        (mode substring) txt, case insensitively. Return at most limit
+        of them, most used first, annotated with num_times.
+    """
+    db = connections[Tag.objects.db]
+    if db.vendor == 'postgresql':
+        lookup = 'name__istartswith' if mode == PREFIX else 'name__icontains'
+        tags = Tag.objects.filter(**{lookup: txt})
+    else:
+        tags = Tag.objects.filter(pk__in=rank_matches(txt, mode, limit))
+    tags = tags.filter(usage__num_times__gt=0)
+    tags = tags.annotate(num_times=F('usage__num_times'))
+    return tags.order_by('-num_times', 'name')[:limit]
+
+
+def most_common_tags(limit=None):
+    """
+        name and num_times of course tags, most used first
+    """
+    usage = TagUsage.objects.filter(num_times__gt=0)
+    usage = usage.order_by('-num_times', 'tag')
+    if limit is not None:
+        usage = usage[:limit]
+    return usage.values('num_times', name=F('tag__name'))
+
+
+def count_usage(tag_ids, delta):
+    """
+        Add delta to the usage of tags in tag_ids
+    """
+    tag_ids = list(tag_ids)
+    if not tag_ids:
+        return
+    with transaction.atomic():
+        if delta > 0:
+            TagUsage.objects.bulk_create(
+                [TagUsage(tag_id=pk) for pk in tag_ids], ignore_conflicts=True
+            )
+        TagUsage.objects.filter(tag_id__in=tag_ids).update(
+            num_times=Greatest(F('num_times') + delta, Value(0))
+        )
+
+
+def reconcile_tag_usage():
+    """
+        Recount the usage of every tag. Return the number of tags in use.
+    """
+    counts = Course.tags.most_common().values_list('pk', 'num_times')
+    with transaction.atomic():
+        TagUsage.objects.all().delete()
+        rows = TagUsage.objects.bulk_create(
+            TagUsage(tag_id=pk, num_times=num_times) for pk, num_times in counts
+        )
+    return len(rows)
+
+
+def tag_changed(sender, **kwargs):
+    trie_index.invalidate()
+
+
+def course_tags_changed(sender, instance, action, pk_set, **kwargs):
+    """
+        m2m_changed of Course.tags. taggit only sends it from the
+        instance side, with the ids of the tags actually added or
+        removed.
+    """
+    if not isinstance(instance, Course):
+        return
+    if action == 'post_add':
+        count_usage(pk_set, 1)
+    elif action == 'post_remove':
+        count_usage(pk_set, -1)
+    elif action == 'pre_clear':
+        instance._cleared_tags = list(
+            instance.tags.values_list('pk', flat=True)
+        )
+    elif action == 'post_clear':
+        count_usage(getattr(instance, '_cleared_tags', ()), -1)
+
+
+def course_deleted(sender, instance, **kwargs):
+    # pre_delete: the tagged items are deleted along with the course
+    # without any m2m_changed
+    count_usage(instance.tags.values_list('pk', flat=True), -1)
@@ -1,6 +1,18 @@
 from django.contrib.auth import get_user_model
+from django.test import (SimpleTestCase, TestCase)
 from rest_framework.test import APITestCase
 
+from django.utils import timezone
+
+from master_db.conflicts import (Interval, sweep_conflicts)
+from master_db.models import (ClassMetadata, Course, RecurrenceRule)
+from master_db.recurrence import occurrences
+from master_db.serializers import (
+    CourseSerializer, CustomUserSerializer, SessionSerializer
+)
+
+import datetime
+
 CustomUser = get_user_model()
 
 
@@ -68,3 +80,156 @@ def test_create_superuser(self):
             CustomUser.objects.create_superuser(
                 email='', password='foo', is_superuser=False
             )
+
+
+class FieldPlanTests(TestCase):
+    def test_plan_per_class(self):
+        plan = CourseSerializer.get_plan()
+        self.assertIs(CourseSerializer().plan, plan)
+        self.assertIsNot(CustomUserSerializer.get_plan(), plan)
+        self.assertEqual(CustomUserSerializer.get_plan().ignore, {'password'})
+        self.assertEqual(
+            SessionSerializer.get_plan().non_updatable, {'schedule', 'student'}
+        )
+
+    def test_ignore_overlay(self):
+        serializer = CustomUserSerializer().ignore_fields('email', 'mobile')
+        self.assertEqual(serializer.ignore, {'password', 'email', 'mobile'})
+        readable = [field.field_name for field in serializer._readable_fields]
+        self.assertNotIn('email', readable)
+        self.assertNotIn('password', readable)
+
+        # Overlay does not leak to the class or other instances
+        self.assertEqual(CustomUserSerializer().ignore, {'password'})
+        serializer.clear_ignore()
+        self.assertEqual(serializer.ignore, {'password'})
+        readable = [field.field_name for field in serializer._readable_fields]
+        self.assertIn('email', readable)
+
+        with self.assertRaises(KeyError):
+            serializer.ignore_field('nothing')
+
+    def test_fields_not_shared(self):
+        first, second = CourseSerializer(), CourseSerializer()
+        self.assertIsNot(first.fields['name'], second.fields['name'])
+        self.assertIs(first.fields['name'].parent, first)
+
+
+class SweepConflictsTests(SimpleTestCase):
+    def conflicts(self, *intervals):
+        intervals = [Interval(*interval) for interval in intervals]
+        return sorted(
+            tuple(sorted((first.key, second.key)))
+            for first, second in sweep_conflicts(intervals)
+        )
+
+    def test_shared_resource(self):
+        self.assertEqual(
+            self.conflicts(
+                ('a', 0, 10, {'teacher'}),
+                ('b', 5, 15, {'teacher'}),
+                ('c', 5, 15, {'student'}),
+                ('d', 9, 12, {'student', 'teacher'}),
+            ),
+            [('a', 'b'), ('a', 'd'), ('b', 'd'), ('c', 'd')],
+        )
+
+    def test_touching_intervals(self):
+        # Intervals are half-open, back to back is not a conflict
+        self.assertEqual(
+            self.conflicts(
+                ('a', 0, 10, {'class'}),
+                ('b', 10, 20, {'class'}),
+                ('c', 20, 30, {'class'}),
+            ),
+            [],
+        )
+        self.assertEqual(
+            self.conflicts(('a', 0, 30, {'class'}), ('b', 10, 20, {'class'})),
+            [('a', 'b')],
+        )
+
+
+class RecurrenceTests(TestCase):
+    def setUp(self):
+        course = Course.objects.create(name='Course', duration=10)
+        self.classroom = ClassMetadata.objects.create(
+            course=course, name='Class', status='published'
+        )
+
+    def at(self, *args):
+        return timezone.make_aware(datetime.datetime(*args))
+
+    def rule(self, **kwargs):
+        return RecurrenceRule(
+            classroom=self.classroom,
+            # A Wednesday
+            time_start=self.at(2021, 9, 1, 18, 0),
+            duration=datetime.timedelta(hours=2),
+            **kwargs
+        )
+
+    def starts(self, rule, start, end):
+        return [
+            time_start for time_start, _ in
+            occurrences(rule, self.at(*start), self.at(*end))
+        ]
+
+    def test_weekly(self):
+        rule = self.rule(weekdays='MO,WE')
+        self.assertEqual(
+            self.starts(rule, (2021, 8, 1), (2021, 9, 15)),
+            [
+                self.at(2021, 9, 1, 18, 0),
+                self.at(2021, 9, 6, 18, 0),
+                self.at(2021, 9, 8, 18, 0),
+                self.at(2021, 9, 13, 18, 0),
+            ],
+        )
+        # Occurrences overlapping the window start are included
+        self.assertEqual(
+            self.starts(rule, (2021, 9, 6, 19), (2021, 9, 8)),
+            [self.at(2021, 9, 6, 18, 0)],
+        )
+
+    def test_bounds_and_exceptions(self):
+        rule = self.rule(
+            weekdays='MO,WE',
+            interval=2,
+            count=4,
+            exdates=[self.at(2021, 9, 13, 18, 0).isoformat()]
+        )
+        # Every other week from Sep 1, the excluded date still counts
+        self.assertEqual(
+            self.starts(rule, (2021, 1, 1), (2022, 1, 1)),
+            [
+                self.at(2021, 9, 1, 18, 0),
+                self.at(2021, 9, 15, 18, 0),
+                self.at(2021, 9, 27, 18, 0),
+            ],
+        )
+
+        rule = self.rule(
+            frequency=RecurrenceRule.DAILY,
+            interval=3,
+            until=self.at(2021, 9, 7, 18, 0)
+        )
+        self.assertEqual(
+            self.starts(rule, (2021, 1, 1), (2022, 1, 1)),
+            [
+                self.at(2021, 9, 1, 18, 0),
+                self.at(2021, 9, 4, 18, 0),
+                self.at(2021, 9, 7, 18, 0),
+            ],
+        )
+
+    def test_far_window(self):
+        # Skipping ahead gives the same occurrences as walking there
+        rule = self.rule(weekdays='TU,SA', interval=3)
+        walked = [
+            time_start
+            for time_start in self.starts(rule, (2021, 1, 1), (2031, 1, 1))
+            if time_start >= self.at(2030, 1, 1)
+        ]
+        self.assertEqual(self.starts(rule, (2030, 1, 1), (2031, 1, 1)), walked)
+        self.assertTrue(walked)
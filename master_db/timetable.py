@@ -0,0 +1,166 @@
+"""
+    Maintenance of the Timetable table.
+
+    A timetable row exists for every (student, schedule) where the student
+    is in the classroom of the schedule, and carries the times of the
+    schedule and the status/homework of the matching session, if any.
+    Rows are kept in sync from signals of Schedule, Session and
+    ClassMetadata.students, including post_bulk_save of the bulk CRUD
+    layer. rebuild_timetable() recomputes the whole table.
+"""
+from django.db import transaction
+
+from .models import (ClassMetadata, Schedule, Session, Timetable)
+
+REBUILD_CHUNK_SIZE = 500
+
+ClassStudents = ClassMetadata.students.through
+
+
+def build_rows(schedule_ids, student_ids=None):
+    """
+        Timetable rows of schedules in schedule_ids, restricted to
+        students in student_ids if given
+    """
+    schedules = Schedule.objects.filter(pk__in=schedule_ids)
+    schedules = {
+        row['id']: row
+        for row in
+        schedules.values('id', 'classroom_id', 'time_start', 'time_end')
+    }
+    if not schedules:
+        return []
+
+    classrooms = [row['classroom_id'] for row in schedules.values()]
+    members = ClassStudents.objects.filter(classmetadata_id__in=classrooms)
+    sessions = Session.objects.filter(schedule_id__in=schedules.keys())
+    if student_ids is not None:
+        members = members.filter(customuser_id__in=student_ids)
+        sessions = sessions.filter(student_id__in=student_ids)
+
+    students = {}
+    for classroom, student in members.values_list(
+        'classmetadata_id', 'customuser_id'
+    ):
+        students.setdefault(classroom, []).append(student)
+    sessions = sessions.values(
+        'id', 'schedule_id', 'student_id', 'homework', 'status'
+    )
+    attended = {
+        (row['schedule_id'], row['student_id']): row
+        for row in sessions
+    }
+
+    rows = []
+    for schedule in schedules.values():
+        for student in students.get(schedule['classroom_id'], ()):
+            session = attended.get((schedule['id'], student), {})
+            rows.append(
+                Timetable(
+                    student_id=student,
+                    schedule_id=schedule['id'],
+                    classroom_id=schedule['classroom_id'],
+                    session_id=session.get('id'),
+                    time_start=schedule['time_start'],
+                    time_end=schedule['time_end'],
+                    homework=session.get('homework'),
+                    status=session.get('status'),
+                )
+            )
+    return rows
+
+
+def refresh_timetable(schedule_ids, student_ids=None):
+    """
+        Recompute the timetable rows of schedules in schedule_ids,
+        restricted to students in student_ids if given
+    """
+    schedule_ids = list(schedule_ids)
+    if not schedule_ids:
+        return
+    with transaction.atomic():
+        stale = Timetable.objects.filter(schedule_id__in=schedule_ids)
+        if student_ids is not None:
+            stale = stale.filter(student_id__in=student_ids)
+        stale.delete()
+        Timetable.objects.bulk_create(build_rows(schedule_ids, student_ids))
+
+
+def rebuild_timetable(chunk_size=REBUILD_CHUNK_SIZE):
+    """
+        Recompute the whole timetable. Return the number of rows.
+    """
+    count = 0
+    with transaction.atomic():
+        Timetable.objects.all().delete()
+        ids = Schedule.objects.order_by('pk').values_list('pk', flat=True)
+        ids = ids.iterator(chunk_size=chunk_size)
+        while chunk := [pk for _, pk in zip(range(chunk_size), ids)]:
+            rows = build_rows(chunk)
+            Timetable.objects.bulk_create(rows, batch_size=chunk_size)
+            count += len(rows)
+    return count
+
+
+def schedule_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        refresh_timetable([instance.pk])
+
+
+def session_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    with transaction.atomic():
+        # The session may have moved to another schedule or student
+        Timetable.objects.filter(session=instance).exclude(
+            schedule_id=instance.schedule_id, student_id=instance.student_id
+        ).update(session=None, homework=None, status=None)
+        Timetable.objects.filter(
+            schedule_id=instance.schedule_id, student_id=instance.student_id
+        ).update(
+            session=instance,
+            homework=instance.homework,
+            status=instance.status
+        )
+
+
+def session_deleted(sender, instance, **kwargs):
+    # Only update: the schedule itself may be being deleted
+    Timetable.objects.filter(
+        schedule_id=instance.schedule_id, student_id=instance.student_id
+    ).update(session=None, homework=None, status=None)
+
+
+def bulk_saved(sender, instances, **kwargs):
+    if sender is Schedule:
+        refresh_timetable(obj.pk for obj in instances)
+    elif sender is Session:
+        schedules = [obj.schedule_id for obj in instances]
+        students = [obj.student_id for obj in instances]
+        refresh_timetable(set(schedules), set(students))
+
+
+def students_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+        m2m_changed of ClassMetadata.students, from either side:
+        instance is a class (reverse=False) or a student (reverse=True)
+    """
+    if action == 'post_clear':
+        lookup = 'student' if reverse else 'classroom'
+        Timetable.objects.filter(**{lookup: instance}).delete()
+        return
+    if action not in ('post_add', 'post_remove') or not pk_set:
+        return
+
+    if reverse:
+        classrooms, students = pk_set, {instance.pk}
+    else:
+        classrooms, students = {instance.pk}, pk_set
+
+    if action == 'post_remove':
+        Timetable.objects.filter(
+            classroom_id__in=classrooms, student_id__in=students
+        ).delete()
+    else:
+        schedules = Schedule.objects.filter(classroom_id__in=classrooms)
+        refresh_timetable(schedules.values_list('pk', flat=True), students)
@@ -0,0 +1,26 @@
+"""
+    Settings running the tests against two SQLite databases standing in
+    for the primary and a replica:
+
+        python manage.py test --settings=tfc_backend.replica_test_settings
+
+    The replica is a separate database, rows written to the primary do
+    not reach it. It is only read from by the tests that enable it with
+    override_settings(DATABASE_REPLICAS=['replica']).
+"""
+from .settings import *  # noqa
+
+DATABASES = {
+    'default':
+        {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'primary.sqlite3',  # noqa
+        },
+    'replica':
+        {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'replica.sqlite3',  # noqa
+        },
+}
+
+DATABASE_REPLICAS = []
@@ -66,6 +66,8 @@
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'master_api.instrumentation.InstrumentationMiddleware',
+    'master_api.routers.ReplicaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -79,6 +81,7 @@
 CRON_CLASSES = [
     "master_api.cron.MyCronJob",
     "master_api.cron.MyCronJob1",
+    "master_api.cron.ReconcileTagUsageJob",
     # ...
 ]
 
@@ -120,6 +123,41 @@
         }
 }
 
+# Share of requests profiled by master_api.instrumentation, from 0 (off)
+# to 1, whether profiled responses carry a Server-Timing header, and how
+# many of its slowest statements are kept per request and per endpoint
+INSTRUMENTATION_SAMPLE_RATE = float(
+    os.environ.get('INSTRUMENTATION_SAMPLE_RATE', 0)
+)
+
+INSTRUMENTATION_SERVER_TIMING = bool(
+    os.environ.get('INSTRUMENTATION_SERVER_TIMING')
+)
+
+INSTRUMENTATION_SLOW_QUERIES = 5
+
+# Read replicas of default, as a comma separated list of hosts in
+# DATABASE_REPLICA_HOSTS. Reads of GET requests are sent to them
+# (master_api.routers), except for REPLICA_STICKY_SECONDS after a user
+# wrote, so users read their own writes.
+DATABASE_REPLICAS = []
+
+REPLICA_HOSTS = os.environ.get('DATABASE_REPLICA_HOSTS', '').split(',')
+
+for index, host in enumerate(filter(None, map(str.strip, REPLICA_HOSTS))):
+    DATABASE_REPLICAS.append(f'replica_{index}')
+    DATABASES[f'replica_{index}'] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'TEST': {
+            'MIRROR': 'default'
+        },
+    }
+
+DATABASE_ROUTERS = ['master_api.routers.ReplicaRouter']
+
+REPLICA_STICKY_SECONDS = 5
+
 DBBACKUP_STORAGE = 'django.core.files.storage.FileSystemStorage'
 
 DBBACKUP_STORAGE_OPTIONS = {'location': 'backup/'}
@@ -145,6 +183,40 @@
     },
 ]
 
+# Password hashing
+# https://docs.djangoproject.com/en/3.2/topics/auth/passwords/
+# The first hasher is used for new hashes; existing hashes made with any
+# other hasher, or another iteration count, are upgraded on login
+PASSWORD_HASHERS = [
+    'app_auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+]
+
+PASSWORD_HASHER_ITERATIONS = 260000
+
+# Login password checks run on a pool of HASHING_WORKERS threads, with at
+# most HASHING_QUEUE_SIZE more waiting. Logins beyond that, or beyond
+# HASHING_PER_ACCOUNT / HASHING_PER_IP concurrent attempts, get 429.
+HASHING_WORKERS = 2
+
+HASHING_QUEUE_SIZE = 8
+
+HASHING_PER_ACCOUNT = 1
+
+HASHING_PER_IP = 4
+
+# Seconds a login waits for its password check
+HASHING_TIMEOUT = 10
+
+# The async views of master_api.async_views run on a pool of
+# ASYNC_VIEW_WORKERS threads, with at most ASYNC_VIEW_QUEUE_SIZE more
+# requests waiting. Requests beyond that get 503.
+ASYNC_VIEW_WORKERS = 8
+
+ASYNC_VIEW_QUEUE_SIZE = 64
+
 # Internationalization
 # https://docs.djangoproject.com/en/3.2/topics/i18n/
 
@@ -190,7 +262,7 @@
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES':
-        ('rest_framework_simplejwt.authentication.JWTAuthentication', ),
+        ('master_api.authentication.CachedJWTAuthentication', ),
     'DEFAULT_PERMISSION_CLASSES':
         ('rest_framework.permissions.IsAuthenticatedOrReadOnly', )
 }
@@ -239,3 +311,37 @@
     'SLIDING_TOKEN_REFRESH_LIFETIME':
         timedelta(days=1),
 }
+
+# Caching policies
+
+# Number of rows fetched and serialized at a time by streamed lists
+STREAM_CHUNK_SIZE = 500
+
+# Maximum number of authenticated users cached per process, and how many
+# seconds a cached user may be served before being read again
+PRINCIPAL_CACHE_SIZE = 1024
+
+PRINCIPAL_CACHE_TTL = 60
+
+# Read responses are cached (master_api.response_cache) in the cache
+# RESPONSE_CACHE_ALIAS. Invalidations only reach the workers sharing its
+# backend: use a file, memcached or redis backend with several workers.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'responses':
+        {
+            'BACKEND':
+                os.environ.get(
+                    'RESPONSE_CACHE_BACKEND',
+                    'django.core.cache.backends.locmem.LocMemCache'
+                ),
+            'LOCATION':
+                os.environ.get('RESPONSE_CACHE_LOCATION', 'responses'),
+            'TIMEOUT':
+                300,
+        },
+}
+
+RESPONSE_CACHE_ALIAS = 'responses'